@@ -0,0 +1,500 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+import clasificacion
+import ranking
+import tasas
+
+# Cálculos de cada Problemática sobre el cubo, sin Streamlit ni gráficos: los usan el tablero
+# (secciones.py) y los informes por lotes (informe.py). Cada función recibe un cubo.Cubo y
+# devuelve un Resultado; si faltan tablas o columnas sólo llena `aviso`.
+ANALISIS = {}
+
+
+@dataclass
+class Resultado:
+    """Tablas listas para graficar, cifras para mostrar como texto y opciones de los gráficos."""
+
+    tablas: dict = field(default_factory=dict)
+    # Etiqueta -> valor ya formateado
+    cifras: dict = field(default_factory=dict)
+    # Columnas o títulos elegidos según los datos (p. ej. CausaAgrupada o Causa)
+    opciones: dict = field(default_factory=dict)
+    # Por qué no se pudo hacer el análisis
+    aviso: str = None
+
+
+def analisis(titulo):
+    def registrar(funcion):
+        if titulo in ANALISIS:
+            raise ValueError(f"Análisis duplicado: {titulo}")
+        ANALISIS[titulo] = funcion
+        return funcion
+    return registrar
+
+
+def a_texto(df, *columnas):
+    # Las columnas categóricas (NCC/NCP) se pasan a texto antes de graficar:
+    # seaborn dibuja todas las categorías del tipo, no sólo las del top
+    for col in columnas:
+        df[col] = df[col].astype(str)
+    return df
+
+
+def _tiene(df, *columnas):
+    return not df.empty and all(col in df.columns for col in columnas)
+
+
+@analisis("Problemática 1: Producción Total de Tallos por Día")
+def produccion_diaria(cubo_datos):
+    cubo_produccion = cubo_datos.tablas['produccion']
+    if not _tiene(cubo_produccion, 'FechaJornada', 'Tallos'):
+        return Resultado(aviso="No hay datos de producción disponibles o las columnas necesarias no existen para el análisis de producción total de tallos.")
+    return Resultado(tablas={'diaria': cubo_produccion.groupby('FechaJornada')['Tallos'].sum().reset_index()})
+
+
+@analisis("Problemática 2: Variedades con Mayor Tasa de Pérdida")
+def tasa_perdida_variedad(cubo_datos):
+    cubo_produccion = cubo_datos.tablas['produccion']
+    cubo_ncp = cubo_datos.tablas['ncp']
+    if not (_tiene(cubo_produccion, 'Variedad', 'Tallos') and _tiene(cubo_ncp, 'Variedad', 'Tallos')):
+        return Resultado(aviso="No se puede realizar el análisis de Tasa de Pérdida. Asegúrate de que `df_produccion` y `df_ncp` estén cargados y contengan las columnas 'Variedad' y 'Tallos'.")
+
+    # Usaremos 'Variedad' como clave; la tasa sale del motor de tasas, sin agrupar ni unir de nuevo
+    por_variedad = tasas.motor(cubo_datos).nivel('Variedad').reset_index()
+    por_variedad = por_variedad[por_variedad['ProduccionTallos'] > 0] # Excluir ítems sin producción
+    merged_items = por_variedad[['Variedad', 'ProduccionTallos', 'NCPTallos', 'TasaNCP']].rename(columns={'TasaNCP': 'TasaPerdida_Porcentaje'})
+
+    top = a_texto(merged_items.sort_values(by='TasaPerdida_Porcentaje', ascending=False).head(10), 'Variedad')
+    return Resultado(tablas={'top': top})
+
+
+@analisis("Problemática 3: Estacionalidad de Producción y Pérdidas")
+def estacionalidad(cubo_datos):
+    cubo_produccion = cubo_datos.tablas['produccion']
+    cubo_ncp = cubo_datos.tablas['ncp']
+    if not (_tiene(cubo_produccion, 'FechaJornada', 'Tallos') and _tiene(cubo_ncp, 'FechaJornada', 'Tallos')):
+        return Resultado(aviso="No se puede realizar el análisis de Estacionalidad. Asegúrate de que `df_produccion` y `df_ncp` estén cargados y contengan las columnas 'FechaJornada' y 'Tallos'.")
+
+    # El cubo ya trae FechaJornada como fecha; el mes se extrae sobre los totales diarios
+    produccion_diaria = cubo_produccion.groupby('FechaJornada')['Tallos'].sum()
+    ncp_diaria = cubo_ncp.groupby('FechaJornada')['Tallos'].sum()
+
+    produccion_mensual = produccion_diaria.groupby(produccion_diaria.index.month).sum().rename_axis('Mes').reset_index(name='TallosProducidos')
+    ncp_mensual = ncp_diaria.groupby(ncp_diaria.index.month).sum().rename_axis('Mes').reset_index(name='TallosPerdidos')
+
+    produccion_perdida_mensual = pd.merge(produccion_mensual, ncp_mensual, on='Mes', how='outer').fillna(0)
+
+    # Asegúrate de que las columnas numéricas sean int si son conteos
+    produccion_perdida_mensual['TallosProducidos'] = produccion_perdida_mensual['TallosProducidos'].astype(int)
+    produccion_perdida_mensual['TallosPerdidos'] = produccion_perdida_mensual['TallosPerdidos'].astype(int)
+
+    # Convertir a formato 'long' para seaborn.lineplot
+    return Resultado(tablas={'mensual': produccion_perdida_mensual.melt(id_vars='Mes', var_name='Tipo', value_name='Tallos')})
+
+
+@analisis("Problemática 4: Descartes de Alta Calidad por Postcosecha y Finca")
+def descartes_alta_calidad(cubo_datos):
+    cubo_ncp = cubo_datos.tablas['ncp']
+    if not _tiene(cubo_ncp, 'ClaseGrado', 'Tallos'):
+        return Resultado(aviso="No se puede realizar el análisis de 'Descartes de Alta Calidad'. Asegúrate de que `df_ncp` esté cargado y contenga las columnas 'Grado' y 'Tallos', y de que exista el archivo de reglas de clasificación.")
+
+    alta_calidad = {'ClaseGrado': clasificacion.ALTA_CALIDAD}
+    con_perdidas = bool((cubo_ncp['ClaseGrado'] == clasificacion.ALTA_CALIDAD).any())
+    resultado = Resultado(
+        cifras={'Grados de alta calidad': ', '.join(clasificacion.valores('Grado', clasificacion.ALTA_CALIDAD))},
+        opciones={'con_perdidas': con_perdidas},
+    )
+    # Una tabla que falta en `tablas` es una columna que no está en NCP
+    for col, clave in (('Postcosecha', 'postcosecha'), ('Finca', 'finca')):
+        if con_perdidas and col in cubo_ncp.columns:
+            resultado.tablas[clave] = a_texto(ranking.top(cubo_datos, 'ncp', col, condicion=alta_calidad).reset_index(), col)
+    return resultado
+
+
+@analisis("Problemática 5: Alta Calidad Descartada por Plagas/Enfermedades")
+def alta_calidad_plagas(cubo_datos):
+    cubo_produccion = cubo_datos.tablas['produccion']
+    cubo_ncp = cubo_datos.tablas['ncp']
+    if not (_tiene(cubo_produccion, 'ClaseGrado', 'Tallos') and _tiene(cubo_ncp, 'ClaseGrado', 'Tallos', 'ClaseCausa')):
+        return Resultado(aviso="No se puede realizar el análisis de 'Porcentaje de Producción de Alto Grado Descartado por Plagas/Enfermedades Específicas'. Asegúrate de que `df_produccion` y `df_ncp` estén cargados y contengan las columnas 'Grado', 'Tallos' y 'Causa', y de que exista el archivo de reglas de clasificación.")
+
+    # Grados y causas se clasifican al cargar (reglas_clasificacion.csv); aquí sólo se comparan las clases
+    produccion_alta_calidad_tallos = cubo_produccion.loc[cubo_produccion['ClaseGrado'] == clasificacion.ALTA_CALIDAD, 'Tallos'].sum()
+    ncp_alta_calidad_plagas_df = cubo_ncp[
+        (cubo_ncp['ClaseGrado'] == clasificacion.ALTA_CALIDAD) &
+        (cubo_ncp['ClaseCausa'] == clasificacion.PLAGAS)
+    ]
+    if 'CausaAgrupada' in cubo_ncp.columns and not cubo_ncp['CausaAgrupada'].isnull().all():
+        campo_causa_final = 'CausaAgrupada'
+    else:
+        campo_causa_final = 'Causa'
+
+    resultado = Resultado(opciones={'campo_causa': campo_causa_final, 'produccion_alta_calidad': produccion_alta_calidad_tallos})
+    if produccion_alta_calidad_tallos > 0:
+        porcentaje_perdida = (ncp_alta_calidad_plagas_df['Tallos'].sum() / produccion_alta_calidad_tallos) * 100
+        resultado.cifras['Porcentaje de tallos de alta calidad descartados por plagas/enfermedades'] = f"{porcentaje_perdida:.2f}%"
+        resultado.tablas['por_causa'] = a_texto(ncp_alta_calidad_plagas_df.groupby(campo_causa_final, observed=True)['Tallos'].sum().sort_values(ascending=False).reset_index(), campo_causa_final)
+    return resultado
+
+
+@analisis("Problemática 6: Calidad No Conforme (NCC) por Finca")
+def ncc_por_finca(cubo_datos):
+    cubo_ncc = cubo_datos.tablas['ncc']
+    if not _tiene(cubo_ncc, 'Tallos', 'Finca'):
+        return Resultado(aviso="No se puede realizar el análisis de 'Fincas con Mayores Índices de Calidad No Conforme (NCC)'. Asegúrate de que `df_ncc` esté cargado y contenga las columnas 'Tallos', 'Finca', y al menos 'Causa' o 'CausaAgrupada'.")
+
+    # Priorizar CausaAgrupada, si no, usar Causa
+    if 'CausaAgrupada' in cubo_ncc.columns and not cubo_ncc['CausaAgrupada'].isnull().all():
+        x_col = 'CausaAgrupada'
+    elif 'Causa' in cubo_ncc.columns:
+        x_col = 'Causa'
+    else:
+        return Resultado(aviso="No se encontraron las columnas 'CausaAgrupada' o 'Causa' en `df_ncc` para este análisis.")
+    top = a_texto(ranking.top(cubo_datos, 'ncc', ['Finca', x_col]).reset_index(), 'Finca', x_col)
+    return Resultado(tablas={'top': top}, opciones={'x_col': x_col})
+
+
+@analisis("Problemática 7: Tallos por Ramo por Variedad")
+def tallos_por_ramo(cubo_datos):
+    cubo_produccion = cubo_datos.tablas['produccion']
+    if not _tiene(cubo_produccion, 'TallosPorRamo', 'Variedad'):
+        return Resultado(aviso="No se puede realizar el análisis de 'Comportamiento de Tallos por Ramo por Variedad'. Asegúrate de que `df_produccion` esté cargado y contenga las columnas 'Tallos', 'Ramos', y 'Variedad'.")
+
+    # El cubo guarda la suma de Tallos/Ramos y el número de registros con Ramos > 0,
+    # así que el promedio por registro se obtiene sin recorrer ni copiar la producción
+    sumas_por_variedad = cubo_produccion.groupby('Variedad', observed=True)[['TallosPorRamo', 'FilasConRamos']].sum()
+    sumas_por_variedad = sumas_por_variedad[sumas_por_variedad['FilasConRamos'] > 0]
+    if sumas_por_variedad.empty:
+        return Resultado(opciones={'con_ramos': False})
+
+    # Calcular el promedio de tallos por ramo por variedad
+    tallos_por_ramo_por_variedad = (sumas_por_variedad['TallosPorRamo'] / sumas_por_variedad['FilasConRamos']).rename('Tallos_por_Ramo').sort_values(ascending=False).reset_index()
+
+    # Podemos visualizar las 7 primeras y las 8 últimas para ver los extremos
+    extremos = a_texto(pd.concat([tallos_por_ramo_por_variedad.head(7), tallos_por_ramo_por_variedad.tail(8)]), 'Variedad')
+    return Resultado(tablas={'extremos': extremos}, opciones={'con_ramos': True})
+
+
+@analisis("Problemática 8: Causas Principales de Pérdida (NCP)")
+def causas_perdida_ncp(cubo_datos):
+    cubo_ncp = cubo_datos.tablas['ncp']
+    if not _tiene(cubo_ncp, 'Tallos'):
+        return Resultado(aviso="No hay datos de NCP disponibles o la columna 'Tallos' no existe para el análisis de causas de pérdida.")
+
+    if 'CausaAgrupada' in cubo_ncp.columns:
+        campo, titulo = 'CausaAgrupada', 'Top 10 Causas Agrupadas de Pérdida (NCP)'
+    elif 'Causa' in cubo_ncp.columns:
+        campo, titulo = 'Causa', 'Top 10 Causas de Pérdida (NCP)'
+    else:
+        return Resultado(aviso="Las columnas 'CausaAgrupada' o 'Causa' no se encontraron en `df_ncp` para este análisis.")
+    top = ranking.top(cubo_datos, 'ncp', campo).rename_axis('Causa').reset_index()
+    top['Causa'] = top['Causa'].astype(str)
+    return Resultado(tablas={'top': top}, opciones={'titulo': titulo})
+
+
+@analisis("Problemática 9: Impacto de Mala Marcación (NCP)")
+def mala_marcacion(cubo_datos):
+    cubo_ncp = cubo_datos.tablas['ncp']
+    if not _tiene(cubo_ncp, 'ClaseCausa', 'Tallos'):
+        return Resultado(aviso="No se puede realizar el análisis de 'Impacto de Mala Marcación'. Asegúrate de que `df_ncp` esté cargado y contenga las columnas 'Causa' y 'Tallos', y de que exista el archivo de reglas de clasificación.")
+
+    # La clase de cada causa se calculó al cargar: se compara un código por fila, no texto
+    tallos_por_mala_marcacion = cubo_ncp.loc[cubo_ncp['ClaseCausa'] == clasificacion.MARCACION, 'Tallos'].sum()
+    total_tallos_ncp = cubo_ncp['Tallos'].sum()
+    resultado = Resultado(opciones={'total_ncp': total_tallos_ncp, 'tallos_marcacion': tallos_por_mala_marcacion})
+    if total_tallos_ncp > 0:
+        porcentaje_mala_marcacion = (tallos_por_mala_marcacion / total_tallos_ncp) * 100
+        resultado.cifras['Total de tallos descartados por problemas de marcación'] = f"{int(tallos_por_mala_marcacion)} tallos"
+        resultado.cifras['Porcentaje de tallos descartados por problemas de marcación sobre el total de NCP'] = f"{porcentaje_mala_marcacion:.2f}%"
+        if tallos_por_mala_marcacion > 0:
+            otros_ncp = total_tallos_ncp - tallos_por_mala_marcacion
+            resultado.tablas['proporcion'] = pd.DataFrame({'Tipo': ['Problemas de Marcación', 'Otros Descartados'], 'Tallos': [tallos_por_mala_marcacion, otros_ncp]})
+    return resultado
+
+
+@analisis("Problemática 10: Rendimiento de Tallos por Postcosecha por Jornada")
+def rendimiento_postcosecha(cubo_datos):
+    cubo_produccion = cubo_datos.tablas['produccion']
+    if not _tiene(cubo_produccion, 'Postcosecha', 'FechaJornada', 'Tallos'):
+        return Resultado(aviso="No se puede realizar el análisis de 'Rendimiento Promedio de Tallos por Postcosecha por Jornada'. Asegúrate de que `df_produccion` esté cargado y contenga las columnas 'Tallos', 'Postcosecha' y 'FechaJornada'.")
+
+    # Sumar tallos por Postcosecha y jornada
+    rendimiento_diario = cubo_produccion.groupby(['Postcosecha', 'FechaJornada'], observed=True)['Tallos'].sum().reset_index()
+    rendimiento_diario.rename(columns={'Tallos': 'Tallos_Producidos'}, inplace=True)
+
+    # Calcular el promedio de rendimiento por Postcosecha a lo largo del tiempo
+    promedio = a_texto(rendimiento_diario.groupby('Postcosecha', observed=True)['Tallos_Producidos'].mean().sort_values(ascending=False).head(15).reset_index(), 'Postcosecha')
+    return Resultado(tablas={'promedio': promedio, 'diario': rendimiento_diario['Tallos_Producidos']})
+
+
+# Celdas del mapa de calor que se dibujan a la vez; el resto se recorre por páginas
+FILAS_MAPA = 40
+COLUMNAS_MAPA = 40
+ORDENES_MAPA = {'produccion': 'Mayor producción primero', 'aceptacion': 'Aceptación parecida junta'}
+
+
+def _orden_mapa(largo, dimension, orden):
+    # Sólo entran las claves con datos: las combinaciones vacías no ocupan lugar en ninguna página
+    por_clave = largo.groupby(dimension, observed=True)[['ProduccionTotal', 'TallosAceptados']].sum()
+    if orden == 'aceptacion':
+        # Aceptación ponderada por producción: filas (o columnas) parecidas quedan juntas y los colores forman bloques
+        clave = por_clave['TallosAceptados'] / por_clave['ProduccionTotal'].where(por_clave['ProduccionTotal'] > 0)
+    else:
+        clave = por_clave['ProduccionTotal']
+    return clave.sort_values(ascending=False, kind='stable').index.tolist()
+
+
+def pivote_pagina(resultado, pagina_filas=0, pagina_columnas=0):
+    """Matriz de una página del mapa de calor de aceptación, de a lo sumo FILAS_MAPA x COLUMNAS_MAPA.
+
+    Sólo esa página se pasa a matriz; se quitan sus filas y columnas sin ningún dato.
+    """
+    largo, o = resultado.tablas['aceptacion'], resultado.opciones
+    col = o['producto_col']
+    filas = o['orden_filas'][pagina_filas * FILAS_MAPA:(pagina_filas + 1) * FILAS_MAPA]
+    columnas = o['orden_columnas'][pagina_columnas * COLUMNAS_MAPA:(pagina_columnas + 1) * COLUMNAS_MAPA]
+    celdas = largo[largo['Finca'].isin(filas) & largo[col].isin(columnas)]
+    pivote = celdas.pivot(index='Finca', columns=col, values='PorcentajeAceptacion')
+    # Mismo orden que las páginas, no alfabético
+    return pivote.reindex(index=[f for f in filas if f in pivote.index], columns=[c for c in columnas if c in pivote.columns])
+
+
+@analisis("Mapa de Calor: Aceptación por Finca y Producto")
+def aceptacion_finca_producto(cubo_datos, columnas=None, orden='produccion'):
+    """Aceptación (100 - tasa NCP) por Finca y `columnas` (por defecto el producto).
+
+    `tablas['aceptacion']` tiene sólo las combinaciones con producción (la forma dispersa del
+    mapa); `tablas['pivote']` es su primera página (ver pivote_pagina).
+    """
+    cubo_produccion = cubo_datos.tablas['produccion']
+    cubo_ncp = cubo_datos.tablas['ncp']
+    if cubo_produccion.empty or cubo_ncp.empty:
+        return Resultado(aviso="Uno o ambos DataFrames (**`df_produccion`**, **`df_ncp`**) están vacíos para este análisis. Asegúrate de que los datos se hayan cargado correctamente.")
+
+    # Priorizar ProductoMaestro si ambas tablas lo tienen, si no, usar Producto
+    producto_col = 'Producto'
+    if all('ProductoMaestro' in df.columns and not df['ProductoMaestro'].isnull().all() for df in (cubo_produccion, cubo_ncp)):
+        producto_col = 'ProductoMaestro'
+
+    # Verificar que las columnas clave existan antes de proceder
+    if not (_tiene(cubo_produccion, 'Finca', producto_col, 'Tallos') and _tiene(cubo_ncp, 'Finca', producto_col, 'Tallos')):
+        return Resultado(aviso=f"Las columnas **'Finca'**, **'Tallos'**, o **'{producto_col}'** no se encontraron en `df_produccion` o `df_ncp`. Asegúrate de que los nombres de las columnas sean correctos y existan en ambos DataFrames.")
+
+    # Columnas posibles: el producto y los niveles de la jerarquía bajo la finca que tengan las dos tablas
+    motor = tasas.motor(cubo_datos)
+    posibles = [producto_col] + [col for col in motor.jerarquia if col not in ('Finca', 'Producto', producto_col)]
+    producto_col = columnas if columnas in posibles else producto_col
+
+    # Producción y descartes (NCP) por Finca y Producto, del motor de tasas; sólo las combinaciones con producción
+    por_finca = motor.nivel('Finca', producto_col)
+    por_finca = por_finca[por_finca['ProduccionTallos'].notna()].reset_index()
+    merged_data = a_texto(pd.DataFrame({
+        'Finca': por_finca['Finca'],
+        producto_col: por_finca[producto_col],
+        'ProduccionTotal': por_finca['ProduccionTallos'],
+        'TallosDescartadosNCP': por_finca['NCPTallos'],
+    }), 'Finca', producto_col)
+
+    # Calcular Tallos Aceptados y Porcentaje de Aceptación
+    merged_data['TallosAceptados'] = merged_data['ProduccionTotal'] - merged_data['TallosDescartadosNCP']
+    merged_data['PorcentajeAceptacion'] = np.where(
+        merged_data['ProduccionTotal'] > 0,
+        100 - por_finca['TasaNCP'],
+        0 # Si no hay producción, el porcentaje de aceptación es 0
+    )
+
+    # En lugar de una matriz Finca x columnas casi vacía (cientos de variedades), se ordenan las claves
+    # y sólo se arma la matriz de la página que se dibuja; las celdas sin producción quedan en NaN
+    orden = orden if orden in ORDENES_MAPA else 'produccion'
+    orden_filas = _orden_mapa(merged_data, 'Finca', orden)
+    orden_columnas = _orden_mapa(merged_data, producto_col, orden)
+    resultado = Resultado(tablas={'aceptacion': merged_data}, opciones={
+        'producto_col': producto_col,
+        'columnas_posibles': posibles,
+        'orden': orden,
+        'orden_filas': orden_filas,
+        'orden_columnas': orden_columnas,
+        'paginas': (-(-len(orden_filas) // FILAS_MAPA), -(-len(orden_columnas) // COLUMNAS_MAPA)),
+    })
+    total = len(orden_filas) * len(orden_columnas)
+    resultado.cifras['Celdas con datos'] = f"{len(merged_data):,} de {total:,} ({len(merged_data) / total:.1%})" if total else "0"
+    resultado.tablas['pivote'] = pivote_pagina(resultado)
+    return resultado
+
+
+@analisis("Tasas de Pérdida: Finca → Bloque → Producto → Variedad → Grado")
+def tasas_perdida(cubo_datos, ruta=()):
+    """Tasas de NCP y NCC del nivel de la jerarquía que sigue a `ruta` (valores ya elegidos)."""
+    motor = tasas.motor(cubo_datos)
+    if motor.base.empty or not motor.jerarquia:
+        return Resultado(aviso="No se pueden calcular tasas de pérdida. Asegúrate de que `df_produccion` esté cargado y contenga las columnas 'Tallos' y 'Finca'.")
+    dimension, desglose = motor.desglose(ruta)
+    total = motor.nivel(*motor.jerarquia[:len(ruta)])
+    try:
+        fila = total.loc[ruta[0] if len(ruta) == 1 else ruta] if ruta else total.iloc[0]
+    except KeyError:
+        # Como en MotorTasas.desglose: una ruta que no está en el nivel no tiene datos
+        return Resultado(aviso=f"No hay producción registrada para {' → '.join(map(str, ruta))}.")
+    cifras = {
+        'Tasa de pérdida en postcosecha (NCP)': f"{fila['TasaNCP']:.2f}%",
+        'Tasa de no conformidad en cultivo (NCC)': f"{fila['TasaNCC']:.2f}%",
+    }
+    valores = []
+    if dimension is not None:
+        desglose = desglose[desglose['ProduccionTallos'] > 0].sort_values('TasaNCP', ascending=False)
+        # Valores tal como están en el índice del motor (un Bloque o Grado numérico no se vuelve texto):
+        # son los que se eligen para bajar de nivel; la tabla para mostrar sí va como texto
+        valores = sorted(desglose[dimension].dropna().tolist(), key=str)
+        desglose = a_texto(desglose, dimension)
+    opciones = {'dimension': dimension, 'jerarquia': motor.jerarquia, 'valores': valores}
+    return Resultado(tablas={'desglose': desglose}, cifras=cifras, opciones=opciones)
+
+
+def inspeccion(df_inspeccion):
+    """Tabla de Inspección de Plagas/Enfermedades tal como se cargó (no está en el cubo)."""
+    if df_inspeccion.empty:
+        return Resultado(aviso="La tabla de Inspección de Plagas/Enfermedades está vacía o no se cargó correctamente.")
+    return Resultado(tablas={'inspeccion': df_inspeccion}, opciones={'columnas': df_inspeccion.columns.tolist()})
+
+
+# Columnas de hallazgos de la inspección y, para las que tienen, la CausaAgrupada de NCP/NCC que les corresponde
+HALLAZGOS_INSPECCION = ['THRIPSS', 'ACAROS', 'LEPIDOPTEROS', 'AFIDOS', 'MINADOR', 'MOSCA_BLANCA', 'BOTRYTIS', 'OTRO_PROBLEMA']
+PLAGAS_INSPECCION = {'THRIPSS': 'THRIPS', 'ACAROS': 'ACAROS', 'AFIDOS': 'APHIDOS', 'MINADOR': 'MINADOR', 'BOTRYTIS': 'BOTRYTIS'}
+# Pares finca/variedad mínimos para calcular una correlación
+MIN_PARES_CORRELACION = 3
+
+
+def _por_clave(df, valores, por=()):
+    # Se agrupa primero por los nombres del cubo (categóricos) y después se pasa a la clave normalizada:
+    # se normaliza cada nombre distinto una vez, no cada fila
+    agrupado = df.groupby(['Finca', 'Variedad', *por], observed=True)[valores].sum().reset_index()
+    agrupado['ClaveFinca'] = clasificacion.clave(agrupado['Finca'])
+    agrupado['ClaveVariedad'] = clasificacion.clave(agrupado['Variedad'])
+    return agrupado.groupby(['ClaveFinca', 'ClaveVariedad', *por], observed=True)[valores].sum()
+
+
+def _nombres(df):
+    # Nombre de finca y variedad tal como lo escribe el cubo, para cada clave normalizada
+    nombres = df.groupby(['Finca', 'Variedad'], observed=True).size().reset_index()[['Finca', 'Variedad']]
+    nombres.index = pd.MultiIndex.from_arrays([clasificacion.clave(nombres['Finca']), clasificacion.clave(nombres['Variedad'])], names=['ClaveFinca', 'ClaveVariedad'])
+    return a_texto(nombres[~nombres.index.duplicated()], 'Finca', 'Variedad')
+
+
+def _de_plagas(df):
+    # Causas agrupadas en alguna de las plagas que registra la inspección (p. ej. DAÑO POR MINADOR -> MINADOR),
+    # estén o no en la clase de plagas de reglas_clasificacion.csv
+    if 'CausaAgrupada' not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return df['CausaAgrupada'].isin(list(PLAGAS_INSPECCION.values())).to_numpy()
+
+
+def _perdidas_plagas(df):
+    # Pérdidas por plagas: las causas de la clase de plagas más las agrupadas en una plaga de la inspección
+    mascara = _de_plagas(df)
+    if 'ClaseCausa' in df.columns:
+        mascara = mascara | (df['ClaseCausa'] == clasificacion.PLAGAS).to_numpy()
+    return df[mascara]
+
+
+def _correlacion(x, y):
+    # Spearman (Pearson sobre los rangos): no supone una relación lineal entre hallazgos y tallos perdidos
+    if len(x) < MIN_PARES_CORRELACION or x.nunique() < 2 or y.nunique() < 2:
+        return np.nan
+    return x.rank().corr(y.rank())
+
+
+def inspeccion_perdidas(cubo_datos, df_inspeccion):
+    """Hallazgos de la inspección frente a las pérdidas por plagas de NCP y NCC, por finca y variedad.
+
+    Las dos partes se agregan a la clave normalizada (clasificacion.clave) de finca y variedad y se
+    unen por ese índice. Si el cubo está filtrado por finca, la inspección se restringe a esas fincas.
+    """
+    if not _tiene(df_inspeccion, 'FINCA_INSP', 'VARIEDAD_INSP'):
+        return Resultado(aviso="La tabla de Inspección de Plagas/Enfermedades está vacía o no tiene las columnas 'FINCA_INSP' y 'VARIEDAD_INSP'.")
+    cubo_produccion = cubo_datos.tablas['produccion']
+    cubo_ncp = cubo_datos.tablas['ncp']
+    cubo_ncc = cubo_datos.tablas['ncc']
+    if not _tiene(cubo_ncp, 'Finca', 'Variedad', 'Tallos'):
+        return Resultado(aviso="No se puede relacionar la inspección con las pérdidas. Asegúrate de que `df_ncp` esté cargado y contenga las columnas 'Finca', 'Variedad' y 'Tallos'.")
+
+    hallazgos = [col for col in HALLAZGOS_INSPECCION if col in df_inspeccion.columns]
+    inspeccion = pd.DataFrame({
+        'ClaveFinca': clasificacion.clave(df_inspeccion['FINCA_INSP']),
+        'ClaveVariedad': clasificacion.clave(df_inspeccion['VARIEDAD_INSP']),
+        'Finca': df_inspeccion['FINCA_INSP'],
+        'Variedad': df_inspeccion['VARIEDAD_INSP'],
+        'TallosEntrada': pd.to_numeric(df_inspeccion.get('TALLOS_ENTRADA_INSP'), errors='coerce'),
+        **{col: pd.to_numeric(df_inspeccion[col], errors='coerce').fillna(0) for col in hallazgos},
+    })
+    filtro = cubo_datos.origen[1] if cubo_datos.origen else None
+    if filtro is not None and filtro.fincas:
+        fincas = clasificacion.clave(pd.Series(filtro.fincas))
+        inspeccion = inspeccion[inspeccion['ClaveFinca'].isin(fincas.dropna())]
+    inspeccion = inspeccion.dropna(subset=['ClaveFinca', 'ClaveVariedad'])
+    if inspeccion.empty:
+        return Resultado(aviso="No hay registros de inspección con finca y variedad para las fincas elegidas.")
+
+    # Lado de la inspección: una fila por clave, con el nombre tal como aparece primero en la tabla
+    tabla = inspeccion.groupby(['ClaveFinca', 'ClaveVariedad'], observed=True).agg(
+        Finca=('Finca', 'first'), Variedad=('Variedad', 'first'), Inspecciones=('Finca', 'size'),
+        TallosEntrada=('TallosEntrada', 'sum'), **{col: (col, 'sum') for col in hallazgos},
+    )
+    tabla['Hallazgos'] = tabla[hallazgos].sum(axis=1)
+
+    # Lado de las pérdidas, con el mismo índice; la unión es por índice y no compara texto
+    ncp_plagas = _perdidas_plagas(cubo_ncp)
+    perdidas = [_por_clave(ncp_plagas, 'Tallos').rename('NCPPlagasTallos')]
+    if _tiene(cubo_ncc, 'Finca', 'Variedad', 'Tallos'):
+        perdidas.append(_por_clave(_perdidas_plagas(cubo_ncc), 'Tallos').rename('NCCPlagasTallos'))
+    if _tiene(cubo_produccion, 'Finca', 'Variedad', 'Tallos'):
+        perdidas.append(_por_clave(cubo_produccion, 'Tallos').rename('ProduccionTallos'))
+    tabla = tabla.join(pd.concat(perdidas, axis=1), how='left')
+    columnas_perdidas = [serie.name for serie in perdidas]
+    tabla[columnas_perdidas] = tabla[columnas_perdidas].fillna(0).astype('int64')
+    # Nombres del cubo donde la clave aparece en NCP; los demás quedan como se escribieron en la inspección
+    nombres = _nombres(cubo_ncp).reindex(tabla.index)
+    tabla['Finca'] = nombres['Finca'].fillna(tabla['Finca'].astype(str))
+    tabla['Variedad'] = nombres['Variedad'].fillna(tabla['Variedad'].astype(str))
+    tabla['IncidenciaInspeccion'] = np.where(tabla['TallosEntrada'] > 0, tabla['Hallazgos'] / tabla['TallosEntrada'].where(tabla['TallosEntrada'] > 0) * 100, np.nan)
+    if 'ProduccionTallos' in tabla.columns:
+        produccion = tabla['ProduccionTallos'].where(tabla['ProduccionTallos'] > 0)
+        tabla['TasaNCPPlagas'] = tabla['NCPPlagasTallos'] / produccion * 100
+
+    # Por plaga: los hallazgos de cada columna frente a las pérdidas de su causa agrupada
+    por_plaga = pd.DataFrame()
+    plagas = {col: plaga for col, plaga in PLAGAS_INSPECCION.items() if col in hallazgos}
+    if plagas and 'CausaAgrupada' in cubo_ncp.columns:
+        por_plaga = tabla[list(plagas)].rename(columns=plagas).rename_axis(columns='Plaga').stack().rename('Hallazgos').to_frame()
+        fuentes = {'NCPTallos': cubo_ncp}
+        if _tiene(cubo_ncc, 'Finca', 'Variedad', 'CausaAgrupada', 'Tallos'):
+            fuentes['NCCTallos'] = cubo_ncc
+        for nombre, df in fuentes.items():
+            por_causa = _por_clave(df[_de_plagas(df)], 'Tallos', ['CausaAgrupada']).rename(nombre).rename_axis(index={'CausaAgrupada': 'Plaga'})
+            por_plaga = por_plaga.join(por_causa, how='left')
+            por_plaga[nombre] = por_plaga[nombre].fillna(0).astype('int64')
+        por_plaga = por_plaga.join(tabla[['Finca', 'Variedad']]).reset_index(drop=False)[['Finca', 'Variedad', 'Plaga', 'Hallazgos', *fuentes]]
+
+    correlaciones = [{'Plaga': 'Todas', 'Pares': len(tabla), 'Correlacion': _correlacion(tabla['Hallazgos'], tabla['NCPPlagasTallos'])}]
+    for plaga, grupo in (por_plaga.groupby('Plaga', sort=False) if not por_plaga.empty else []):
+        correlaciones.append({'Plaga': plaga, 'Pares': len(grupo), 'Correlacion': _correlacion(grupo['Hallazgos'], grupo['NCPTallos'])})
+
+    # Pérdidas por plagas en fincas/variedades que nunca se inspeccionaron (anti-unión por el mismo índice)
+    perdidas_ncp = perdidas[0]
+    if filtro is not None and filtro.fincas:
+        perdidas_ncp = perdidas_ncp[perdidas_ncp.index.get_level_values('ClaveFinca').isin(fincas.dropna())]
+    sin_inspeccion = perdidas_ncp[~perdidas_ncp.index.isin(tabla.index)].sum()
+    con_perdidas = int((tabla['NCPPlagasTallos'] > 0).sum())
+    cifras = {
+        'Combinaciones finca/variedad inspeccionadas': f"{len(tabla)}",
+        'Inspeccionadas con pérdidas por plagas en NCP': f"{con_perdidas} ({con_perdidas / len(tabla):.1%})",
+        'Tallos perdidos por plagas (NCP) en fincas/variedades sin inspección': f"{int(sin_inspeccion)} de {int(perdidas_ncp.sum())}",
+    }
+    tabla = a_texto(tabla.reset_index(drop=True).sort_values('NCPPlagasTallos', ascending=False), 'Finca', 'Variedad')
+    return Resultado(
+        tablas={'finca_variedad': tabla, 'por_plaga': a_texto(por_plaga, 'Finca', 'Variedad', 'Plaga') if not por_plaga.empty else por_plaga,
+                'correlacion': pd.DataFrame(correlaciones)},
+        cifras=cifras,
+    )
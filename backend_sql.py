@@ -0,0 +1,222 @@
+import json
+import os
+import sqlite3
+
+import pandas as pd
+
+import cubo
+
+# 'pandas' (por defecto) agrega en memoria; 'sqlite' o 'duckdb' consultan una base embebida en disco
+BACKEND = os.environ.get('FLORES_BACKEND', 'pandas')
+EXTENSIONES = {'sqlite': '.sqlite', 'duckdb': '.duckdb'}
+DIRECTORIO_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
+# Tablas de registros: se guardan completas y sólo se consultan agregadas
+TABLAS_REGISTROS = ['produccion', 'ncc', 'ncp']
+# Tablas pequeñas de referencia: se leen enteras
+TABLAS_REFERENCIA = ['causa_mapeo', 'inspeccion']
+COLUMNAS_INDICE = ['FechaJornada', 'idFinca', 'idVariedad', 'idCausa']
+
+
+def ruta_base(backend=None):
+    backend = backend or BACKEND
+    return os.environ.get('FLORES_SQL_RUTA') or os.path.join(DIRECTORIO_SQL, 'flores' + EXTENSIONES[backend])
+
+
+def _conectar(backend, ruta, solo_lectura=False):
+    if backend == 'duckdb':
+        try:
+            import duckdb
+        except ImportError as e:
+            raise RuntimeError("FLORES_BACKEND=duckdb requiere el paquete `duckdb` (pip install duckdb).") from e
+        return duckdb.connect(ruta, read_only=solo_lectura)
+    if solo_lectura:
+        return sqlite3.connect(f"file:{ruta}?mode=ro", uri=True, check_same_thread=False)
+    return sqlite3.connect(ruta)
+
+
+def _a_sql(df):
+    """Tipos que ambos motores guardan sin ambigüedad: fechas 'AAAA-MM-DD', horas en segundos, texto."""
+    columnas = {}
+    for col in df.columns:
+        serie = df[col]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            columnas[col] = serie.dt.strftime('%Y-%m-%d')
+        elif pd.api.types.is_timedelta64_dtype(serie):
+            columnas[col] = serie.dt.total_seconds()
+        elif isinstance(serie.dtype, pd.CategoricalDtype):
+            columnas[col] = serie.astype(object)
+    return df.assign(**columnas)
+
+
+def _escribir_tabla(con, backend, nombre, df):
+    df = _a_sql(df)
+    if backend == 'duckdb':
+        con.register('tabla_nueva', df)
+        con.execute(f'CREATE TABLE "{nombre}" AS SELECT * FROM tabla_nueva')
+        con.unregister('tabla_nueva')
+    else:
+        df.to_sql(nombre, con, index=False, chunksize=50_000)
+    if nombre in TABLAS_REGISTROS:
+        for col in COLUMNAS_INDICE:
+            if col in df.columns:
+                con.execute(f'CREATE INDEX "ix_{nombre}_{col}" ON "{nombre}" ("{col}")')
+
+
+def construir(datos, huellas, backend=None, ruta=None):
+    """Guarda las tablas limpias de carga.DatosFlores en la base embebida con sus índices.
+
+    Se escribe en un archivo temporal que reemplaza al anterior sólo cuando está completo.
+    Devuelve {tabla: filas}.
+    """
+    backend = backend or BACKEND
+    ruta = ruta or ruta_base(backend)
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    temporal = ruta + '.tmp'
+    if os.path.exists(temporal):
+        os.remove(temporal)
+    filas, tipos = {}, {}
+    con = _conectar(backend, temporal)
+    try:
+        for nombre in TABLAS_REGISTROS + TABLAS_REFERENCIA:
+            df = getattr(datos, nombre)
+            if df.columns.empty:
+                continue
+            _escribir_tabla(con, backend, nombre, df)
+            filas[nombre] = len(df)
+            if nombre in TABLAS_REGISTROS:
+                tipos[nombre] = {col: str(tipo) for col, tipo in df.dtypes.items()}
+        versiones = {nombre: version for nombre, _, version in huellas}
+        con.execute('CREATE TABLE manifiesto (clave TEXT PRIMARY KEY, valor TEXT)')
+        con.execute('INSERT INTO manifiesto VALUES (?, ?)', ['versiones', json.dumps(versiones)])
+        # Tipos de las tablas limpias: el cubo leído de la base vuelve a ellos (SQL devuelve todo en 64 bits)
+        con.execute('INSERT INTO manifiesto VALUES (?, ?)', ['tipos', json.dumps(tipos)])
+        con.commit()
+    finally:
+        con.close()
+    os.replace(temporal, ruta)
+    return filas
+
+
+def _condiciones(filtro, columnas):
+    """Traduce consultas.Filtro a una cláusula WHERE con parámetros; usa los índices de la tabla."""
+    condiciones, parametros = [], []
+    if filtro is not None and 'FechaJornada' in columnas:
+        if filtro.desde is not None:
+            condiciones.append('"FechaJornada" >= ?')
+            parametros.append(filtro.desde.strftime('%Y-%m-%d'))
+        if filtro.hasta is not None:
+            condiciones.append('"FechaJornada" <= ?')
+            parametros.append(filtro.hasta.strftime('%Y-%m-%d'))
+    if filtro is not None:
+        for col, valores in filtro.valores().items():
+            if valores and col in columnas:
+                condiciones.append(f'"{col}" IN ({", ".join("?" * len(valores))})')
+                parametros.extend(valores)
+    return (' WHERE ' + ' AND '.join(condiciones) if condiciones else ''), parametros
+
+
+class AlmacenSQL:
+    """Consultas de agregación sobre la base embebida.
+
+    Cada consulta abre una conexión de sólo lectura y devuelve únicamente el resultado agregado,
+    así que la memoria de cada sesión no crece con el número de registros.
+    """
+
+    def __init__(self, ruta, backend=None):
+        self.ruta = ruta
+        self.backend = backend or BACKEND
+
+    def consultar(self, sql, parametros=()):
+        con = _conectar(self.backend, self.ruta, solo_lectura=True)
+        try:
+            if self.backend == 'duckdb':
+                return con.execute(sql, list(parametros)).df()
+            return pd.read_sql_query(sql, con, params=list(parametros))
+        finally:
+            con.close()
+
+    def columnas(self, tabla):
+        return list(self.consultar(f'SELECT * FROM "{tabla}" LIMIT 0').columns)
+
+    def vigente(self, huellas):
+        try:
+            valor = self.consultar("SELECT valor FROM manifiesto WHERE clave = 'versiones'")
+        except Exception:
+            return False
+        versiones = {nombre: version for nombre, _, version in huellas}
+        return not valor.empty and json.loads(valor.iloc[0, 0]) == versiones
+
+    def tipos(self):
+        """{tabla: {columna: tipo}} de las tablas de registros al construir la base; vacío en bases anteriores."""
+        try:
+            valor = self.consultar("SELECT valor FROM manifiesto WHERE clave = 'tipos'")
+        except Exception:
+            return {}
+        return json.loads(valor.iloc[0, 0]) if not valor.empty else {}
+
+    def tablas(self):
+        """Tablas para carga.DatosFlores: las de referencia completas y las de registros sin filas."""
+        tablas = {}
+        for nombre in TABLAS_REGISTROS + TABLAS_REFERENCIA:
+            try:
+                consulta = f'SELECT * FROM "{nombre}"' + (' LIMIT 0' if nombre in TABLAS_REGISTROS else '')
+                tablas[nombre] = self.consultar(consulta)
+            except Exception:
+                tablas[nombre] = pd.DataFrame()
+        return tablas
+
+    def _tabla_cubo(self, fuente, filtro, tipos, dimensiones=cubo.DIMENSIONES, medidas=cubo.MEDIDAS):
+        columnas = self.columnas(fuente)
+        if 'Tallos' not in columnas:
+            return pd.DataFrame()
+        con_ramos = 'Ramos' in medidas and 'Ramos' in columnas
+        dimensiones = ', '.join(f'"{col}"' for col in dimensiones if col in columnas)
+        medidas = [f'SUM("{col}") AS "{col}"' for col in medidas if col in columnas]
+        if con_ramos:
+            # Mismas medidas derivadas que cubo._agregar_tabla
+            medidas += [
+                'SUM(CASE WHEN "Ramos" > 0 THEN "Tallos" * 1.0 / "Ramos" ELSE 0 END) AS "TallosPorRamo"',
+                'SUM(CASE WHEN "Ramos" > 0 THEN 1 ELSE 0 END) AS "FilasConRamos"',
+            ]
+        donde, parametros = _condiciones(filtro, columnas)
+        sql = f'SELECT {dimensiones}, {", ".join(medidas)} FROM "{fuente}"{donde} GROUP BY {dimensiones}'
+        return _tipar_cubo(self.consultar(sql, parametros), tipos.get(fuente, {}))
+
+    def cubo(self, filtro=None):
+        """Construye cubo.Cubo agregando en la base, con el filtro aplicado en el WHERE."""
+        tipos = self.tipos()
+        tablas = {}
+        for fuente in cubo.FUENTES:
+            tablas[fuente] = self._tabla_cubo(fuente, filtro, tipos)
+            tablas[cubo.TABLAS_TASAS[fuente]] = self._tabla_cubo(fuente, filtro, tipos, cubo.DIMENSIONES_TASAS, ['Tallos'])
+        return cubo.Cubo(tablas)
+
+
+def _tipar_cubo(df, tipos):
+    # Devuelve los tipos que tendría el cubo calculado con pandas: dimensiones categóricas, la unidad
+    # de las fechas y las medidas en el tipo de la tabla limpia (la suma de pandas lo conserva)
+    for col in df.columns:
+        if col == 'FechaJornada':
+            df[col] = pd.to_datetime(df[col], format='%Y-%m-%d', errors='coerce')
+            if col in tipos:
+                df[col] = df[col].astype(tipos[col])
+        elif col in cubo.DIMENSIONES or col in cubo.DIMENSIONES_TASAS:
+            df[col] = df[col].astype('category')
+        elif col == 'FilasConRamos':
+            df[col] = df[col].astype('int32')
+        elif col in tipos and not df[col].isna().any():
+            df[col] = df[col].astype(tipos[col])
+    return df
+
+
+def abrir(huellas, backend=None):
+    """Devuelve el AlmacenSQL configurado si existe y corresponde a `huellas`; si no, None."""
+    backend = backend or BACKEND
+    if backend not in EXTENSIONES:
+        return None
+    ruta = ruta_base(backend)
+    if not os.path.exists(ruta):
+        return None
+    almacen = AlmacenSQL(ruta, backend)
+    return almacen if almacen.vigente(huellas) else None
@@ -0,0 +1,511 @@
+import datetime
+import glob
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import pandas as pd
+import streamlit as st
+
+import backend_sql
+import clasificacion
+import columnar
+import consultas
+import cubo
+import fechas
+import fuentes
+import incremental
+import ingesta
+import libros
+import perfil
+import ranking
+
+# Con Copy-on-Write las tablas compartidas no se alteran aunque un análisis derive columnas de
+# ellas, así que no hacen falta copias defensivas (en pandas >= 3 siempre está activo)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+# Nombres de los archivos dentro de la fuente de datos configurada (ver fuentes.crear_fuente)
+ARCHIVOS = {
+    'produccion': "Produccion.xlsx",
+    'causa_agrupado': "Causa agrupado.xlsx",
+    'ncc': "NCC.csv",
+    'ncp': "NCP.csv",
+}
+
+# Carpetas con un CSV por finca/mes que, si existen en la fuente, reemplazan a NCC.csv / NCP.csv
+PARTICIONES = {'ncc': "NCC", 'ncp': "NCP"}
+
+# Segundos que un resultado de carga se considera vigente aunque la huella no cambie
+TTL_CACHE = int(os.environ.get('FLORES_CACHE_TTL', 3600))
+# Combinaciones de filtros cuyo cubo se conserva en memoria
+MAX_FILTRADOS = 64
+# Segundos entre revisiones de las fuentes en segundo plano; con 0 se revisan en cada ejecución del tablero
+REFRESCO_SEG = int(os.environ.get('FLORES_REFRESCO_SEG', 0))
+
+# Hilos para descargar y leer los archivos a la vez (la E/S y el parser C de CSV liberan el GIL)
+HILOS_CARGA = int(os.environ.get('FLORES_HILOS_CARGA', 8))
+# Procesos para leer los Excel (openpyxl no libera el GIL); con 0 se leen en hilos. Arrancar los
+# procesos cuesta un par de segundos, así que sólo compensa con libros grandes
+PROCESOS_EXCEL = int(os.environ.get('FLORES_PROCESOS_EXCEL', 0))
+
+log = logging.getLogger('flores.carga')
+
+COLUMNAS_INSPECCION = [
+    'FINCA_INSP', 'VARIEDAD_INSP', 'TALLOS_ENTRADA_INSP',
+    'PORCENTAJE_TALLOS_INSPECCIONADOS', 'THRIPSS', 'ACAROS', 'LEPIDOPTEROS',
+    'AFIDOS', 'MINADOR', 'MOSCA_BLANCA', 'BOTRYTIS', 'OTRO_PROBLEMA', 'OBSERVACIONES_INSP'
+]
+
+
+@dataclass
+class DatosFlores:
+    """Tablas limpias y unidas con el mapeo de causas, más los errores de carga."""
+    produccion: pd.DataFrame
+    causa_mapeo: pd.DataFrame
+    inspeccion: pd.DataFrame
+    ncc: pd.DataFrame
+    ncp: pd.DataFrame
+    errores: dict = field(default_factory=dict)
+    cuarentena: dict = field(default_factory=dict)
+    # 'fuentes' si se procesaron los archivos originales, 'columnar' si se leyó la caché construida
+    origen: str = 'fuentes'
+    # Tablas del cubo (la de la fuente y la de tasas) de las fuentes leídas por lotes; de esas fuentes
+    # sólo se conserva el esquema
+    agregados: dict = field(default_factory=dict)
+    # Segundos de lectura de cada tabla (y de cada partición de NCC/NCP)
+    tiempos: dict = field(default_factory=dict)
+
+
+# Las dos tablas de `Causa agrupado.xlsx`, con los mismos parámetros que pandas.read_excel
+TABLAS_CAUSA_AGRUPADO = {
+    # Parte 1: Tabla de mapeo de causas (Columnas B y C)
+    'causa_mapeo': {'usecols': 'B:C'},
+    # Parte 2: Tabla de inspección de plagas/enfermedades (Desde E3 hasta Qx)
+    'inspeccion': {'header': 2, 'usecols': 'E:Q', 'names': COLUMNAS_INSPECCION},
+}
+
+
+def cargar_produccion(origen):
+    return libros.leer(origen, {'produccion': {}})['produccion']
+
+
+def cargar_causa_agrupado(origen):
+    """Mapeo de causas e inspección de plagas, leídos abriendo el libro una sola vez."""
+    tablas = libros.leer(origen, TABLAS_CAUSA_AGRUPADO)
+    df_causa_mapeo = tablas['causa_mapeo'].rename(columns={'CAUSAS': 'Causa', 'CAUSAS AGRUPADAS': 'CausaAgrupada'})
+    df_causa_mapeo = df_causa_mapeo.drop_duplicates().dropna(subset=['Causa'])
+    df_causa_mapeo['Causa'] = df_causa_mapeo['Causa'].astype(str)
+    return {'causa_mapeo': df_causa_mapeo, 'inspeccion': tablas['inspeccion'].dropna(how='all')}
+
+
+def cargar_causa_mapeo(origen):
+    return cargar_causa_agrupado(origen)['causa_mapeo']
+
+
+def cargar_csv(origen, nombre=None):
+    return ingesta.leer_csv_nc(origen, nombre=nombre)
+
+
+def limpiar(df):
+    """Convierte fechas, causas y cantidades a sus tipos de trabajo."""
+    if df.empty:
+        return df
+    if 'FechaJornada' in df.columns:
+        df['FechaJornada'] = fechas.normalizar_fecha_jornada(df['FechaJornada'])
+    for col in ['Hora', 'HoraSistema']:
+        if col in df.columns:
+            df[col] = fechas.normalizar_hora(df[col])
+    if 'Causa' in df.columns and not isinstance(df['Causa'].dtype, pd.CategoricalDtype):
+        df['Causa'] = df['Causa'].astype(str)
+    # Asegurarse de que las columnas de cantidad sean numéricas (los CSV ya llegan tipados)
+    for col in ['Ramos', 'Tallos']:
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    # Produccion.xlsx llega con texto plano; se codifica igual que NCC/NCP
+    return ingesta.categorizar(df)
+
+
+def unir_causas(df, df_causa_mapeo):
+    if df.empty or df_causa_mapeo.empty:
+        return df
+    # Equivale a un merge 'left' sobre Causa, pero se resuelve una vez por categoría
+    # y no convierte la columna categórica en texto
+    mapeo = df_causa_mapeo.drop_duplicates('Causa').set_index('Causa')['CausaAgrupada']
+    df['CausaAgrupada'] = df['Causa'].map(mapeo).astype('category')
+    return df
+
+
+def preparar_nc(df, df_causa_mapeo):
+    """Limpieza, unión con el mapeo de causas y clasificación de un NCC/NCP recién leído."""
+    return clasificacion.clasificar(unir_causas(limpiar(df), df_causa_mapeo))
+
+
+def _cargar_csv_nc(cuarentena, agregados, tiempos, nombre, mapeo):
+    # `mapeo()` espera al mapeo de causas; sólo la lectura por lotes lo necesita antes de terminar
+    def cargar(origen):
+        if os.path.isdir(origen):
+            return _cargar_particiones(origen, cuarentena, tiempos, nombre)
+        filas = ingesta.filas_por_lote(origen)
+        if filas is None:
+            df, ruta_cuarentena = cargar_csv(origen)
+        else:
+            df, agregados[nombre], ruta_cuarentena = _cargar_por_lotes(origen, nombre, filas, mapeo())
+        if ruta_cuarentena:
+            cuarentena[os.path.basename(origen)] = ruta_cuarentena
+        return df
+    return cargar
+
+
+def _cargar_particiones(directorio, cuarentena, tiempos, nombre):
+    # Un CSV por finca/mes: se leen todos a la vez y se concatenan
+    rutas = sorted(glob.glob(os.path.join(directorio, '*.csv')))
+    if not rutas:
+        raise ValueError(f"{directorio} no tiene archivos .csv")
+    carpeta = os.path.basename(os.path.normpath(directorio))
+    with ThreadPoolExecutor(HILOS_CARGA) as hilos:
+        resultados = list(hilos.map(
+            lambda ruta: _medir(cargar_csv, ruta, f"{carpeta}-{os.path.basename(ruta)}"), rutas))
+    partes = []
+    for ruta, ((df, ruta_cuarentena), segundos) in zip(rutas, resultados):
+        archivo = f"{carpeta}/{os.path.basename(ruta)}"
+        tiempos[archivo] = segundos
+        if ruta_cuarentena:
+            cuarentena[archivo] = ruta_cuarentena
+        partes.append(df)
+    return ingesta.concatenar(partes)
+
+
+def _cargar_por_lotes(origen, nombre, filas, df_causa_mapeo):
+    # Cada lote se limpia, se une con el mapeo y se suma a las tablas del cubo; después se descarta
+    esquema = []
+    tablas = [{}]
+
+    def procesar_lote(lote):
+        lote = preparar_nc(lote, df_causa_mapeo)
+        if not esquema:
+            esquema.append(lote.iloc[:0])
+        tablas[0] = cubo.acumular(tablas[0], nombre, lote)
+
+    ruta_cuarentena = ingesta.leer_csv_nc_por_lotes(origen, filas, procesar_lote)
+    return (esquema[0] if esquema else pd.DataFrame()), tablas[0], ruta_cuarentena
+
+
+def _medir(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def _lanzar(ejecutor, funcion, origen):
+    ruta, version = origen
+    if ruta is None:
+        # Sin archivo la huella trae el motivo, que se informa como error
+        return version
+    return ejecutor.submit(_medir, funcion, ruta)
+
+
+def _esperar(futuro):
+    try:
+        return futuro.result()[0]
+    except Exception:
+        return None
+
+
+def _resultado(errores, tiempos, nombre, futuro):
+    if isinstance(futuro, str):
+        errores[nombre] = futuro
+        return pd.DataFrame()
+    try:
+        df, segundos = futuro.result()
+    except Exception as e:
+        errores[nombre] = str(e)
+        return pd.DataFrame()
+    tiempos[nombre] = segundos
+    return df
+
+
+@st.cache_resource
+def fuente_configurada():
+    # Una sola fuente por proceso para compartir el pool de conexiones HTTP
+    return fuentes.crear_fuente()
+
+
+def huellas_actuales(fuente=None, archivos=None):
+    """Resuelve cada archivo a una ruta local y su huella (tamaño/mtime o ETag).
+
+    Un archivo que ninguna fuente puede servir queda con ruta None y su motivo como huella. Las
+    reglas de clasificación van al final: si cambian, las cachés dejan de estar vigentes.
+    """
+    fuente = fuente or fuente_configurada()
+    # Cada archivo se resuelve (y si hace falta se descarga) en su propio hilo
+    with perfil.etapa("resolver archivos"), ThreadPoolExecutor(HILOS_CARGA) as hilos:
+        huellas = tuple(hilos.map(perfil.propagar(lambda par: _huella(fuente, *par)), sorted((archivos or ARCHIVOS).items())))
+    return huellas + (clasificacion.huella(),)
+
+
+def _huella(fuente, nombre, archivo):
+    try:
+        if nombre in PARTICIONES and hasattr(fuente, 'resolver_directorio'):
+            try:
+                return (nombre, *fuente.resolver_directorio(PARTICIONES[nombre]))
+            except fuentes.FuenteNoDisponible:
+                pass
+        ruta, version = fuente.resolver(archivo)
+    except fuentes.FuenteNoDisponible as e:
+        ruta, version = None, str(e)
+    return nombre, ruta, version
+
+
+def procesar(huellas):
+    """Lee, limpia y une las tablas a partir de las rutas resueltas por huellas_actuales."""
+    origenes = {nombre: (ruta, version) for nombre, ruta, version in huellas}
+    errores = {}
+    cuarentena = {}
+    agregados = {}
+    tiempos = {}
+    # Los Excel y los CSV se leen a la vez; los Excel en procesos si así se configuró
+    procesos = ProcessPoolExecutor(PROCESOS_EXCEL, mp_context=multiprocessing.get_context('spawn')) if PROCESOS_EXCEL else None
+    try:
+        with ThreadPoolExecutor(HILOS_CARGA) as hilos:
+            excel = procesos or hilos
+            futuros = {
+                'produccion': _lanzar(excel, cargar_produccion, origenes['produccion']),
+                'causa_agrupado': _lanzar(excel, cargar_causa_agrupado, origenes['causa_agrupado']),
+            }
+
+            def mapeo():
+                futuro = futuros['causa_agrupado']
+                libro = None if isinstance(futuro, str) else _esperar(futuro)
+                return libro['causa_mapeo'] if libro else pd.DataFrame()
+
+            for nombre in ('ncc', 'ncp'):
+                futuros[nombre] = _lanzar(hilos, _cargar_csv_nc(cuarentena, agregados, tiempos, nombre, mapeo), origenes[nombre])
+            tablas = {nombre: _resultado(errores, tiempos, nombre, futuro) for nombre, futuro in futuros.items()}
+    finally:
+        if procesos is not None:
+            procesos.shutdown()
+    # Un error al leer el libro afecta a sus dos tablas
+    causa_agrupado = tablas.pop('causa_agrupado')
+    error = errores.pop('causa_agrupado', None)
+    for nombre in TABLAS_CAUSA_AGRUPADO:
+        if error:
+            errores[nombre] = error
+        tablas[nombre] = pd.DataFrame() if error else causa_agrupado[nombre]
+    df_produccion, df_causa_mapeo, df_inspeccion, df_ncc, df_ncp = (
+        tablas[nombre] for nombre in ('produccion', 'causa_mapeo', 'inspeccion', 'ncc', 'ncp'))
+
+    ruta_reglas, version_reglas = origenes['reglas']
+    if ruta_reglas is None:
+        errores['reglas'] = version_reglas
+    tabla_reglas = clasificacion.reglas(ruta_reglas)
+    # Las lecturas corrieron en paralelo: se registra lo que midió cada una
+    for nombre, segundos in tiempos.items():
+        perfil.registrar(f"lectura {nombre}", segundos, filas=len(tablas[nombre]) if nombre in tablas else None)
+    registros = (df_produccion, df_ncc, df_ncp)
+    filas = sum(len(df) for df in registros)
+    with perfil.etapa("limpieza", filas):
+        registros = [limpiar(df) for df in registros]
+    with perfil.etapa("unión de causas", filas):
+        registros = [unir_causas(df, df_causa_mapeo) for df in registros]
+    with perfil.etapa("clasificación", filas):
+        df_produccion, df_ncc, df_ncp = [clasificacion.clasificar(df, tabla_reglas) for df in registros]
+    return DatosFlores(df_produccion, df_causa_mapeo, df_inspeccion, df_ncc, df_ncp, errores, cuarentena, agregados=agregados, tiempos=tiempos)
+
+
+def _cargar_datos(huellas):
+    almacen = backend_sql.abrir(huellas)
+    if almacen is not None:
+        # Base SQL de `python cli.py sql`: los registros se quedan en disco y sólo se leen agregados
+        with perfil.etapa("lectura base SQL"):
+            return DatosFlores(**almacen.tablas(), origen='sql')
+    manifiesto = _manifiesto_vigente(huellas)
+    if manifiesto is not None:
+        # Caché columnar construida con `python cli.py construir` para esta misma versión de los archivos
+        with perfil.etapa("lectura caché columnar") as medicion:
+            tablas = columnar.cargar(manifiesto)
+            medicion['filas'] = sum(len(df) for df in tablas.values())
+        return DatosFlores(**tablas, origen='columnar')
+    return procesar(huellas)
+
+
+def _manifiesto_vigente(huellas):
+    manifiesto = columnar.leer_manifiesto()
+    if manifiesto is None or columnar.vigente(manifiesto, huellas):
+        return manifiesto
+    # Si sólo crecieron NCC/NCP se agregan las líneas nuevas a la caché en lugar de reprocesar todo
+    try:
+        with perfil.etapa("actualización incremental") as medicion:
+            medicion['filas'] = sum(incremental.actualizar(huellas, preparar_nc).values())
+    except (incremental.ReconstruccionNecesaria, OSError, ValueError):
+        return None
+    manifiesto = columnar.leer_manifiesto()
+    return manifiesto if columnar.vigente(manifiesto, huellas) else None
+
+
+def _cargar_cubo(huellas, datos):
+    almacen = backend_sql.abrir(huellas)
+    if almacen is not None:
+        with perfil.etapa("cubo en la base SQL"):
+            return almacen.cubo()
+    manifiesto = _manifiesto_vigente(huellas)
+    if manifiesto is not None:
+        with perfil.etapa("lectura cubo guardado"):
+            cubo_guardado = columnar.cargar_cubo(manifiesto)
+        if cubo_guardado is not None:
+            return cubo_guardado
+    with perfil.etapa("cubo", filas=sum(len(getattr(datos, fuente)) for fuente in cubo.FUENTES)):
+        return cubo.construir(datos)
+
+
+def _filtrar(huellas, cubo_completo, filtro):
+    almacen = backend_sql.abrir(huellas)
+    if almacen is not None:
+        # El filtro va en el WHERE y aprovecha los índices de la base
+        with perfil.etapa("filtro en la base SQL"):
+            cubo_filtrado = almacen.cubo(filtro)
+        cubo_filtrado.origen = (cubo_completo, filtro)
+        return cubo_filtrado
+    with perfil.etapa("filtro", filas=sum(len(df) for df in cubo_completo.tablas.values())):
+        return consultas.filtrar_cubo(cubo_completo, filtro)
+
+
+class Instantanea:
+    """Una versión de los datos (tablas, cubo y opciones de filtro) compartida por todo el proceso.
+
+    Todas las sesiones del tablero leen los mismos objetos en lugar de recibir cada una su copia,
+    así que la memoria no crece con el número de usuarios conectados. No se modifica después de
+    armarla: con Copy-on-Write lo que un análisis derive de sus tablas no las altera.
+    """
+
+    def __init__(self, huellas, datos, cubo_datos):
+        self.huellas = huellas
+        self.datos = datos
+        self.cubo = cubo_datos
+        self.opciones = consultas.opciones(cubo_datos)
+        self.creada = time.monotonic()
+        self.armada = datetime.datetime.now()
+        self._filtrados = OrderedDict()
+        self._bloqueo = threading.Lock()
+
+    def vigente(self, huellas):
+        return self.huellas == huellas and time.monotonic() - self.creada < TTL_CACHE
+
+    def cubo_filtrado(self, filtro):
+        """Cubo restringido a `filtro`; cada combinación se calcula una vez para todas las sesiones."""
+        if not filtro.activo():
+            return self.cubo
+        with self._bloqueo:
+            if filtro in self._filtrados:
+                self._filtrados.move_to_end(filtro)
+                return self._filtrados[filtro]
+        # Se filtra sin el bloqueo: otra sesión puede consultar otra combinación mientras tanto
+        cubo_filtrado = _filtrar(self.huellas, self.cubo, filtro)
+        with self._bloqueo:
+            self._filtrados[filtro] = cubo_filtrado
+            while len(self._filtrados) > MAX_FILTRADOS:
+                self._filtrados.popitem(last=False)
+        return cubo_filtrado
+
+
+_instantanea = None
+_bloqueo_instantanea = threading.Lock()
+
+
+def _armar(huellas, forzar=False):
+    """Arma la versión de `huellas` y la deja como vigente, salvo que ya lo sea y no se fuerce."""
+    global _instantanea
+    with _bloqueo_instantanea:
+        # Otra sesión (o el refresco) pudo haberla armado mientras se esperaba el bloqueo
+        actual = _instantanea
+        if not forzar and actual is not None and actual.vigente(huellas):
+            return actual
+        datos = _cargar_datos(huellas)
+        cubo_datos = _cargar_cubo(huellas, datos)
+        # Los rankings se guardan en el cubo: se liberan con él cuando esta versión deja de usarse
+        cubo_datos.rankings = ranking.Indice()
+        nueva = Instantanea(huellas, datos, cubo_datos)
+        _instantanea = nueva
+        return nueva
+
+
+def instantanea(huellas=None):
+    """Devuelve la versión de los datos de `huellas`, armándola si todavía no es la vigente.
+
+    La versión nueva se arma una sola vez aunque varias sesiones la pidan a la vez, y reemplaza a
+    la anterior de un solo paso: las ejecuciones que ya tenían la anterior terminan con ella y se
+    libera cuando dejan de usarla. Una ejecución debe pedirla una vez y usar siempre esa.
+    """
+    huellas = huellas or huellas_actuales()
+    actual = _instantanea
+    if actual is not None and actual.vigente(huellas):
+        return actual
+    with st.spinner("Cargando y procesando datos..."):
+        return _armar(huellas)
+
+
+def ultima_instantanea():
+    """Última versión armada, sin revisar las fuentes (None si todavía no hay ninguna)."""
+    return _instantanea
+
+
+class Refresco:
+    """Hilo que revisa las fuentes cada `intervalo` segundos y arma y promueve la versión nueva.
+
+    Descargar, limpiar y agregar ocurre fuera de las ejecuciones del tablero: las páginas siguen
+    usando la versión anterior hasta que la nueva está completa. Si una revisión falla se conserva
+    la versión vigente y el error queda en `error` hasta la siguiente revisión correcta.
+    """
+
+    def __init__(self, fuente, intervalo):
+        self.fuente = fuente
+        self.intervalo = intervalo
+        self.ultima_revision = None
+        self.error = None
+        self._forzar = threading.Event()
+        self._despertar = threading.Event()
+        self._hilo = threading.Thread(target=self._ciclo, name='flores-refresco', daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+        return self
+
+    def solicitar(self, forzar=False):
+        """Adelanta la próxima revisión; con `forzar` rearma los datos aunque no hayan cambiado."""
+        if forzar:
+            self._forzar.set()
+        self._despertar.set()
+
+    def _ciclo(self):
+        while True:
+            # Sólo se baja si estaba puesta: una solicitud que llegue después queda para la vuelta siguiente
+            forzar = self._forzar.is_set()
+            if forzar:
+                self._forzar.clear()
+            try:
+                with perfil.etapa("refresco en segundo plano"):
+                    _armar(huellas_actuales(self.fuente), forzar)
+                self.error = None
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                log.exception("Falló el refresco de los datos")
+            self.ultima_revision = datetime.datetime.now()
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+
+
+@st.cache_resource
+def refresco():
+    # Un solo hilo de refresco por proceso, compartido por todas las sesiones
+    return Refresco(fuente_configurada(), REFRESCO_SEG).iniciar()
+
+
+def invalidar_cache():
+    global _instantanea
+    with _bloqueo_instantanea:
+        _instantanea = None
@@ -0,0 +1,101 @@
+import functools
+import os
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Archivo de reglas (Campo;Clase;Valor): cada fila asigna un valor de `Campo` a una clase
+RUTA_REGLAS = os.environ.get(
+    'FLORES_REGLAS',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reglas_clasificacion.csv'),
+)
+# Clases que consultan los análisis
+ALTA_CALIDAD = 'Alta calidad'
+PLAGAS = 'Plagas/Enfermedades'
+MARCACION = 'Marcación'
+
+
+def normalizar(texto):
+    """'Marcación  incorrecta' -> 'MARCACIONINCORRECTA': sin tildes, en mayúsculas y sólo letras y números."""
+    sin_tildes = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^0-9A-Z]', '', sin_tildes.upper())
+
+
+def columna(campo):
+    """Nombre de la columna con la clase de `campo` (p. ej. ClaseCausa)."""
+    return 'Clase' + campo
+
+
+def huella(ruta=None):
+    """(nombre, ruta, versión) del archivo de reglas, en el formato de carga.huellas_actuales."""
+    ruta = ruta or RUTA_REGLAS
+    try:
+        estado = os.stat(ruta)
+    except OSError:
+        return 'reglas', None, f"{os.path.basename(ruta)} no existe en {os.path.dirname(ruta)}"
+    return 'reglas', ruta, f"{estado.st_size}-{estado.st_mtime_ns}"
+
+
+@functools.lru_cache(maxsize=4)
+def _leer(ruta, version):
+    reglas = pd.read_csv(ruta, sep=';', dtype=str, encoding='utf-8-sig').dropna()
+    return reglas.assign(Clave=reglas['Valor'].map(normalizar))
+
+
+def reglas(ruta=None):
+    """Tabla de reglas (Campo, Clase, Valor, Clave normalizada); vacía si el archivo no existe."""
+    _, ruta, version = huella(ruta)
+    if ruta is None:
+        return pd.DataFrame(columns=['Campo', 'Clase', 'Valor', 'Clave'])
+    return _leer(ruta, version)
+
+
+def valores(campo, clase, tabla=None):
+    """Valores del archivo de reglas asignados a `clase` en `campo`, para mostrarlos en los análisis."""
+    tabla = reglas() if tabla is None else tabla
+    return tabla.loc[(tabla['Campo'] == campo) & (tabla['Clase'] == clase), 'Valor'].tolist()
+
+
+def _codificar(serie, reglas_campo):
+    clases = list(dict.fromkeys(reglas_campo['Clase']))
+    codigos = dict(zip(reglas_campo['Clave'], reglas_campo['Clase'].map(clases.index)))
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype('category')
+    # Se normaliza una vez cada categoría distinta; el último elemento atiende a los valores vacíos (código -1)
+    tabla = np.array([codigos.get(normalizar(c), -1) for c in serie.cat.categories] + [-1], dtype=np.int8)
+    return pd.Categorical.from_codes(tabla[serie.cat.codes.to_numpy()], categories=clases)
+
+
+def clave(serie):
+    """Categórica con normalizar() de cada valor de `serie`, para unir tablas que escriben distinto un nombre.
+
+    Como en _codificar, cada valor distinto se normaliza una sola vez y las filas sólo toman su código.
+    Los valores vacíos (o sin letras ni números) quedan vacíos.
+    """
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype('category')
+    # Un código numérico leído del Excel como 16118.0 debe dar la misma clave que '16118'
+    normalizadas = pd.Index([normalizar(int(c) if isinstance(c, float) and c.is_integer() else c) for c in serie.cat.categories], dtype=object)
+    claves = normalizadas[normalizadas != ''].unique()
+    tabla = np.append(claves.get_indexer(normalizadas), -1)
+    return pd.Series(pd.Categorical.from_codes(tabla[serie.cat.codes.to_numpy()], categories=claves), index=serie.index, name=serie.name)
+
+
+def clasificar(df, tabla=None):
+    """Agrega a `df` una columna categórica Clase<Campo> por cada campo con reglas que tenga.
+
+    Los valores se comparan sin tildes, mayúsculas ni espacios, así que 'MARCACION INCORRECTA' y
+    'Marcación incorrecta' caen en la misma clase. Los valores sin regla quedan vacíos. Los análisis
+    filtran por estas columnas en lugar de comparar listas de texto.
+    """
+    tabla = reglas() if tabla is None else tabla
+    if df.empty:
+        return df
+    nuevas = {
+        columna(campo): _codificar(df[campo], reglas_campo)
+        for campo, reglas_campo in tabla.groupby('Campo', sort=False)
+        if campo in df.columns
+    }
+    return df.assign(**nuevas) if nuevas else df
@@ -0,0 +1,175 @@
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+import backend_sql
+import carga
+import columnar
+import cubo
+import fuentes
+import incremental
+import informe
+import memoria
+import rendimiento
+
+
+def construir(args):
+    huellas = carga.huellas_actuales(fuentes.crear_fuente())
+    # Posición leída de NCC/NCP, tomada antes de procesar para que `incremental` siga desde ahí;
+    # las carpetas de particiones no se actualizan por el final
+    estados = {
+        nombre: incremental.estado_archivo(ruta)
+        for nombre, ruta, _ in huellas if nombre in incremental.TABLAS_INCREMENTALES and ruta and os.path.isfile(ruta)
+    }
+    datos = carga.procesar(huellas)
+    if datos.errores:
+        for nombre, error in datos.errores.items():
+            print(f"Error en {nombre}: {error}", file=sys.stderr)
+        return 1
+    tablas = {nombre: getattr(datos, nombre) for nombre in columnar.TABLAS}
+    manifiesto = columnar.construir(tablas, huellas, args.directorio, args.formato, cubo.construir(datos), estados)
+    for nombre, info in manifiesto['tablas'].items():
+        print(f"{nombre}: {info['filas']} filas -> {info['archivo']}")
+    return 0
+
+
+def actualizar_incremental(args):
+    huellas = carga.huellas_actuales(fuentes.crear_fuente())
+    try:
+        agregadas = incremental.actualizar(huellas, carga.preparar_nc, args.directorio)
+    except incremental.ReconstruccionNecesaria as e:
+        print(f"Se reconstruye la caché completa: {e}", file=sys.stderr)
+        return construir(args)
+    for nombre, filas in agregadas.items():
+        print(f"{nombre}: {filas} filas nuevas")
+    if not agregadas:
+        print("No hay líneas nuevas en NCC/NCP.")
+    return 0
+
+
+def construir_sql(args):
+    huellas = carga.huellas_actuales(fuentes.crear_fuente())
+    datos = carga.procesar(huellas)
+    if datos.errores:
+        for nombre, error in datos.errores.items():
+            print(f"Error en {nombre}: {error}", file=sys.stderr)
+        return 1
+    ruta = args.ruta or backend_sql.ruta_base(args.backend)
+    filas = backend_sql.construir(datos, huellas, args.backend, ruta)
+    for nombre, n in filas.items():
+        print(f"{nombre}: {n} filas -> {ruta}")
+    return 0
+
+
+def informe_memoria(args):
+    rutas = {nombre: ruta for nombre, ruta, _ in carga.huellas_actuales(fuentes.crear_fuente())}
+    faltantes = [nombre for nombre in ('ncc', 'ncp', 'causa_agrupado') if rutas.get(nombre) is None]
+    if faltantes:
+        print(f"No se encontraron: {', '.join(faltantes)}", file=sys.stderr)
+        return 1
+    resultado = memoria.informe(rutas)
+    print(resultado.to_string(index=False))
+    if 'Error' in resultado.columns:
+        print(f"Fallaron: {', '.join(resultado.loc[resultado['Error'].notna(), 'Escenario'])}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def medir_rendimiento(args):
+    rutas = {nombre: ruta for nombre, ruta, _ in carga.huellas_actuales(fuentes.crear_fuente())}
+    faltantes = [nombre for nombre in carga.ARCHIVOS if rutas.get(nombre) is None or os.path.isdir(rutas[nombre])]
+    if faltantes:
+        print(f"No se encontraron como archivo: {', '.join(faltantes)}", file=sys.stderr)
+        return 1
+    informe = rendimiento.ejecutar(args.filas, rutas, args.directorio, not args.sin_secciones, args.semilla)
+    for filas, motivo in informe['fallidas'].items():
+        print(f"Escala de {filas} filas: {motivo}", file=sys.stderr)
+    if not informe['resultados']:
+        return 1
+    with pd.option_context('display.width', 200, 'display.max_rows', None):
+        print(rendimiento.tabla(informe).to_string())
+    print(f"Pico de RSS por escala (MiB): {informe['pico_rss_mb']}")
+    print(f"Resultados guardados en {rendimiento.guardar(informe, args.salida)}")
+    if args.comparar:
+        cambios = rendimiento.comparar(rendimiento.leer(args.comparar), informe, args.umbral)
+        print(cambios.to_string(index=False))
+        if cambios['regresion'].any():
+            print(f"{int(cambios['regresion'].sum())} etapas más lentas que en {args.comparar}", file=sys.stderr)
+            return 1
+    return 1 if informe['fallidas'] else 0
+
+
+def generar_informes(args):
+    huellas = carga.huellas_actuales(fuentes.crear_fuente())
+    instantanea = carga.instantanea(huellas)
+    datos = instantanea.datos
+    if datos.errores:
+        for nombre, error in datos.errores.items():
+            print(f"Error en {nombre}: {error}", file=sys.stderr)
+        return 1
+    cubo_datos = instantanea.cubo
+    disponibles = informe.fincas_disponibles(cubo_datos)
+    desconocidas = [finca for finca in args.fincas or [] if finca not in disponibles]
+    if desconocidas:
+        print(f"Fincas sin datos: {', '.join(desconocidas)}", file=sys.stderr)
+        return 1
+    resultados = informe.generar(cubo_datos, datos.inspeccion, args.fincas, args.formato, args.directorio, args.procesos)
+    fallidas = 0
+    for finca, resultado in resultados.items():
+        if isinstance(resultado, Exception):
+            fallidas += 1
+            print(f"{finca}: error: {resultado}", file=sys.stderr)
+        else:
+            print(f"{finca}: {resultado}")
+    return 1 if fallidas else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tareas fuera del tablero de Streamlit.")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    p_construir = subparsers.add_parser('construir', help="Materializa las tablas limpias en la caché columnar.")
+    p_construir.add_argument('--formato', choices=sorted(columnar.EXTENSIONES), default='feather')
+    p_construir.add_argument('--directorio', default=None, help="Por defecto FLORES_COLUMNAR_DIR o .cache/columnar")
+    p_construir.set_defaults(funcion=construir)
+
+    p_incremental = subparsers.add_parser('incremental', help="Agrega a la caché columnar sólo las líneas nuevas de NCC/NCP.")
+    p_incremental.add_argument('--formato', choices=sorted(columnar.EXTENSIONES), default='feather',
+                               help="Formato si hace falta reconstruir la caché completa")
+    p_incremental.add_argument('--directorio', default=None, help="Por defecto FLORES_COLUMNAR_DIR o .cache/columnar")
+    p_incremental.set_defaults(funcion=actualizar_incremental)
+
+    p_sql = subparsers.add_parser('sql', help="Guarda las tablas limpias en una base SQLite o DuckDB embebida.")
+    p_sql.add_argument('--backend', choices=sorted(backend_sql.EXTENSIONES), default='sqlite')
+    p_sql.add_argument('--ruta', default=None, help="Por defecto FLORES_SQL_RUTA o .cache/flores.<backend>")
+    p_sql.set_defaults(funcion=construir_sql)
+
+    p_memoria = subparsers.add_parser('memoria', help="Compara el pico de RSS de la carga y análisis de NCC/NCP antes y después del cubo.")
+    p_memoria.set_defaults(funcion=informe_memoria)
+
+    p_rendimiento = subparsers.add_parser('rendimiento', help="Mide cada etapa y cada análisis sobre datos sintéticos de varios tamaños.")
+    p_rendimiento.add_argument('--filas', type=int, nargs='+', default=rendimiento.ESCALAS,
+                               help=f"Registros de NCC/NCP/Producción por escala (hasta {rendimiento.MAX_FILAS})")
+    p_rendimiento.add_argument('--directorio', default=None, help="Dónde se generan los datos; por defecto .cache/rendimiento/datos")
+    p_rendimiento.add_argument('--semilla', type=int, default=0)
+    p_rendimiento.add_argument('--sin-secciones', action='store_true', help="Mide sólo la carga, el cubo y el filtro")
+    p_rendimiento.add_argument('--salida', default=None, help="Archivo JSON de resultados; por defecto .cache/rendimiento/")
+    p_rendimiento.add_argument('--comparar', default=None, help="JSON de una medición anterior; sale con error si hay regresiones")
+    p_rendimiento.add_argument('--umbral', type=float, default=0.2, help="Aumento relativo de tiempo que se considera regresión")
+    p_rendimiento.set_defaults(funcion=medir_rendimiento)
+
+    p_informe = subparsers.add_parser('informe', help="Escribe un informe HTML o PDF de todas las Problemáticas por finca.")
+    p_informe.add_argument('--fincas', nargs='+', default=None, help="Por defecto todas las fincas con datos")
+    p_informe.add_argument('--formato', choices=informe.FORMATOS, default='html')
+    p_informe.add_argument('--directorio', default=None, help="Por defecto FLORES_INFORMES_DIR o .cache/informes")
+    p_informe.add_argument('--procesos', type=int, default=None, help="Por defecto FLORES_PROCESOS_INFORMES o un proceso por CPU")
+    p_informe.set_defaults(funcion=generar_informes)
+
+    args = parser.parse_args(argv)
+    return args.funcion(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import json
+import os
+import time
+
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+import cubo
+import ingesta
+
+DIRECTORIO_COLUMNAR = os.environ.get(
+    'FLORES_COLUMNAR_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'columnar'),
+)
+MANIFIESTO = 'manifiesto.json'
+TABLAS = ['produccion', 'causa_mapeo', 'inspeccion', 'ncc', 'ncp']
+EXTENSIONES = {'feather': '.feather', 'parquet': '.parquet'}
+
+
+def _version(huellas):
+    # Sólo cuentan las versiones: la misma caché vale aunque el archivo se lea desde otra ruta
+    return {nombre: version for nombre, _, version in huellas}
+
+
+def _escribir(df, directorio, archivo, formato):
+    ruta = os.path.join(directorio, archivo)
+    temporal = ruta + '.tmp'
+    if formato == 'feather':
+        df.to_feather(temporal, compression='uncompressed')
+    else:
+        df.to_parquet(temporal, index=False)
+    os.replace(temporal, ruta)
+
+
+def guardar_manifiesto(manifiesto, directorio=None):
+    # El manifiesto se escribe al final: sin él (o con otro contenido) la caché no se usa
+    ruta = os.path.join(directorio or DIRECTORIO_COLUMNAR, MANIFIESTO)
+    with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+    os.replace(ruta + '.tmp', ruta)
+
+
+def construir(tablas, huellas, directorio=None, formato='feather', cubo_datos=None, incremental=None):
+    """Escribe las tablas limpias en formato columnar junto a un manifiesto con su versión de origen.
+
+    Feather se escribe sin compresión para poder mapearlo en memoria al cargar; Parquet ocupa
+    menos en disco pero siempre se descomprime. Si se pasa `cubo_datos` también se guardan sus
+    tablas, e `incremental` es el estado que usa incremental.actualizar para leer sólo lo nuevo.
+    """
+    directorio = directorio or DIRECTORIO_COLUMNAR
+    os.makedirs(directorio, exist_ok=True)
+    extension = EXTENSIONES[formato]
+    escritas = {}
+    for nombre in TABLAS:
+        df = ingesta.categorizar(tablas[nombre].reset_index(drop=True))
+        _escribir(df, directorio, nombre + extension, formato)
+        escritas[nombre] = {'archivo': nombre + extension, 'filas': len(df), 'partes': []}
+    manifiesto = {
+        'formato': formato,
+        'creado': time.time(),
+        'versiones': _version(huellas),
+        'tablas': escritas,
+        'cubo': {},
+        'incremental': incremental or {},
+    }
+    if cubo_datos is not None:
+        escribir_cubo(cubo_datos, manifiesto, directorio)
+    guardar_manifiesto(manifiesto, directorio)
+    return manifiesto
+
+
+def escribir_parte(nombre, df, manifiesto, directorio=None):
+    """Agrega `df` a la tabla `nombre` como un archivo más; actualiza el manifiesto sin guardarlo."""
+    directorio = directorio or DIRECTORIO_COLUMNAR
+    info = manifiesto['tablas'][nombre]
+    partes = info.setdefault('partes', [])
+    archivo = f"{nombre}.parte-{len(partes) + 1:04d}{EXTENSIONES[manifiesto['formato']]}"
+    _escribir(ingesta.categorizar(df.reset_index(drop=True)), directorio, archivo, manifiesto['formato'])
+    partes.append(archivo)
+    info['filas'] += len(df)
+
+
+def escribir_cubo(cubo_datos, manifiesto, directorio=None):
+    """Guarda las tablas del cubo y las registra en el manifiesto sin guardarlo."""
+    directorio = directorio or DIRECTORIO_COLUMNAR
+    for fuente, df in cubo_datos.tablas.items():
+        archivo = f"cubo_{fuente}{EXTENSIONES[manifiesto['formato']]}"
+        _escribir(df.reset_index(drop=True), directorio, archivo, manifiesto['formato'])
+        manifiesto['cubo'][fuente] = archivo
+    manifiesto['dimensiones_cubo'] = cubo.DIMENSIONES
+    manifiesto['dimensiones_tasas'] = cubo.DIMENSIONES_TASAS
+
+
+def leer_manifiesto(directorio=None):
+    try:
+        with open(os.path.join(directorio or DIRECTORIO_COLUMNAR, MANIFIESTO), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def vigente(manifiesto, huellas):
+    return manifiesto is not None and manifiesto.get('versiones') == _version(huellas)
+
+
+def _leer_tabla(ruta, formato):
+    if formato == 'feather':
+        # memory_map + split_blocks: las columnas numéricas sin nulos se usan sin copiar
+        tabla = feather.read_table(ruta, memory_map=True)
+    else:
+        tabla = pq.read_table(ruta, memory_map=True)
+    return tabla.to_pandas(split_blocks=True)
+
+
+def cargar(manifiesto, directorio=None, tablas=None):
+    """Lee las tablas descritas en el manifiesto (todas o sólo `tablas`), con sus partes.
+
+    Devuelve {nombre: DataFrame}.
+    """
+    directorio = directorio or DIRECTORIO_COLUMNAR
+    return {
+        nombre: ingesta.concatenar([
+            _leer_tabla(os.path.join(directorio, archivo), manifiesto['formato'])
+            for archivo in [info['archivo']] + info.get('partes', [])
+        ])
+        for nombre, info in manifiesto['tablas'].items()
+        if tablas is None or nombre in tablas
+    }
+
+
+def cubo_vigente(manifiesto):
+    """True si el manifiesto guarda todas las tablas del cubo con las dimensiones actuales."""
+    archivos = manifiesto.get('cubo') or {}
+    return (
+        set(archivos) == set(cubo.FUENTES) | set(cubo.TABLAS_TASAS.values())
+        and manifiesto.get('dimensiones_cubo') == cubo.DIMENSIONES
+        and manifiesto.get('dimensiones_tasas') == cubo.DIMENSIONES_TASAS
+    )
+
+
+def cargar_cubo(manifiesto, directorio=None):
+    """Devuelve el cubo guardado con el manifiesto, o None si la caché no lo incluye o se guardó
+    con otras dimensiones."""
+    directorio = directorio or DIRECTORIO_COLUMNAR
+    archivos = manifiesto.get('cubo') or {}
+    if not cubo_vigente(manifiesto):
+        return None
+    return cubo.Cubo({
+        fuente: _leer_tabla(os.path.join(directorio, archivo), manifiesto['formato'])
+        for fuente, archivo in archivos.items()
+    })
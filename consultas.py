@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import cubo
+
+# Dimensiones que se pueden filtrar desde la barra lateral (además del rango de fechas)
+DIMENSIONES_FILTRO = ['Finca', 'Producto', 'Grado']
+
+
+@dataclass(frozen=True)
+class Filtro:
+    """Combinación de filtros elegida en la barra lateral.
+
+    Es inmutable y hashable para poder usarse como clave de caché: cada combinación distinta
+    se calcula una sola vez. Una tupla vacía significa "todos los valores".
+    """
+
+    desde: pd.Timestamp = None
+    hasta: pd.Timestamp = None
+    fincas: tuple = ()
+    productos: tuple = ()
+    grados: tuple = ()
+
+    def valores(self):
+        return {'Finca': self.fincas, 'Producto': self.productos, 'Grado': self.grados}
+
+    def activo(self):
+        return self.desde is not None or self.hasta is not None or any(self.valores().values())
+
+
+def _mascara_valores(serie, valores):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Se comparan los códigos enteros, no el texto: sólo se busca cada valor una vez en las categorías
+        codigos = serie.cat.categories.get_indexer(list(valores))
+        return np.isin(serie.cat.codes.to_numpy(), codigos[codigos >= 0])
+    return serie.isin(valores).to_numpy()
+
+
+def mascara(df, filtro):
+    """Máscara booleana de las filas de `df` que cumplen `filtro`.
+
+    Las dimensiones que la tabla no tiene no restringen sus filas.
+    """
+    seleccion = np.ones(len(df), dtype=bool)
+    if 'FechaJornada' in df.columns:
+        fechas = df['FechaJornada']
+        if filtro.desde is not None:
+            seleccion &= (fechas >= filtro.desde).to_numpy()
+        if filtro.hasta is not None:
+            seleccion &= (fechas <= filtro.hasta).to_numpy()
+    for col, valores in filtro.valores().items():
+        if valores and col in df.columns:
+            seleccion &= _mascara_valores(df[col], valores)
+    return seleccion
+
+
+def filtrar_cubo(cubo_datos, filtro):
+    """Devuelve un cubo con las mismas tablas restringidas a `filtro`.
+
+    Todas las secciones consultan este cubo, así que el filtro se aplica una vez sobre los
+    agregados diarios y no en cada análisis sobre los registros originales.
+    """
+    if not filtro.activo():
+        return cubo_datos
+    tablas = {}
+    for fuente, df in cubo_datos.tablas.items():
+        tablas[fuente] = df[mascara(df, filtro)].reset_index(drop=True) if not df.empty else df
+    return cubo.Cubo(tablas, origen=(cubo_datos, filtro))
+
+
+def opciones(cubo_datos):
+    """Valores disponibles para cada filtro y rango de fechas (mínimo, máximo) del cubo."""
+    valores = {col: set() for col in DIMENSIONES_FILTRO}
+    minimos, maximos = [], []
+    for df in cubo_datos.tablas.values():
+        for col in DIMENSIONES_FILTRO:
+            if col in df.columns:
+                valores[col].update(df[col].dropna().unique())
+        if 'FechaJornada' in df.columns and df['FechaJornada'].notna().any():
+            minimos.append(df['FechaJornada'].min())
+            maximos.append(df['FechaJornada'].max())
+    rango = (min(minimos), max(maximos)) if minimos else (None, None)
+    return {col: sorted(map(str, vals)) for col, vals in valores.items()}, rango
@@ -0,0 +1,108 @@
+import pandas as pd
+
+# Grano del cubo: un registro por día y combinación de dimensiones presentes en cada tabla
+DIMENSIONES = [
+    'FechaJornada', 'Postcosecha', 'Finca', 'Producto', 'ProductoMaestro',
+    'Variedad', 'Grado', 'Causa', 'CausaAgrupada',
+    # Clases de clasificacion.py: dependen de Grado/Causa, así que no agregan grupos
+    'ClaseGrado', 'ClaseCausa',
+]
+MEDIDAS = ['Tallos', 'Ramos']
+FUENTES = ['produccion', 'ncc', 'ncp']
+# Grano de las tablas de tasas (tasas.py): la jerarquía con Bloque, sin causas y sólo con Tallos.
+# Bloque multiplica los grupos, así que no entra en las tablas que recorren los demás análisis
+DIMENSIONES_TASAS = ['FechaJornada', 'Finca', 'Bloque', 'Producto', 'ProductoMaestro', 'Variedad', 'Grado']
+TABLAS_TASAS = {fuente: 'tasas_' + fuente for fuente in FUENTES}
+
+
+class Cubo:
+    """Sumas de Tallos y Ramos por día y dimensión, una tabla por fuente (produccion, ncc, ncp).
+
+    Con Ramos también se guardan TallosPorRamo (suma de Tallos/Ramos por registro) y
+    FilasConRamos, para poder promediar la relación por registro desde el cubo.
+
+    Los análisis agregan sobre el cubo en lugar de recorrer las filas originales, así que su
+    costo depende del número de grupos y no del número de registros. Las tablas tasas_<fuente>
+    (TABLAS_TASAS) guardan Tallos al grano de DIMENSIONES_TASAS para el motor de tasas.
+
+    En los cubos filtrados `origen` es (cubo completo, consultas.Filtro): así los índices del
+    cubo completo (`rankings`, un ranking.Indice que carga._armar arma junto con él) también
+    les sirven.
+    """
+
+    def __init__(self, tablas, origen=None):
+        self.tablas = tablas
+        self.origen = origen
+        self.rankings = None
+
+
+def _agregar_tabla(df, dimensiones=DIMENSIONES, medidas=MEDIDAS):
+    if df.empty or 'Tallos' not in df.columns:
+        return pd.DataFrame()
+    dimensiones = [col for col in dimensiones if col in df.columns]
+    medidas = [col for col in medidas if col in df.columns]
+    base = df[dimensiones + medidas]
+    if 'FechaJornada' in dimensiones and pd.api.types.is_datetime64_any_dtype(base['FechaJornada']):
+        base = base.assign(FechaJornada=base['FechaJornada'].dt.normalize())
+    if 'Ramos' in medidas:
+        # Para promediar Tallos/Ramos por registro se guardan su suma y el número de registros
+        con_ramos = base['Ramos'] > 0
+        base = base.assign(
+            TallosPorRamo=(base['Tallos'] / base['Ramos'].where(con_ramos)).fillna(0),
+            FilasConRamos=con_ramos.astype('int32'),
+        )
+        medidas = medidas + ['TallosPorRamo', 'FilasConRamos']
+    # dropna=False conserva las filas con dimensiones vacías (p. ej. causas sin agrupar);
+    # al agregar sobre el cubo se descartan como haría un groupby sobre los datos originales
+    return base.groupby(dimensiones, observed=True, dropna=False)[medidas].sum().reset_index()
+
+
+def agregar(fuente, df):
+    """Tablas del cubo de los registros limpios `df` de `fuente`: la suya y la de tasas."""
+    return {fuente: _agregar_tabla(df), TABLAS_TASAS[fuente]: _agregar_tabla(df, DIMENSIONES_TASAS, ['Tallos'])}
+
+
+def construir(datos):
+    """Construye el cubo a partir de las tablas limpias de carga.DatosFlores.
+
+    Las fuentes leídas por lotes (datos.agregados) ya traen sus tablas del cubo calculadas.
+    """
+    tablas = {}
+    for fuente in FUENTES:
+        tablas.update(datos.agregados[fuente] if fuente in datos.agregados else agregar(fuente, getattr(datos, fuente)))
+    return Cubo(tablas)
+
+
+def _sumar_tablas(actual, nueva):
+    if actual.empty:
+        return nueva
+    if nueva.empty:
+        return actual
+    dimensiones = [col for col in actual.columns if col in DIMENSIONES or col in DIMENSIONES_TASAS]
+    unida = pd.concat([actual, nueva], ignore_index=True)
+    sumada = unida.groupby(dimensiones, observed=True, dropna=False, sort=False).sum().reset_index()
+    for col in dimensiones:
+        if isinstance(actual[col].dtype, pd.CategoricalDtype):
+            sumada[col] = sumada[col].astype('category')
+    return sumada
+
+
+def acumular(tablas, fuente, df):
+    """Suma a las tablas del cubo de `fuente` ({nombre: tabla}) los registros limpios de `df`
+    (p. ej. un lote de un CSV)."""
+    return {
+        nombre: _sumar_tablas(tablas.get(nombre, pd.DataFrame()), nueva)
+        for nombre, nueva in agregar(fuente, df).items()
+    }
+
+
+def sumar(cubo_datos, tablas_nuevas):
+    """Suma al cubo los registros nuevos de cada fuente ({fuente: DataFrame limpio}).
+
+    Sólo se agregan los registros nuevos; después se combinan con el cubo, cuyo tamaño depende
+    del número de grupos y no del historial de registros.
+    """
+    tablas = dict(cubo_datos.tablas)
+    for fuente, df in tablas_nuevas.items():
+        tablas.update(acumular(tablas, fuente, df))
+    return Cubo(tablas)
@@ -0,0 +1,98 @@
+import pandas as pd
+
+# Día 0 de los seriales de fecha de Excel (incluye el 29/02/1900 ficticio de Lotus)
+ORIGEN_EXCEL = pd.Timestamp('1899-12-30')
+
+FORMATOS_TEXTO = {'dmy': '%d/%m/%Y', 'iso': 'ISO8601'}
+_SERIAL = r'\d+(?:\.\d+)?'
+
+
+def detectar_formato_fecha(serie):
+    """Devuelve 'datetime', 'serial_excel', 'dmy', 'iso' o 'mixto' según cómo viene codificada la fecha.
+
+    'mixto' corresponde a exportaciones que combinan seriales de Excel con texto d/m/Y.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return 'datetime'
+    if pd.api.types.is_numeric_dtype(serie):
+        return 'serial_excel'
+    valores = serie.cat.categories if isinstance(serie.dtype, pd.CategoricalDtype) else serie.dropna().unique()
+    texto = pd.Series(valores, dtype=object).astype(str).str.strip()
+    texto = texto[texto != '']
+    if texto.empty:
+        return 'iso'
+    es_serial = texto.str.fullmatch(_SERIAL)
+    if es_serial.all():
+        return 'serial_excel'
+    formato = 'dmy' if texto[~es_serial].str.contains('/').any() else 'iso'
+    return 'mixto' if es_serial.any() else formato
+
+
+def _desde_serial(valores):
+    dias = pd.to_numeric(valores, errors='coerce')
+    return ORIGEN_EXCEL + pd.to_timedelta(dias, unit='D')
+
+
+def _convertir_fechas(valores, formato):
+    if formato == 'datetime':
+        return pd.to_datetime(valores)
+    if formato == 'serial_excel':
+        return _desde_serial(valores)
+    if formato in FORMATOS_TEXTO:
+        return pd.to_datetime(valores, format=FORMATOS_TEXTO[formato], errors='coerce')
+    # Mixto: se separa por máscara y cada parte se convierte con su regla
+    texto = valores.astype(str).str.strip()
+    es_serial = texto.str.fullmatch(_SERIAL).fillna(False).to_numpy(dtype=bool)
+    resultado = pd.Series(pd.NaT, index=valores.index, dtype='datetime64[ns]')
+    resultado[es_serial] = _desde_serial(texto[es_serial])
+    resto = texto[~es_serial]
+    formato_texto = 'dmy' if resto.str.contains('/').any() else 'iso'
+    resultado[~es_serial] = pd.to_datetime(resto, format=FORMATOS_TEXTO[formato_texto], errors='coerce')
+    return resultado
+
+
+def _por_valores_unicos(serie, convertir):
+    # Cada valor distinto se convierte una sola vez y el resultado se expande por código
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos, unicos = serie.cat.codes.to_numpy(), serie.cat.categories
+    elif pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie):
+        codigos, unicos = pd.factorize(serie)
+    else:
+        return convertir(serie)
+    convertidas = convertir(pd.Series(unicos))
+    resultado = convertidas.reindex(codigos)  # el código -1 (nulo) queda como NaT
+    resultado.index = serie.index
+    return resultado
+
+
+def normalizar_fecha_jornada(serie, formato=None):
+    """Convierte FechaJornada a datetime64 sin adivinar elemento a elemento.
+
+    El formato se detecta una vez para toda la columna (o se pasa explícito): los seriales de
+    Excel se convierten sumando días al origen y el texto d/m/Y se lee con formato fijo. Sólo
+    se convierten los valores distintos, que en una jornada diaria son pocos.
+    """
+    formato = formato or detectar_formato_fecha(serie)
+    return _por_valores_unicos(serie, lambda valores: _convertir_fechas(valores, formato))
+
+
+def _convertir_horas(valores):
+    if pd.api.types.is_integer_dtype(valores) or pd.api.types.is_bool_dtype(valores):
+        return pd.to_timedelta(valores, unit='h')
+    if pd.api.types.is_float_dtype(valores):
+        # Excel guarda las horas como fracción de día; enteros en coma flotante son horas
+        unidad = 'D' if valores.max(skipna=True) <= 1 else 'h'
+        return pd.to_timedelta(valores, unit=unidad)
+    if pd.api.types.is_datetime64_any_dtype(valores):
+        return valores - valores.dt.normalize()
+    if pd.api.types.is_timedelta64_dtype(valores):
+        return valores
+    # Texto 'HH:MM[:SS]' u objetos datetime.time leídos de Excel
+    texto = valores.astype(str).str.strip()
+    texto = texto.where(~texto.str.fullmatch(r'\d{1,2}:\d{2}'), texto + ':00')
+    return pd.to_timedelta(texto, errors='coerce')
+
+
+def normalizar_hora(serie):
+    """Convierte Hora/HoraSistema a timedelta64 (tiempo desde medianoche) de forma vectorizada."""
+    return _por_valores_unicos(serie, _convertir_horas)
@@ -0,0 +1,254 @@
+import io
+from contextlib import contextmanager
+
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+import matplotlib.ticker as mticker # Importar para formatear el eje Y
+
+# Figuras de matplotlib de cada análisis. Reciben las tablas de analisis.Resultado y no usan
+# Streamlit, así que sirven igual para el tablero (graficos.mostrar) y para los informes.
+DPI = 100
+# Barras de los gráficos de desglose (las de mayor valor)
+MAX_BARRAS = 15
+
+
+@contextmanager
+def cerrando_figuras():
+    """Cierra al salir las figuras de pyplot abiertas dentro del bloque, aunque falle el dibujo."""
+    abiertas = set(plt.get_fignums())
+    try:
+        yield
+    finally:
+        for numero in set(plt.get_fignums()) - abiertas:
+            plt.close(numero)
+
+
+def a_png(figura, datos, dpi=DPI):
+    """PNG de la figura que `figura(datos)` arma."""
+    with cerrando_figuras():
+        buffer = io.BytesIO()
+        figura(datos).savefig(buffer, format='png', dpi=dpi)
+        return buffer.getvalue()
+
+
+def _sin_notacion_cientifica(ax, eje='y'):
+    # Formatear el eje para evitar notación científica y mostrar enteros
+    formatter = mticker.ScalarFormatter(useOffset=False, useMathText=False)
+    formatter.set_scientific(False)
+    (ax.yaxis if eje == 'y' else ax.xaxis).set_major_formatter(formatter)
+    ax.ticklabel_format(style='plain', axis=eje) # Intenta un estilo 'plain' adicional
+
+
+def produccion_diaria(df):
+    fig, ax = plt.subplots(figsize=(12, 6))
+    sns.lineplot(data=df, x='FechaJornada', y='Tallos', ax=ax)
+    ax.set_title('Producción Total de Tallos por Día')
+    ax.set_xlabel('Fecha')
+    ax.set_ylabel('Total de Tallos')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    _sin_notacion_cientifica(ax)
+    return fig
+
+
+def tasa_perdida_variedad(df):
+    fig, ax = plt.subplots(figsize=(12, 7))
+    sns.barplot(x='Variedad', y='TasaPerdida_Porcentaje', hue='Variedad', data=df, palette='Reds_d', legend=False, ax=ax)
+    ax.set_title('Top 10 Variedades con Mayor Tasa de Pérdida (NCP)')
+    ax.set_xlabel('Variedad')
+    ax.set_ylabel('Tasa de Pérdida (%)')
+    plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+    return fig
+
+
+def estacionalidad(df):
+    fig, ax = plt.subplots(figsize=(14, 7))
+    sns.lineplot(data=df, x='Mes', y='Tallos', hue='Tipo', marker='o', palette={'TallosProducidos': 'green', 'TallosPerdidos': 'red'}, ax=ax)
+    ax.set_title('Estacionalidad de Producción y Pérdidas de Tallos')
+    ax.set_xlabel('Mes')
+    ax.set_ylabel('Total de Tallos')
+    plt.xticks(range(1, 13), ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic'])
+    plt.legend(title='Tipo de Movimiento')
+    plt.tight_layout()
+    _sin_notacion_cientifica(ax)
+    return fig
+
+
+def alta_calidad_por(df, col, palette):
+    fig, ax = plt.subplots(figsize=(12, 7))
+    sns.barplot(x=col, y='Tallos', hue=col, data=df, palette=palette, legend=False, ax=ax)
+    ax.set_title(f'Tallos de Alta Calidad Perdidos (NCP) por {col}')
+    ax.set_xlabel(col)
+    ax.set_ylabel('Tallos de Alta Calidad Perdidos')
+    plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+    return fig
+
+
+def alta_calidad_plagas(df, campo_causa):
+    fig, ax = plt.subplots(figsize=(12, 7))
+    sns.barplot(x=campo_causa, y='Tallos', hue=campo_causa, data=df, palette='Greens_d', legend=False, ax=ax)
+    ax.set_title('Tallos de Alta Calidad Perdidos por Causas de Plagas/Enfermedades')
+    ax.set_xlabel(f'Causa ({campo_causa})')
+    ax.set_ylabel('Tallos Perdidos de Alta Calidad')
+    plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+    return fig
+
+
+def ncc_por_finca(df, x_col):
+    fig, ax = plt.subplots(figsize=(14, 8))
+    # Usamos 'Finca' para hue para ver las diferentes fincas, y x_col para la causa.
+    sns.barplot(x=x_col, y='Tallos', hue='Finca', data=df, palette='tab10', ax=ax)
+    ax.set_title('Top 10 Causas de Calidad No Conforme (NCC) por Finca')
+    ax.set_xlabel('Causa de Calidad No Conforme')
+    ax.set_ylabel('Total de Tallos No Conformes')
+    plt.xticks(rotation=45, ha='right')
+    plt.legend(title='Finca', bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.tight_layout()
+    _sin_notacion_cientifica(ax)
+    return fig
+
+
+def tallos_por_ramo(df):
+    fig, ax = plt.subplots(figsize=(14, 7))
+    sns.barplot(x='Variedad', y='Tallos_por_Ramo', hue='Variedad', data=df, palette='coolwarm', legend=False, ax=ax)
+    ax.set_title('Promedio de Tallos por Ramo por Variedad (Extremos)')
+    ax.set_xlabel('Variedad')
+    ax.set_ylabel('Promedio de Tallos por Ramo')
+    plt.xticks(rotation=60, ha='right')
+    plt.tight_layout()
+    return fig
+
+
+def causas_perdida_ncp(df, titulo):
+    fig, ax = plt.subplots(figsize=(12, 7))
+    sns.barplot(x=df['Causa'], y=df['Tallos'].to_numpy(), hue=df['Causa'], palette='magma', legend=False, ax=ax)
+    ax.set_title(titulo)
+    ax.set_xlabel('Causa')
+    ax.set_ylabel('Tallos Perdidos')
+    plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+    return fig
+
+
+def mala_marcacion(df):
+    fig, ax = plt.subplots(figsize=(8, 8))
+    ax.pie(df['Tallos'], labels=df['Tipo'], autopct='%1.1f%%', startangle=90, colors=['#FF9999', '#66B2FF'])
+    ax.set_title('Proporción de Tallos Descartados por Problemas de Marcación (NCP)')
+    ax.axis('equal')
+    plt.tight_layout()
+    return fig
+
+
+def rendimiento_postcosecha(df):
+    fig, ax = plt.subplots(figsize=(14, 8))
+    sns.barplot(x='Postcosecha', y='Tallos_Producidos', hue='Postcosecha', data=df, palette='Spectral', legend=False, ax=ax)
+    ax.set_title('Top 15 Postcosechas por Rendimiento Promedio de Tallos por Jornada')
+    ax.set_xlabel('Postcosecha')
+    ax.set_ylabel('Promedio de Tallos Producidos por Jornada')
+    plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+    _sin_notacion_cientifica(ax)
+    return fig
+
+
+def rendimiento_distribucion(serie):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.histplot(serie, bins=30, kde=True, color='skyblue', ax=ax)
+    ax.set_title('Distribución del Rendimiento Diario de Tallos por Postcosecha')
+    ax.set_xlabel('Tallos Producidos por Jornada')
+    ax.set_ylabel('Frecuencia')
+    plt.tight_layout()
+    _sin_notacion_cientifica(ax, 'x')
+    return fig
+
+
+def aceptacion_finca_producto(pivote, producto_col):
+    # Ajustar la altura de la figura dinámicamente, con un máximo razonable
+    fig_height = min(12, max(6, len(pivote) * 0.7)) # Mínimo 6, máximo 12
+    fig_width = min(20, max(10, len(pivote.columns) * 0.5)) # Ancho dinámico
+
+    fig, ax = plt.subplots(figsize=(fig_width, fig_height)) # Crea la figura y los ejes
+    sns.heatmap(
+        pivote,
+        annot=True,      # Mostrar los valores en las celdas
+        fmt=".1f",       # Formato de los números (un decimal)
+        cmap="YlGnBu",   # Esquema de color diferente para contraste
+        linewidths=.5,
+        linecolor='black',
+        cbar_kws={'label': 'Porcentaje de Aceptación (%)'}, # Leyenda de la barra de color
+        ax=ax            # Pasa los ejes al gráfico
+    )
+    ax.set_title(f'Porcentaje de Aceptación de Tallos por Finca y {producto_col}', fontsize=16)
+    ax.set_xlabel(f'{producto_col}', fontsize=14)
+    ax.set_ylabel('Finca', fontsize=14)
+    plt.xticks(rotation=45, ha='right')
+    plt.yticks(rotation=0)
+    plt.tight_layout()
+    return fig
+
+
+def tasas_perdida(df, dimension):
+    fig, ax = plt.subplots(figsize=(12, 7))
+    sns.barplot(x=dimension, y='TasaNCP', hue=dimension, data=df, palette='Oranges_d', legend=False, ax=ax)
+    ax.set_title(f'Tasa de Pérdida (NCP) por {dimension}')
+    ax.set_xlabel(dimension)
+    ax.set_ylabel('Tasa de Pérdida (%)')
+    plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+    return fig
+
+
+def inspeccion_perdidas(df):
+    fig, ax = plt.subplots(figsize=(12, 7))
+    sns.scatterplot(data=df, x='Hallazgos', y='NCPTallos', hue='Plaga', style='Plaga', s=60, ax=ax)
+    ax.set_title('Hallazgos de la Inspección frente a Tallos Perdidos (NCP) por Finca y Variedad')
+    ax.set_xlabel('Hallazgos en la Inspección')
+    ax.set_ylabel('Tallos Perdidos por la Plaga (NCP)')
+    plt.legend(title='Plaga', bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.tight_layout()
+    _sin_notacion_cientifica(ax)
+    return fig
+
+
+def del_resultado(titulo, resultado):
+    """[(nombre, datos, figura)] de los gráficos de un análisis con datos, en el orden del tablero.
+
+    `nombre` identifica el gráfico y los parámetros que no están en los datos, como en
+    graficos.renderizar; `figura(datos)` devuelve la figura de matplotlib.
+    """
+    t, o = resultado.tablas, resultado.opciones
+    posibles = {
+        "Problemática 1: Producción Total de Tallos por Día": [
+            ('produccion_diaria', t.get('diaria'), produccion_diaria)],
+        "Problemática 2: Variedades con Mayor Tasa de Pérdida": [
+            ('tasa_perdida_variedad', t.get('top'), tasa_perdida_variedad)],
+        "Problemática 3: Estacionalidad de Producción y Pérdidas": [
+            ('estacionalidad', t.get('mensual'), estacionalidad)],
+        "Problemática 4: Descartes de Alta Calidad por Postcosecha y Finca": [
+            ('alta_calidad_postcosecha', t.get('postcosecha'), lambda df: alta_calidad_por(df, 'Postcosecha', 'viridis')),
+            ('alta_calidad_finca', t.get('finca'), lambda df: alta_calidad_por(df, 'Finca', 'cividis'))],
+        "Problemática 5: Alta Calidad Descartada por Plagas/Enfermedades": [
+            ('alta_calidad_plagas', t.get('por_causa'), lambda df: alta_calidad_plagas(df, o['campo_causa']))],
+        "Problemática 6: Calidad No Conforme (NCC) por Finca": [
+            ('ncc_por_finca', t.get('top'), lambda df: ncc_por_finca(df, o['x_col']))],
+        "Problemática 7: Tallos por Ramo por Variedad": [
+            ('tallos_por_ramo', t.get('extremos'), tallos_por_ramo)],
+        "Problemática 8: Causas Principales de Pérdida (NCP)": [
+            (f"causas_perdida_ncp:{o.get('titulo')}", t.get('top'), lambda df: causas_perdida_ncp(df, o['titulo']))],
+        "Problemática 9: Impacto de Mala Marcación (NCP)": [
+            ('mala_marcacion', t.get('proporcion'), mala_marcacion)],
+        "Problemática 10: Rendimiento de Tallos por Postcosecha por Jornada": [
+            ('rendimiento_postcosecha', t.get('promedio'), rendimiento_postcosecha),
+            ('rendimiento_postcosecha_distribucion', t.get('diario'), rendimiento_distribucion)],
+        "Mapa de Calor: Aceptación por Finca y Producto": [
+            (f"aceptacion_finca_producto:{o.get('producto_col')}", t.get('pivote'), lambda df: aceptacion_finca_producto(df, o['producto_col']))],
+        "Tasas de Pérdida: Finca → Bloque → Producto → Variedad → Grado": [
+            (f"tasas_perdida:{o.get('dimension')}", t.get('desglose', pd.DataFrame()).head(MAX_BARRAS), lambda df: tasas_perdida(df, o['dimension']))],
+        "Inspección frente a Pérdidas por Plagas (Finca y Variedad)": [
+            ('inspeccion_perdidas', t.get('por_plaga'), inspeccion_perdidas)],
+    }
+    return [(nombre, datos, figura) for nombre, datos, figura in posibles.get(titulo, []) if datos is not None and not datos.empty]
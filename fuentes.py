@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import perfil
+
+DIRECTORIO_APP = os.path.dirname(os.path.abspath(__file__))
+URL_BASE = "https://raw.githubusercontent.com/JulianTorrest/Prueba_Flores/refs/heads/main/"
+
+
+class FuenteNoDisponible(Exception):
+    pass
+
+
+class FuenteLocal:
+    """Archivos en un directorio local o en un recurso compartido montado."""
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+
+    def __repr__(self):
+        return f"FuenteLocal({self.directorio!r})"
+
+    def resolver(self, archivo):
+        ruta = os.path.join(self.directorio, archivo)
+        try:
+            estado = os.stat(ruta)
+        except OSError:
+            raise FuenteNoDisponible(f"{archivo} no existe en {self.directorio}")
+        return ruta, f"{estado.st_size}-{estado.st_mtime_ns}"
+
+    def resolver_directorio(self, carpeta):
+        """Carpeta de CSV particionados; la versión cambia si se agrega, quita o modifica un archivo."""
+        ruta = os.path.join(self.directorio, carpeta)
+        try:
+            archivos = sorted((e for e in os.scandir(ruta) if e.is_file() and e.name.endswith('.csv')), key=lambda e: e.name)
+        except OSError:
+            raise FuenteNoDisponible(f"{carpeta}/ no existe en {self.directorio}")
+        if not archivos:
+            raise FuenteNoDisponible(f"{carpeta}/ no tiene archivos .csv en {self.directorio}")
+        h = hashlib.sha1()
+        for entrada in archivos:
+            estado = entrada.stat()
+            h.update(f"{entrada.name}:{estado.st_size}-{estado.st_mtime_ns};".encode())
+        return ruta, h.hexdigest()
+
+
+class FuenteHTTP:
+    """Espejo local de archivos remotos, revalidado con GET condicional (ETag / Last-Modified).
+
+    Las descargas se guardan en `directorio_cache`; mientras el servidor responda 304 se
+    lee la copia local. Dentro de `intervalo` segundos desde la última revalidación (o desde
+    el último intento fallido) no se consulta la red, y en modo `offline` nunca.
+    """
+
+    def __init__(self, url_base, directorio_cache, intervalo=300, offline=False, timeout=15):
+        self.url_base = url_base.rstrip('/') + '/'
+        self.directorio_cache = directorio_cache
+        self.intervalo = intervalo
+        self.offline = offline
+        self.timeout = timeout
+        self._revalidado = {}
+        self._fallido = {}
+        # Un candado por archivo: descargas distintas avanzan a la vez, la misma no se repite
+        self._candados = {}
+        self._candado = threading.Lock()
+        self._sesion = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=2)
+        self._sesion.mount('http://', adaptador)
+        self._sesion.mount('https://', adaptador)
+
+    def __repr__(self):
+        return f"FuenteHTTP({self.url_base!r}, offline={self.offline})"
+
+    def _rutas(self, archivo):
+        ruta = os.path.join(self.directorio_cache, archivo)
+        return ruta, ruta + '.meta.json'
+
+    def _leer_meta(self, ruta_meta):
+        try:
+            with open(ruta_meta, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _descargar(self, archivo, ruta, ruta_meta, meta):
+        cabeceras = {}
+        if os.path.exists(ruta):
+            if meta.get('etag'):
+                cabeceras['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                cabeceras['If-Modified-Since'] = meta['last_modified']
+        url = self.url_base + requests.utils.quote(archivo)
+        with perfil.etapa(f"descarga {archivo}"):
+            respuesta = self._sesion.get(url, headers=cabeceras, timeout=self.timeout)
+        if respuesta.status_code == 304:
+            return meta
+        respuesta.raise_for_status()
+
+        os.makedirs(self.directorio_cache, exist_ok=True)
+        # Escribir en un temporal y renombrar para no dejar nunca una copia a medias
+        temporal = ruta + '.descarga'
+        with open(temporal, 'wb') as f:
+            f.write(respuesta.content)
+        os.replace(temporal, ruta)
+        meta = {
+            'etag': respuesta.headers.get('ETag'),
+            'last_modified': respuesta.headers.get('Last-Modified'),
+            'descargado': time.time(),
+        }
+        with open(ruta_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        return meta
+
+    def _candado_de(self, archivo):
+        with self._candado:
+            return self._candados.setdefault(archivo, threading.Lock())
+
+    def resolver(self, archivo):
+        ruta, ruta_meta = self._rutas(archivo)
+        with self._candado_de(archivo):
+            meta = self._leer_meta(ruta_meta)
+            ahora = time.monotonic()
+            vigente = ahora - self._revalidado.get(archivo, float('-inf')) < self.intervalo and os.path.exists(ruta)
+            # Tras un intento fallido también se espera `intervalo`: con el servidor caído las
+            # ejecuciones siguientes no vuelven a esperar los reintentos y el timeout de cada archivo
+            en_espera = ahora - self._fallido.get(archivo, float('-inf')) < self.intervalo
+            if not self.offline and not vigente and not en_espera:
+                try:
+                    meta = self._descargar(archivo, ruta, ruta_meta, meta)
+                    self._revalidado[archivo] = time.monotonic()
+                    self._fallido.pop(archivo, None)
+                except requests.RequestException:
+                    # Enlace caído: seguimos con la última copia descargada, si la hay
+                    self._fallido[archivo] = time.monotonic()
+        if not os.path.exists(ruta):
+            raise FuenteNoDisponible(f"{archivo} no está en la caché local y no se pudo descargar de {self.url_base}")
+        return ruta, meta.get('etag') or meta.get('last_modified') or str(os.stat(ruta).st_mtime_ns)
+
+
+class FuenteCompuesta:
+    """Prueba cada fuente en orden y usa la primera que tenga el archivo."""
+
+    def __init__(self, fuentes):
+        self.fuentes = list(fuentes)
+
+    def __repr__(self):
+        return f"FuenteCompuesta({self.fuentes!r})"
+
+    def resolver(self, archivo):
+        motivos = []
+        for fuente in self.fuentes:
+            try:
+                return fuente.resolver(archivo)
+            except FuenteNoDisponible as e:
+                motivos.append(str(e))
+        raise FuenteNoDisponible('; '.join(motivos) or f"No hay fuentes configuradas para {archivo}")
+
+    def resolver_directorio(self, carpeta):
+        for fuente in self.fuentes:
+            if hasattr(fuente, 'resolver_directorio'):
+                try:
+                    return fuente.resolver_directorio(carpeta)
+                except FuenteNoDisponible:
+                    pass
+        raise FuenteNoDisponible(f"Ninguna fuente tiene la carpeta {carpeta}/")
+
+
+def crear_fuente(entorno=None):
+    """Construye la fuente de datos a partir de variables de entorno.
+
+    FLORES_DATOS_DIR     directorio local o montado que se lee primero (por defecto, el de la app)
+    FLORES_DATOS_URL     URL base remota; vacía para desactivar la red
+    FLORES_CACHE_DIR     dónde se guardan las descargas
+    FLORES_REVALIDAR_SEG segundos entre revalidaciones con el servidor
+    FLORES_OFFLINE       1 para no usar la red en absoluto
+    """
+    entorno = os.environ if entorno is None else entorno
+    fuentes = []
+    for directorio in entorno.get('FLORES_DATOS_DIR', DIRECTORIO_APP).split(os.pathsep):
+        if directorio:
+            fuentes.append(FuenteLocal(directorio))
+    url_base = entorno.get('FLORES_DATOS_URL', URL_BASE)
+    if url_base:
+        fuentes.append(FuenteHTTP(
+            url_base,
+            entorno.get('FLORES_CACHE_DIR', os.path.join(DIRECTORIO_APP, '.cache', 'descargas')),
+            intervalo=int(entorno.get('FLORES_REVALIDAR_SEG', 300)),
+            offline=entorno.get('FLORES_OFFLINE', '0') == '1',
+        ))
+    return FuenteCompuesta(fuentes)
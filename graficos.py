@@ -0,0 +1,132 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import altair as alt
+import pandas as pd
+import streamlit as st
+
+import figuras
+import perfil
+
+# 'matplotlib' (por defecto) rasteriza en el servidor; 'vega' envía la especificación y el
+# navegador dibuja el gráfico (los que no tienen versión Vega-Lite siguen saliendo como imagen)
+MOTOR_GRAFICOS = os.environ.get('FLORES_GRAFICOS', 'matplotlib')
+# Imágenes PNG guardadas en memoria, compartidas por todas las sesiones del proceso
+MAX_IMAGENES = int(os.environ.get('FLORES_GRAFICOS_MAX', 128))
+
+_imagenes = OrderedDict()
+# Protege la caché de imágenes: las sesiones que encuentran su gráfico no esperan a las que dibujan
+_bloqueo = threading.Lock()
+# pyplot no es seguro entre hilos y Streamlit atiende cada sesión en un hilo
+_bloqueo_pyplot = threading.Lock()
+
+
+def huella(df):
+    """Hash del contenido de un DataFrame/Series, incluidos nombres de columnas e índices."""
+    if isinstance(df, pd.Series):
+        df = df.to_frame()
+    h = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    h.update(repr((list(df.columns), list(df.index.names), list(df.columns.names))).encode())
+    return h.hexdigest()
+
+
+def renderizar(nombre, df, figura):
+    """PNG de `figura(df)`, reutilizado mientras `nombre` y el contenido de `df` no cambien.
+
+    `nombre` identifica el gráfico y cualquier parámetro que no esté en los datos (p. ej. la
+    columna elegida para el eje); `figura` recibe los datos y devuelve la figura de matplotlib.
+    """
+    clave = (nombre, huella(df))
+    with _bloqueo:
+        if clave in _imagenes:
+            _imagenes.move_to_end(clave)
+            return _imagenes[clave]
+    with _bloqueo_pyplot:
+        # Otra sesión pudo dibujar el mismo gráfico mientras se esperaba a pyplot
+        with _bloqueo:
+            png = _imagenes.get(clave)
+        if png is None:
+            with perfil.etapa(f"gráfico {nombre}", filas=len(df)):
+                png = figuras.a_png(figura, df)
+    with _bloqueo:
+        _imagenes[clave] = png
+        _imagenes.move_to_end(clave)
+        while len(_imagenes) > MAX_IMAGENES:
+            _imagenes.popitem(last=False)
+    return png
+
+
+def mostrar(nombre, df, figura, vega=None):
+    """Muestra el gráfico de una sección: Vega-Lite si está configurado y hay versión `vega`,
+    si no la imagen en caché de la figura de matplotlib."""
+    if MOTOR_GRAFICOS == 'vega' and vega is not None:
+        st.altair_chart(vega(df), width='stretch')
+    else:
+        st.image(renderizar(nombre, df, figura), width='stretch')
+
+
+def limpiar_cache():
+    with _bloqueo:
+        _imagenes.clear()
+
+
+# Versiones Vega-Lite de los gráficos del tablero
+
+def barras(df, x, y, titulo, color=None):
+    # sort=None conserva el orden del DataFrame (los análisis ya lo ordenan)
+    return alt.Chart(df, title=titulo).mark_bar().encode(
+        x=alt.X(x, type='nominal', sort=None),
+        y=alt.Y(y, type='quantitative'),
+        color=alt.Color(color or x, type='nominal', legend=alt.Legend() if color else None),
+        xOffset=alt.XOffset(color, type='nominal') if color else alt.Undefined,
+        tooltip=[x, y] + ([color] if color else []),
+    )
+
+
+def lineas(df, x, y, titulo, color=None):
+    return alt.Chart(df, title=titulo).mark_line(point=True).encode(
+        x=x,
+        y=alt.Y(y, type='quantitative'),
+        color=alt.Color(color, type='nominal') if color else alt.Undefined,
+        tooltip=[x, y] + ([color] if color else []),
+    )
+
+
+def histograma(serie, titulo, bins=30):
+    df = serie.to_frame()
+    return alt.Chart(df, title=titulo).mark_bar().encode(
+        x=alt.X(serie.name, type='quantitative', bin=alt.Bin(maxbins=bins)),
+        y='count()',
+    )
+
+
+def torta(df, categoria, valor, titulo):
+    return alt.Chart(df, title=titulo).mark_arc().encode(
+        theta=alt.Theta(valor, type='quantitative'),
+        color=alt.Color(categoria, type='nominal'),
+        tooltip=[categoria, valor],
+    )
+
+
+def dispersion(df, x, y, titulo, color=None, detalle=()):
+    return alt.Chart(df, title=titulo).mark_point().encode(
+        x=alt.X(x, type='quantitative'),
+        y=alt.Y(y, type='quantitative'),
+        color=alt.Color(color, type='nominal') if color else alt.Undefined,
+        tooltip=list(detalle) + [x, y] + ([color] if color else []),
+    )
+
+
+def mapa_calor(pivote, titulo, etiqueta):
+    filas, columnas = pivote.index.name, pivote.columns.name
+    # melt + dropna da las mismas celdas en cualquier versión de pandas (stack cambió su manejo de vacíos)
+    largo = pivote.melt(ignore_index=False, var_name=columnas, value_name=etiqueta).dropna(subset=[etiqueta]).reset_index()
+    # Se conserva el orden de filas y columnas del pivote (no alfabético)
+    return alt.Chart(largo, title=titulo).mark_rect().encode(
+        x=alt.X(columnas, type='nominal', sort=[str(c) for c in pivote.columns]),
+        y=alt.Y(filas, type='nominal', sort=[str(f) for f in pivote.index]),
+        color=alt.Color(etiqueta, type='quantitative', scale=alt.Scale(scheme='yellowgreenblue')),
+        tooltip=[filas, columnas, alt.Tooltip(etiqueta, format='.1f')],
+    )
@@ -0,0 +1,104 @@
+import hashlib
+import io
+import os
+import threading
+
+import columnar
+import cubo
+import ingesta
+
+# Tablas que sólo crecen por el final: cada día se agregan las líneas de la jornada
+TABLAS_INCREMENTALES = {'ncc': "NCC.csv", 'ncp': "NCP.csv"}
+# Bytes del principio y de antes de la posición leída que se comparan para detectar un archivo
+# reescrito; una edición en medio del historial no se detecta (para eso `cli.py construir`)
+TAMANO_CONTROL = 4096
+
+_bloqueo = threading.Lock()
+
+
+class ReconstruccionNecesaria(Exception):
+    """Los cambios no son sólo líneas agregadas al final: hay que reconstruir la caché completa."""
+
+
+def _control(f, posicion):
+    h = hashlib.sha1()
+    f.seek(0)
+    h.update(f.read(min(posicion, TAMANO_CONTROL)))
+    f.seek(max(0, posicion - TAMANO_CONTROL))
+    h.update(f.read(min(posicion, TAMANO_CONTROL)))
+    return h.hexdigest()
+
+
+def estado_archivo(ruta):
+    """Posición hasta la que se considera leído `ruta` (todo el archivo) y su control."""
+    with open(ruta, 'rb') as f:
+        tamano = os.fstat(f.fileno()).st_size
+        return {'posicion': tamano, 'control': _control(f, tamano)}
+
+
+def leer_nuevas(ruta, estado):
+    """Devuelve (cabecera + líneas completas agregadas desde `estado`, estado nuevo).
+
+    Si el archivo se acortó o cambió lo que ya se había leído devuelve None. Una última línea
+    sin salto de línea todavía se está escribiendo y queda para la próxima lectura.
+    """
+    posicion = estado['posicion']
+    with open(ruta, 'rb') as f:
+        tamano = os.fstat(f.fileno()).st_size
+        if tamano < posicion or _control(f, posicion) != estado['control']:
+            return None
+        f.seek(0)
+        cabecera = f.readline()
+        f.seek(posicion)
+        nuevas = f.read(tamano - posicion)
+        nuevas = nuevas[:nuevas.rfind(b'\n') + 1]
+        posicion += len(nuevas)
+        estado_nuevo = {'posicion': posicion, 'control': _control(f, posicion)}
+    return (cabecera + nuevas if nuevas.strip() else b''), estado_nuevo
+
+
+def actualizar(huellas, preparar, directorio=None):
+    """Agrega a la caché columnar sólo las líneas nuevas de NCC/NCP y actualiza el cubo guardado.
+
+    `preparar(df, causa_mapeo)` limpia y une las filas nuevas igual que la carga completa. Cada
+    lote se guarda como una parte más de la tabla y sus agregados se suman al cubo, así que el
+    costo depende del tamaño del lote y no del historial. Devuelve {tabla: filas agregadas};
+    lanza ReconstruccionNecesaria si cambió otra cosa.
+    """
+    with _bloqueo:
+        manifiesto = columnar.leer_manifiesto(directorio)
+        if manifiesto is None:
+            raise ReconstruccionNecesaria("no hay caché columnar")
+        if not manifiesto.get('cubo') or not manifiesto.get('incremental'):
+            raise ReconstruccionNecesaria("la caché no guarda el cubo ni las posiciones leídas")
+        if not columnar.cubo_vigente(manifiesto):
+            raise ReconstruccionNecesaria("el cubo guardado tiene otras tablas o dimensiones")
+        rutas = {nombre: ruta for nombre, ruta, _ in huellas}
+        versiones = {nombre: version for nombre, _, version in huellas}
+        cambiados = [nombre for nombre, version in versiones.items() if manifiesto['versiones'].get(nombre) != version]
+        otros = [nombre for nombre in cambiados if nombre not in TABLAS_INCREMENTALES]
+        if otros:
+            raise ReconstruccionNecesaria(f"cambiaron {', '.join(otros)}")
+
+        causa_mapeo = columnar.cargar(manifiesto, directorio, tablas=['causa_mapeo'])['causa_mapeo']
+        nuevas = {}
+        for nombre in cambiados:
+            if rutas[nombre] and os.path.isdir(rutas[nombre]):
+                raise ReconstruccionNecesaria(f"{nombre} se lee de una carpeta de particiones")
+            estado = manifiesto['incremental'].get(nombre)
+            leido = leer_nuevas(rutas[nombre], estado) if estado and rutas[nombre] else None
+            if leido is None:
+                raise ReconstruccionNecesaria(f"{TABLAS_INCREMENTALES[nombre]} no sólo creció por el final")
+            contenido, manifiesto['incremental'][nombre] = leido
+            if not contenido:
+                continue
+            df, _ = ingesta.leer_csv_nc(io.BytesIO(contenido), nombre=f"{TABLAS_INCREMENTALES[nombre]}.incremental")
+            nuevas[nombre] = preparar(df, causa_mapeo)
+            columnar.escribir_parte(nombre, nuevas[nombre], manifiesto, directorio)
+
+        if nuevas:
+            cubo_datos = columnar.cargar_cubo(manifiesto, directorio)
+            columnar.escribir_cubo(cubo.sumar(cubo_datos, nuevas), manifiesto, directorio)
+        manifiesto['versiones'] = versiones
+        columnar.guardar_manifiesto(manifiesto, directorio)
+        return {nombre: len(df) for nombre, df in nuevas.items()}
@@ -0,0 +1,169 @@
+import base64
+import datetime
+import html
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import analisis
+import clasificacion
+import consultas
+import figuras
+
+# Informes de todas las Problemáticas por finca, sin Streamlit: `python cli.py informe`
+DIRECTORIO_INFORMES = os.environ.get(
+    'FLORES_INFORMES_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'informes'),
+)
+# Fincas que se procesan a la vez, cada una en su proceso
+PROCESOS_INFORMES = int(os.environ.get('FLORES_PROCESOS_INFORMES', os.cpu_count() or 1))
+FORMATOS = ('html', 'pdf')
+# Filas de las tablas sin gráfico (p. ej. la inspección) que se incluyen en el informe HTML
+FILAS_TABLA = 20
+
+# Datos de cada proceso de trabajo: se envían una vez al arrancarlo y no con cada finca
+_compartido = {}
+
+
+def calcular(cubo_datos, df_inspeccion):
+    """[(título, analisis.Resultado)] de todos los análisis sobre `cubo_datos`."""
+    resultados = [(titulo, funcion(cubo_datos)) for titulo, funcion in analisis.ANALISIS.items()]
+    resultados.append(("Inspección de Plagas/Enfermedades", analisis.inspeccion(df_inspeccion)))
+    resultados.append(("Inspección frente a Pérdidas por Plagas (Finca y Variedad)", analisis.inspeccion_perdidas(cubo_datos, df_inspeccion)))
+    return resultados
+
+
+def _inspeccion_de(df_inspeccion, finca):
+    # La inspección no está en el cubo: se filtra por el nombre de la finca escrito de cualquier forma
+    if df_inspeccion.empty or 'FINCA_INSP' not in df_inspeccion.columns:
+        return df_inspeccion
+    clave = clasificacion.normalizar(finca)
+    return df_inspeccion[(clasificacion.clave(df_inspeccion['FINCA_INSP']) == clave).to_numpy()].reset_index(drop=True)
+
+
+def _html(titulo, resultados):
+    partes = [
+        "<!DOCTYPE html><html lang='es'><head><meta charset='utf-8'>",
+        f"<title>{html.escape(titulo)}</title>",
+        "<style>body{font-family:sans-serif;max-width:1100px;margin:auto}img{max-width:100%}"
+        ".aviso{color:#8a6d3b;background:#fcf8e3;padding:.5em}table{border-collapse:collapse;font-size:.85em}"
+        "td,th{border:1px solid #ccc;padding:2px 6px}</style></head><body>",
+        f"<h1>{html.escape(titulo)}</h1>",
+        f"<p>Generado el {datetime.datetime.now():%Y-%m-%d %H:%M}</p>",
+    ]
+    for nombre, r in resultados:
+        partes.append(f"<h2>{html.escape(nombre)}</h2>")
+        if r.aviso:
+            partes.append(f"<p class='aviso'>{html.escape(r.aviso)}</p>")
+            continue
+        if r.cifras:
+            partes.append("<ul>" + "".join(f"<li>{html.escape(k)}: <b>{html.escape(str(v))}</b></li>" for k, v in r.cifras.items()) + "</ul>")
+        graficos = figuras.del_resultado(nombre, r)
+        for _, datos, figura in graficos:
+            png = base64.b64encode(figuras.a_png(figura, datos)).decode()
+            partes.append(f"<img src='data:image/png;base64,{png}'>")
+        if not graficos:
+            tablas = [df for df in r.tablas.values() if isinstance(df, pd.DataFrame) and not df.empty]
+            partes.extend(df.head(FILAS_TABLA).to_html(index=False, na_rep='') for df in tablas)
+            if not tablas:
+                partes.append("<p>No hay datos para este análisis.</p>")
+    partes.append("</body></html>")
+    return "\n".join(partes)
+
+
+def _pdf(titulo, resultados, ruta):
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    # Primera página: cifras y avisos de cada análisis; luego una página por gráfico
+    lineas = [titulo, f"Generado el {datetime.datetime.now():%Y-%m-%d %H:%M}", ""]
+    for nombre, r in resultados:
+        lineas.append(nombre)
+        if r.aviso:
+            lineas.append(f"    {r.aviso}")
+        lineas.extend(f"    {k}: {v}" for k, v in r.cifras.items())
+        if not r.aviso and not figuras.del_resultado(nombre, r):
+            filas = sum(len(df) for df in r.tablas.values() if isinstance(df, pd.DataFrame))
+            lineas.append(f"    {filas} filas (la tabla completa está en el informe HTML)" if filas else "    No hay datos para este análisis.")
+    with PdfPages(ruta) as pdf:
+        portada = plt.figure(figsize=(11.69, 8.27))
+        portada.text(0.03, 0.97, "\n".join(lineas), va='top', family='monospace', fontsize=7, wrap=True)
+        pdf.savefig(portada)
+        plt.close(portada)
+        for nombre, r in resultados:
+            for _, datos, figura in figuras.del_resultado(nombre, r):
+                with figuras.cerrando_figuras():
+                    pdf.savefig(figura(datos))
+
+
+def _nombre_archivo(finca):
+    return re.sub(r'[^\w.-]+', '_', finca).strip('_') or 'finca'
+
+
+def generar_finca(cubo_datos, df_inspeccion, finca, formato='html', directorio=None):
+    """Calcula todos los análisis de `finca` y escribe su informe; devuelve la ruta del archivo."""
+    directorio = directorio or DIRECTORIO_INFORMES
+    os.makedirs(directorio, exist_ok=True)
+    cubo_finca = consultas.filtrar_cubo(cubo_datos, consultas.Filtro(fincas=(finca,)))
+    resultados = calcular(cubo_finca, _inspeccion_de(df_inspeccion, finca))
+    titulo = f"Informe de la finca {finca}"
+    ruta = os.path.join(directorio, f"{_nombre_archivo(finca)}.{formato}")
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    if formato == 'pdf':
+        _pdf(titulo, resultados, temporal)
+    else:
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(_html(titulo, resultados))
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def _inicializar(cubo_datos, df_inspeccion):
+    import matplotlib
+
+    # Los procesos de trabajo no tienen pantalla
+    matplotlib.use('Agg')
+    _compartido['cubo'] = cubo_datos
+    _compartido['inspeccion'] = df_inspeccion
+
+
+def _generar_en_proceso(finca, formato, directorio):
+    return generar_finca(_compartido['cubo'], _compartido['inspeccion'], finca, formato, directorio)
+
+
+def fincas_disponibles(cubo_datos):
+    return consultas.opciones(cubo_datos)[0]['Finca']
+
+
+def generar(cubo_datos, df_inspeccion, fincas=None, formato='html', directorio=None, procesos=None):
+    """Escribe un informe por finca (todas si `fincas` es None), repartiendo las fincas entre procesos.
+
+    Devuelve {finca: ruta del informe o la excepción con la que falló}; una finca que falla no
+    detiene las demás.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato}")
+    fincas = list(fincas or fincas_disponibles(cubo_datos))
+    directorio = directorio or DIRECTORIO_INFORMES
+    procesos = min(procesos or PROCESOS_INFORMES, len(fincas))
+    resultados = {}
+    if procesos <= 1:
+        for finca in fincas:
+            try:
+                resultados[finca] = generar_finca(cubo_datos, df_inspeccion, finca, formato, directorio)
+            except Exception as e:
+                resultados[finca] = e
+        return resultados
+    # 'spawn' no hereda el estado del proceso que llama (p. ej. hilos de Streamlit) y funciona igual en Windows
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_inicializar, initargs=(cubo_datos, df_inspeccion)) as ejecutor:
+        futuros = {finca: ejecutor.submit(_generar_en_proceso, finca, formato, directorio) for finca in fincas}
+        for finca, futuro in futuros.items():
+            try:
+                resultados[finca] = futuro.result()
+            except Exception as e:
+                resultados[finca] = e
+    return resultados
@@ -0,0 +1,229 @@
+import os
+import re
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Esquema declarado de NCC.csv / NCP.csv (22 columnas, separadas por ';')
+COLUMNAS_CATEGORICAS = [
+    'IdTipoMovimiento', 'TipoMovimiento', 'Tipo', 'Postcosecha', 'Finca', 'Bloque',
+    'Producto', 'Variedad', 'Grado', 'Causa',
+]
+COLUMNAS_ENTERAS = {
+    'idPostcosecha': 'int32', 'idFinca': 'int32', 'idBloque': 'int32', 'idProducto': 'int32',
+    'idVariedad': 'int32', 'idGrado': 'int16', 'idCausa': 'int16', 'Hora': 'int8',
+    'Ramos': 'int32', 'Tallos': 'int32',
+}
+# FechaJornada llega como serial de Excel o como texto d/m/Y (NCP mezcla ambos); se lee como
+# categoría para que fechas.normalizar_fecha_jornada convierta cada fecha distinta una sola vez
+COLUMNA_FECHA = 'FechaJornada'
+COLUMNAS_ESQUEMA = [
+    'IdTipoMovimiento', 'TipoMovimiento', 'Tipo', 'FechaJornada', 'Hora', 'idPostcosecha',
+    'Postcosecha', 'idFinca', 'Finca', 'Propia', 'idBloque', 'Bloque', 'idProducto', 'Producto',
+    'idVariedad', 'Variedad', 'idGrado', 'Grado', 'Ramos', 'Tallos', 'idCausa', 'Causa',
+]
+
+# Motor de lectura: 'c' (por defecto) o 'pyarrow' si está instalado
+MOTOR_CSV = os.environ.get('FLORES_CSV_MOTOR', 'c')
+DIRECTORIO_CUARENTENA = os.environ.get(
+    'FLORES_CUARENTENA_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'cuarentena'),
+)
+
+# Columnas de texto con menos de esta proporción de valores distintos se guardan como categoría
+UMBRAL_CATEGORIA = 0.5
+
+# Tope de memoria (MiB) para leer NCC/NCP; sin definir se leen completos
+MEMORIA_MAX_MB = float(os.environ.get('FLORES_MEMORIA_MAX_MB') or 0)
+# RAM por byte de CSV al leer y limpiar (con el motor C el pico de lectura es ~1,5 veces el archivo)
+FACTOR_MEMORIA = 2
+
+_LINEA_OMITIDA = re.compile(r'Skipping line (\d+): (.*)')
+
+
+def _opciones_lectura(motor):
+    return dict(
+        sep=';',
+        engine=motor,
+        dtype={col: 'category' for col in COLUMNAS_CATEGORICAS + [COLUMNA_FECHA]},
+        true_values=['VERDADERO'],
+        false_values=['FALSO'],
+    )
+
+
+def _leer_con_rechazos(ruta, motor):
+    """Lee el CSV devolviendo también las líneas mal formadas como (número, texto, motivo)."""
+    rechazadas = []
+    if motor == 'pyarrow':
+        def manejar(fila):
+            rechazadas.append((fila.number, fila.text, f"se esperaban {fila.expected_columns} campos, hay {fila.actual_columns}"))
+            return 'skip'
+        return pd.read_csv(ruta, on_bad_lines=manejar, **_opciones_lectura(motor)), rechazadas
+
+    with warnings.catch_warnings(record=True) as avisos:
+        warnings.simplefilter('always', pd.errors.ParserWarning)
+        df = pd.read_csv(ruta, on_bad_lines='warn', **_opciones_lectura(motor))
+    return df, _rechazos_de_avisos(avisos, ruta)
+
+
+def _rechazos_de_avisos(avisos, ruta):
+    numeros = {}
+    for aviso in avisos:
+        for numero, motivo in _LINEA_OMITIDA.findall(str(aviso.message)):
+            numeros[int(numero)] = motivo
+    rechazadas = []
+    if numeros:
+        # Sólo se relee el archivo en el caso raro de que haya líneas rechazadas
+        for numero, linea in enumerate(_lineas(ruta), start=1):
+            if numero in numeros:
+                rechazadas.append((numero, linea.rstrip('\r\n'), numeros[numero]))
+    return rechazadas
+
+
+def _lineas(origen):
+    if hasattr(origen, 'read'):
+        # Búfer en memoria (p. ej. sólo las líneas nuevas de una carga incremental)
+        origen.seek(0)
+        contenido = origen.read()
+        if isinstance(contenido, bytes):
+            contenido = contenido.decode('utf-8-sig', errors='replace')
+        yield from contenido.splitlines()
+        return
+    with open(origen, encoding='utf-8-sig', errors='replace') as f:
+        yield from f
+
+
+def _tipar_enteros(df):
+    """Convierte las columnas enteras a su ancho declarado.
+
+    Devuelve las columnas ya convertidas y la máscara de filas con valores no numéricos o
+    fuera de rango; el DataFrame no se modifica para poder enviar esas filas intactas a cuarentena.
+    """
+    invalidas = np.zeros(len(df), dtype=bool)
+    convertidas = {}
+    for col, tipo in COLUMNAS_ENTERAS.items():
+        if col not in df.columns:
+            continue
+        serie = df[col]
+        if not pd.api.types.is_integer_dtype(serie):
+            # Sólo se paga la coerción cuando el motor no pudo inferir enteros
+            serie = pd.to_numeric(serie, errors='coerce')
+            invalidas |= serie.isna().to_numpy()
+            serie = serie.fillna(0)
+        info = np.iinfo(tipo)
+        fuera_de_rango = (serie < info.min) | (serie > info.max)
+        invalidas |= fuera_de_rango.to_numpy()
+        convertidas[col] = serie.where(~fuera_de_rango, 0).astype(tipo)
+    return convertidas, invalidas
+
+
+def guardar_cuarentena(nombre, rechazadas, filas_invalidas, directorio=None):
+    """Escribe las filas rechazadas en <directorio>/<nombre>.rechazadas.csv; devuelve la ruta o None."""
+    directorio = directorio or DIRECTORIO_CUARENTENA
+    ruta = os.path.join(directorio, f"{os.path.basename(nombre)}.rechazadas.csv")
+    if not rechazadas and filas_invalidas.empty:
+        # Sin rechazos: no dejar la cuarentena de una carga anterior
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        return None
+    os.makedirs(directorio, exist_ok=True)
+    partes = [pd.DataFrame(rechazadas, columns=['Linea', 'Contenido', 'Motivo'])]
+    if not filas_invalidas.empty:
+        # +2: la cabecera ocupa la línea 1 y el índice empieza en 0 (se desplaza si hubo líneas omitidas)
+        partes.append(pd.DataFrame({
+            'Linea': filas_invalidas.index + 2,
+            'Contenido': filas_invalidas.to_csv(sep=';', header=False, index=False).splitlines(),
+            'Motivo': 'valor no numérico o fuera de rango',
+        }))
+    pd.concat(partes, ignore_index=True).to_csv(ruta, sep=';', index=False)
+    return ruta
+
+
+def leer_csv_nc(ruta, motor=None, directorio_cuarentena=None, nombre=None):
+    """Lee un NCC/NCP con el esquema declarado.
+
+    Las líneas mal formadas y las filas con ids o cantidades no numéricas se separan a un
+    archivo de cuarentena en lugar de descartarse en silencio. `ruta` puede ser también un
+    búfer; entonces `nombre` da el nombre de la cuarentena. Devuelve (df, ruta_cuarentena).
+    """
+    motor = motor or MOTOR_CSV
+    nombre = nombre or os.path.basename(ruta)
+    df, rechazadas = _leer_con_rechazos(ruta, motor)
+    faltantes = [col for col in COLUMNAS_ESQUEMA if col not in df.columns]
+    if faltantes:
+        raise ValueError(f"{nombre} no tiene las columnas esperadas: {', '.join(faltantes)}")
+    convertidas, invalidas = _tipar_enteros(df)
+    ruta_cuarentena = guardar_cuarentena(nombre, rechazadas, df[invalidas], directorio_cuarentena)
+    df = df.assign(**convertidas)
+    if invalidas.any():
+        df = df[~invalidas].reset_index(drop=True)
+        for col in COLUMNAS_CATEGORICAS:
+            if col in df.columns:
+                df[col] = df[col].cat.remove_unused_categories()
+    return df, ruta_cuarentena
+
+
+def filas_por_lote(ruta, memoria_max_mb=None):
+    """Filas por lote para leer `ruta` sin pasar del tope de memoria, o None si cabe completo.
+
+    Un archivo se lee completo si leerlo y limpiarlo usa como mucho la mitad del tope; si no,
+    cada lote se dimensiona para un cuarto del tope según el largo medio de línea.
+    """
+    memoria_max_mb = MEMORIA_MAX_MB if memoria_max_mb is None else memoria_max_mb
+    if not memoria_max_mb or hasattr(ruta, 'read'):
+        return None
+    tope = memoria_max_mb * 1024 * 1024
+    if os.path.getsize(ruta) * FACTOR_MEMORIA <= tope / 2:
+        return None
+    with open(ruta, 'rb') as f:
+        muestra = f.read(1024 * 1024)
+    bytes_por_linea = len(muestra) / max(1, muestra.count(b'\n'))
+    return max(1000, int(tope / 4 / (bytes_por_linea * FACTOR_MEMORIA)))
+
+
+def leer_csv_nc_por_lotes(ruta, filas, procesar_lote, directorio_cuarentena=None):
+    """Lee un NCC/NCP en lotes de `filas` filas y pasa cada lote tipado a `procesar_lote(df)`.
+
+    Mismo esquema y cuarentena que leer_csv_nc, pero nunca se tiene el archivo completo en
+    memoria: los rechazos de todos los lotes se escriben juntos al final. Devuelve la ruta de
+    la cuarentena o None.
+    """
+    invalidas_lotes = []
+    with warnings.catch_warnings(record=True) as avisos:
+        warnings.simplefilter('always', pd.errors.ParserWarning)
+        # chunksize sólo lo admite el motor C
+        for df in pd.read_csv(ruta, on_bad_lines='warn', chunksize=filas, **_opciones_lectura('c')):
+            faltantes = [col for col in COLUMNAS_ESQUEMA if col not in df.columns]
+            if faltantes:
+                raise ValueError(f"{os.path.basename(ruta)} no tiene las columnas esperadas: {', '.join(faltantes)}")
+            convertidas, invalidas = _tipar_enteros(df)
+            if invalidas.any():
+                # El índice de cada lote sigue la numeración del archivo, así que la línea se conserva
+                invalidas_lotes.append(df[invalidas])
+            df = df.assign(**convertidas)
+            procesar_lote(df[~invalidas] if invalidas.any() else df)
+    filas_invalidas = pd.concat(invalidas_lotes) if invalidas_lotes else pd.DataFrame()
+    return guardar_cuarentena(ruta, _rechazos_de_avisos(avisos, ruta), filas_invalidas, directorio_cuarentena)
+
+
+def concatenar(partes):
+    """Une tablas con el mismo esquema (partes o particiones) conservando las columnas categóricas."""
+    if len(partes) == 1:
+        return partes[0]
+    df = pd.concat(partes, ignore_index=True)
+    # Con categorías distintas en cada parte concat deja texto: se vuelven a codificar
+    for col in partes[0].columns:
+        if isinstance(partes[0][col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+def categorizar(df):
+    """Codifica como categoría las columnas de texto repetitivas (Finca, Variedad, Causa...)."""
+    for col in df.columns:
+        serie = df[col]
+        if (pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie)) and len(serie):
+            if serie.nunique(dropna=True) < UMBRAL_CATEGORIA * len(serie):
+                df[col] = serie.astype('category')
+    return df
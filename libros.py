@@ -0,0 +1,148 @@
+import hashlib
+import os
+import pickle
+import re
+
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+# 'openpyxl' (por defecto, en modo de sólo lectura) o 'calamine' (paquete python-calamine, más rápido)
+MOTOR_EXCEL = os.environ.get('FLORES_EXCEL_MOTOR', 'openpyxl')
+# Tablas ya leídas de cada libro, por hash del contenido: un libro que no cambió no se vuelve a leer
+DIRECTORIO_LIBROS = os.environ.get(
+    'FLORES_LIBROS_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'libros'),
+)
+# Se cambia cuando cambia la forma de leer, para no reutilizar tablas leídas de otra manera
+VERSION_CACHE = 1
+
+
+def _columnas(rango):
+    """'B:C,E' -> [1, 2, 4], como `usecols` de pandas.read_excel."""
+    def indice(letras):
+        n = 0
+        for letra in letras.strip().upper():
+            n = n * 26 + ord(letra) - ord('A') + 1
+        return n - 1
+
+    columnas = []
+    for parte in rango.split(','):
+        inicio, _, fin = parte.partition(':')
+        columnas.extend(range(indice(inicio), indice(fin or inicio) + 1))
+    return columnas
+
+
+def _celda_openpyxl(celda):
+    # Misma conversión que el lector openpyxl de pandas
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+    if celda.value is None:
+        return ""
+    if celda.data_type == TYPE_ERROR:
+        return float('nan')
+    if celda.data_type == TYPE_NUMERIC:
+        entero = int(celda.value)
+        return entero if entero == celda.value else float(celda.value)
+    return celda.value
+
+
+def _filas_openpyxl(ruta):
+    from openpyxl import load_workbook
+
+    libro = load_workbook(ruta, read_only=True, data_only=True, keep_links=False)
+    try:
+        hoja = libro.worksheets[0]
+        hoja.reset_dimensions()
+        filas = [[_celda_openpyxl(celda) for celda in fila] for fila in hoja.rows]
+    finally:
+        libro.close()
+    for fila in filas:
+        while fila and fila[-1] == "":
+            fila.pop()
+    while filas and not filas[-1]:
+        filas.pop()
+    ancho = max((len(fila) for fila in filas), default=0)
+    return [fila + [""] * (ancho - len(fila)) for fila in filas]
+
+
+def _celda_calamine(valor):
+    # Misma conversión que el lector calamine de pandas
+    import datetime
+
+    if isinstance(valor, float):
+        entero = int(valor)
+        return entero if entero == valor else valor
+    if isinstance(valor, datetime.date) and not isinstance(valor, datetime.datetime):
+        return datetime.datetime(valor.year, valor.month, valor.day)
+    return valor
+
+
+def _filas_calamine(ruta):
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError as e:
+        raise RuntimeError("FLORES_EXCEL_MOTOR=calamine requiere el paquete `python-calamine`.") from e
+    hoja = CalamineWorkbook.from_path(ruta).get_sheet_by_index(0)
+    return [[_celda_calamine(valor) for valor in fila] for fila in hoja.to_python(skip_empty_area=False)]
+
+
+LECTORES = {'openpyxl': _filas_openpyxl, 'calamine': _filas_calamine}
+
+
+def _tabla(filas, header=0, usecols=None, names=None):
+    # Lo que hace pandas.read_excel con las filas de la hoja, sin volver a abrir el libro
+    if not filas:
+        return pd.DataFrame()
+    parser = TextParser(
+        [list(fila) for fila in filas],
+        header=header,
+        names=names,
+        usecols=_columnas(usecols) if isinstance(usecols, str) else usecols,
+        skip_blank_lines=False,
+    )
+    return parser.read()
+
+
+def huella_archivo(ruta):
+    h = hashlib.sha1()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _ruta_cache(ruta, tablas, directorio):
+    clave = repr((VERSION_CACHE, sorted((nombre, sorted(opciones.items())) for nombre, opciones in tablas.items())))
+    firma = hashlib.sha1(clave.encode()).hexdigest()[:12]
+    return os.path.join(directorio, f"{huella_archivo(ruta)}-{firma}.pkl")
+
+
+def leer(ruta, tablas, motor=None, directorio=None):
+    """Lee varias tablas de la primera hoja de un libro abriéndolo una sola vez.
+
+    `tablas` es {nombre: {'header', 'usecols', 'names'}} con el significado de pandas.read_excel.
+    Las filas de la hoja se leen una vez y cada tabla se arma a partir de ellas. El resultado se
+    guarda por hash del contenido del libro, así que un libro que no cambió (aunque se haya vuelto
+    a descargar o copiar) no se vuelve a leer.
+    """
+    directorio = directorio or DIRECTORIO_LIBROS
+    ruta_cache = None
+    try:
+        ruta_cache = _ruta_cache(ruta, tablas, directorio)
+        with open(ruta_cache, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+    filas = LECTORES[motor or MOTOR_EXCEL](ruta)
+    resultado = {nombre: _tabla(filas, **opciones) for nombre, opciones in tablas.items()}
+    if ruta_cache:
+        try:
+            os.makedirs(directorio, exist_ok=True)
+            temporal = f"{ruta_cache}.{os.getpid()}.tmp"
+            with open(temporal, 'wb') as f:
+                pickle.dump(resultado, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporal, ruta_cache)
+        except OSError:
+            # Sin caché en disco se sigue funcionando, sólo que se vuelve a leer la próxima vez
+            pass
+    return resultado
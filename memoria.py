@@ -0,0 +1,124 @@
+import multiprocessing
+import queue
+import resource
+import signal
+import sys
+
+import pandas as pd
+
+import carga
+import cubo
+
+# Segundos entre revisiones del proceso de medición mientras no entrega su resultado
+ESPERA_PROCESO = 1.0
+
+
+class MedicionFallida(RuntimeError):
+    pass
+
+
+def pico_rss_mb():
+    # ru_maxrss está en KiB en Linux y en bytes en macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+def _analisis_anterior(rutas):
+    """Reproduce la versión anterior sobre NCC/NCP: motor python, texto plano y copias por sección."""
+    df_causa_mapeo = carga.cargar_causa_mapeo(rutas['causa_agrupado'])
+    tablas = []
+    for nombre in ('ncc', 'ncp'):
+        df = pd.read_csv(rutas[nombre], sep=';', engine='python', on_bad_lines='skip')
+        df['FechaJornada'] = pd.to_datetime(df['FechaJornada'], errors='coerce')
+        df['Hora'] = pd.to_datetime(df['Hora'], errors='coerce').dt.time
+        df['Causa'] = df['Causa'].astype(str)
+        for col in ['Ramos', 'Tallos']:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+        tablas.append(pd.merge(df, df_causa_mapeo, on='Causa', how='left'))
+    df_ncc, df_ncp = tablas
+
+    df_ncc.groupby(['Finca', 'CausaAgrupada'])['Tallos'].sum().nlargest(10)
+    df_ncp.groupby('CausaAgrupada')['Tallos'].sum().nlargest(10)
+    df_ncp_clean = df_ncp.copy()
+    df_ncp_clean['Causa'] = df_ncp_clean['Causa'].astype(str)
+    df_ncp_clean[df_ncp_clean['Causa'].isin(['MALA MARCACION'])]['Tallos'].sum()
+    df_ncp_temp = df_ncp.copy()
+    df_ncp_temp['Finca'] = df_ncp_temp['Finca'].astype(str)
+    df_ncp_temp['Producto'] = df_ncp_temp['Producto'].astype(str)
+    df_ncp_temp.groupby(['Finca', 'Producto'])['Tallos'].sum()
+
+
+def _analisis_actual(rutas):
+    """Misma carga y agregaciones con el esquema tipado y el cubo compartido, sin copias."""
+    df_causa_mapeo = carga.cargar_causa_mapeo(rutas['causa_agrupado'])
+    tablas = []
+    for nombre in ('ncc', 'ncp'):
+        df, _ = carga.cargar_csv(rutas[nombre])
+        tablas.append(carga.unir_causas(carga.limpiar(df), df_causa_mapeo))
+    cubo_datos = cubo.construir(carga.DatosFlores(pd.DataFrame(), df_causa_mapeo, pd.DataFrame(), *tablas))
+    cubo_ncc, cubo_ncp = cubo_datos.tablas['ncc'], cubo_datos.tablas['ncp']
+
+    cubo_ncc.groupby(['Finca', 'CausaAgrupada'], observed=True)['Tallos'].sum().nlargest(10)
+    cubo_ncp.groupby('CausaAgrupada', observed=True)['Tallos'].sum().nlargest(10)
+    cubo_ncp.loc[cubo_ncp['Causa'].isin(['MALA MARCACION']), 'Tallos'].sum()
+    cubo_ncp.groupby(['Finca', 'Producto'], observed=True)['Tallos'].sum()
+
+
+ESCENARIOS = {'anterior': _analisis_anterior, 'actual': _analisis_actual}
+
+
+def _medir(nombre, rutas, cola):
+    base = pico_rss_mb()
+    ESCENARIOS[nombre](rutas)
+    cola.put((nombre, base, pico_rss_mb()))
+
+
+def esperar_resultado(proceso, cola):
+    """Resultado que `proceso` deja en `cola`.
+
+    Si el proceso termina sin dejarlo (una excepción, o el sistema lo mató por falta de memoria)
+    lanza MedicionFallida con su código de salida en lugar de esperar para siempre.
+    """
+    while True:
+        try:
+            resultado = cola.get(timeout=ESPERA_PROCESO)
+            break
+        except queue.Empty:
+            if proceso.is_alive():
+                continue
+        # Terminó: lo que haya puesto antes de salir ya está en la cola o no va a llegar
+        try:
+            resultado = cola.get(timeout=ESPERA_PROCESO)
+            break
+        except queue.Empty:
+            proceso.join()
+            if proceso.exitcode == -signal.SIGKILL:
+                motivo = "lo mató el sistema, probablemente por falta de memoria"
+            elif proceso.exitcode < 0:
+                motivo = f"señal {-proceso.exitcode}"
+            else:
+                motivo = f"código {proceso.exitcode}"
+            raise MedicionFallida(f"el proceso de medición terminó ({motivo}) sin entregar resultados")
+    proceso.join()
+    return resultado
+
+
+def informe(rutas):
+    """Mide el pico de RSS de cada escenario en un proceso nuevo; devuelve un DataFrame en MiB.
+
+    Un escenario cuyo proceso falla queda con sus medidas vacías y el motivo en la columna Error.
+    """
+    # 'spawn' para que cada medición empiece sin la memoria del proceso que la lanza
+    contexto = multiprocessing.get_context('spawn')
+    filas = []
+    for nombre in ESCENARIOS:
+        cola = contexto.Queue()
+        proceso = contexto.Process(target=_medir, args=(nombre, rutas, cola))
+        proceso.start()
+        try:
+            escenario, base, pico = esperar_resultado(proceso, cola)
+        except MedicionFallida as e:
+            filas.append({'Escenario': nombre, 'Error': str(e)})
+            continue
+        filas.append({'Escenario': escenario, 'RSS base (MiB)': base, 'Pico RSS (MiB)': pico, 'Incremento (MiB)': pico - base})
+    return pd.DataFrame(filas).round(1)
@@ -0,0 +1,117 @@
+import contextlib
+import cProfile
+import datetime
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+# Directorio donde se guarda un .prof de cProfile por cada ejecución del tablero; vacío para no perfilar
+DIRECTORIO_CPROFILE = os.environ.get('FLORES_CPROFILE', '')
+# Archivo al que se agrega una línea JSON por etapa medida; vacío para dejarlo sólo en `logging`
+RUTA_LOG = os.environ.get('FLORES_PERFIL_LOG', '')
+# Mediciones recientes que se conservan en memoria para el panel de diagnóstico
+MAX_REGISTROS = 500
+
+log = logging.getLogger('flores.perfil')
+if RUTA_LOG:
+    _manejador = logging.FileHandler(RUTA_LOG, encoding='utf-8')
+    _manejador.setFormatter(logging.Formatter('%(message)s'))
+    log.addHandler(_manejador)
+    log.setLevel(logging.INFO)
+
+_registros = deque(maxlen=MAX_REGISTROS)
+_bloqueo = threading.Lock()
+# Streamlit ejecuta cada sesión en su propio hilo: la ejecución en curso se guarda por hilo
+_local = threading.local()
+_contador = itertools.count(1)
+
+
+def rss_mb():
+    """Memoria residente del proceso en MiB (sólo Linux; None en otros sistemas)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+def corrida_actual():
+    return getattr(_local, 'corrida', None)
+
+
+def iniciar_corrida():
+    """Marca el comienzo de una ejecución del tablero; con FLORES_CPROFILE empieza a perfilar."""
+    _local.corrida = next(_contador)
+    _local.inicio = time.perf_counter()
+    _local.perfilador = None
+    if DIRECTORIO_CPROFILE:
+        _local.perfilador = cProfile.Profile()
+        _local.perfilador.enable()
+    return _local.corrida
+
+
+def terminar_corrida():
+    """Cierra la ejecución en curso: devuelve (segundos, ruta del .prof o None)."""
+    segundos = time.perf_counter() - getattr(_local, 'inicio', time.perf_counter())
+    perfilador, _local.perfilador = getattr(_local, 'perfilador', None), None
+    if perfilador is None:
+        return segundos, None
+    perfilador.disable()
+    os.makedirs(DIRECTORIO_CPROFILE, exist_ok=True)
+    marca = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+    ruta = os.path.join(DIRECTORIO_CPROFILE, f"corrida-{marca}-{os.getpid()}-{corrida_actual()}.prof")
+    perfilador.dump_stats(ruta)
+    return segundos, ruta
+
+
+def propagar(funcion):
+    """Envuelve `funcion` para que, ejecutada en otro hilo, registre sus etapas en la ejecución actual."""
+    corrida = corrida_actual()
+
+    def envuelta(*args, **kwargs):
+        _local.corrida = corrida
+        return funcion(*args, **kwargs)
+    return envuelta
+
+
+def registrar(nombre, segundos, filas=None, memoria_mb=None):
+    registro = {
+        'corrida': corrida_actual(),
+        'momento': datetime.datetime.now().isoformat(timespec='milliseconds'),
+        'hilo': threading.current_thread().name,
+        'etapa': nombre,
+        'segundos': round(segundos, 4),
+        'filas': filas,
+        'memoria_mb': None if memoria_mb is None else round(memoria_mb, 1),
+    }
+    with _bloqueo:
+        _registros.append(registro)
+    log.info(json.dumps(registro, ensure_ascii=False))
+
+
+@contextlib.contextmanager
+def etapa(nombre, filas=None):
+    """Mide el tiempo y la variación de memoria residente de un bloque.
+
+    Devuelve un dict en el que el bloque puede dejar las filas procesadas (`medicion['filas']`)
+    cuando no se conocen de antemano. La medición se registra aunque el bloque falle.
+    """
+    medicion = {'filas': filas}
+    base = rss_mb()
+    inicio = time.perf_counter()
+    try:
+        yield medicion
+    finally:
+        final = rss_mb() if base is not None else None
+        registrar(nombre, time.perf_counter() - inicio, medicion['filas'], None if final is None else final - base)
+
+
+def registros(corrida=None):
+    """Mediciones recientes, de la ejecución `corrida` si se indica."""
+    with _bloqueo:
+        lista = list(_registros)
+    return [r for r in lista if corrida is None or r['corrida'] == corrida]
@@ -0,0 +1,175 @@
+import dataclasses
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import consultas
+
+# Largo de las listas "top N" que se guardan ya ordenadas por cada ventana de tiempo
+TOP_N = 10
+# Ventanas con su top precalculado: un rango de fechas que coincide con una se responde sin calcular
+VENTANAS = {'dia': 'D', 'semana': 'W', 'mes': 'M'}
+# Memoria de los rankings guardados de cada cubo completo (de todos sus filtros); se descartan los menos usados
+MAX_MB = float(os.environ.get('FLORES_RANKING_MAX_MB') or 64)
+# Celdas (días x claves, 12 bytes cada una) a partir de las cuales no se acumula y se agrupa el cubo directamente
+MAX_CELDAS = int(os.environ.get('FLORES_RANKING_MAX_CELDAS') or 1_000_000)
+
+class _Ranking:
+    """Sumas acumuladas por día de `medida` para cada clave de `por`, con sus tops por ventana.
+
+    La suma de cualquier rango de días es la resta de dos filas, y el top N sale de una selección
+    parcial (np.partition) sobre las claves: el costo depende del número de claves, no de los
+    registros ni de los días del rango.
+    """
+
+    def __init__(self, df, por, medida):
+        sumas = df.groupby(['FechaJornada'] + por, observed=True, dropna=False)[medida].agg(['sum', 'size'])
+        # Como en un groupby sobre el cubo, las filas sin clave no cuentan (las sin fecha sí, si no se filtran fechas)
+        claves = sumas.index.droplevel(0)
+        validas = claves.to_frame(index=False).notna().all(axis=1).to_numpy()
+        sumas, claves = sumas[validas], claves[validas]
+        # Claves en el orden del groupby sobre el cubo: a igual valor, el top las deja en ese orden
+        self.claves = sumas.groupby(level=list(range(1, len(por) + 1)), observed=True).size().index
+        # Mismo tipo que daría el groupby sobre el cubo
+        self.tipo = df[medida].dtype
+        columnas = self.claves.get_indexer(claves)
+        fechas = sumas.index.get_level_values(0)
+        con_fecha = np.asarray(fechas.notna())
+        self.dias = pd.DatetimeIndex(fechas[con_fecha].unique()).sort_values()
+        filas = self.dias.get_indexer(fechas[con_fecha])
+
+        diarias = np.zeros((len(self.dias), len(self.claves)))
+        diarias[filas, columnas[con_fecha]] = sumas['sum'].to_numpy()[con_fecha]
+        presentes = np.zeros((len(self.dias), len(self.claves)), dtype='int32')
+        presentes[filas, columnas[con_fecha]] = sumas['size'].to_numpy()[con_fecha]
+        # Fila 0 en ceros: el rango [i, j) de días suma acumulada[j] - acumulada[i]
+        self.acumulada = np.vstack([np.zeros((1, len(self.claves))), diarias.cumsum(axis=0)])
+        self.presencia = np.vstack([np.zeros((1, len(self.claves)), dtype='int32'), presentes.cumsum(axis=0)])
+        self.sin_fecha = np.zeros(len(self.claves))
+        self.sin_fecha_presencia = np.zeros(len(self.claves), dtype='int32')
+        np.add.at(self.sin_fecha, columnas[~con_fecha], sumas['sum'].to_numpy()[~con_fecha])
+        np.add.at(self.sin_fecha_presencia, columnas[~con_fecha], sumas['size'].to_numpy()[~con_fecha])
+
+        # Top de cada día, semana y mes con datos, indexado por su primer y último día
+        self.ventanas = {}
+        for frecuencia in VENTANAS.values():
+            periodos = self.dias.to_period(frecuencia)
+            for periodo in periodos.unique():
+                rango = (periodo.start_time.normalize(), periodo.end_time.normalize())
+                self.ventanas[rango] = self._seleccionar(*self._rango(*rango, incluir_sin_fecha=False), TOP_N)
+        self.nbytes = (
+            self.acumulada.nbytes + self.presencia.nbytes + self.sin_fecha.nbytes
+            + self.sin_fecha_presencia.nbytes + self.claves.memory_usage()
+            + sum(posiciones.nbytes + valores.nbytes for posiciones, valores in self.ventanas.values())
+        )
+
+    def _rango(self, desde, hasta, incluir_sin_fecha):
+        i = 0 if desde is None else self.dias.searchsorted(desde, side='left')
+        j = len(self.dias) if hasta is None else self.dias.searchsorted(hasta, side='right')
+        valores = self.acumulada[j] - self.acumulada[i]
+        presencia = self.presencia[j] - self.presencia[i]
+        if incluir_sin_fecha:
+            valores, presencia = valores + self.sin_fecha, presencia + self.sin_fecha_presencia
+        return valores, presencia
+
+    @staticmethod
+    def _seleccionar(valores, presencia, n):
+        # Selección parcial: se busca el n-ésimo valor y sólo se ordenan las claves que lo alcanzan
+        posiciones = np.flatnonzero(presencia > 0)
+        if len(posiciones) > n:
+            umbral = np.partition(valores[posiciones], len(posiciones) - n)[len(posiciones) - n]
+            posiciones = posiciones[valores[posiciones] >= umbral]
+        # De mayor a menor y, a igual valor, en el orden de las claves, como nlargest(keep='first')
+        posiciones = posiciones[np.lexsort((posiciones, -valores[posiciones]))][:n]
+        return posiciones, valores[posiciones]
+
+    def top(self, n, desde=None, hasta=None):
+        sin_fechas = desde is None and hasta is None
+        rango = (desde, hasta)
+        if not sin_fechas and n <= TOP_N and rango in self.ventanas:
+            posiciones, valores = self.ventanas[rango]
+            posiciones, valores = posiciones[:n], valores[:n]
+        else:
+            posiciones, valores = self._seleccionar(*self._rango(desde, hasta, sin_fechas), n)
+        return posiciones, valores
+
+
+def _armar(cubo_base, filtro, fuente, por, condicion, medida):
+    df = (consultas.filtrar_cubo(cubo_base, filtro) if filtro.activo() else cubo_base).tablas[fuente]
+    for col, valor in condicion:
+        df = df[df[col] == valor]
+    dias = df['FechaJornada'].nunique() if 'FechaJornada' in df.columns else 0
+    claves = len(df[list(por)].drop_duplicates())
+    # Sin fechas o con demasiadas celdas (o más de las que caben en el tope) no conviene acumular
+    celdas = min(MAX_CELDAS, MAX_MB * 2 ** 20 / 12)
+    return _Ranking(df, list(por), medida) if dias and dias * claves <= celdas else None
+
+
+class Indice:
+    """Rankings de un cubo completo, que se guarda en su atributo `rankings` y se libera con él.
+
+    carga._armar lo arma junto con el cubo de cada versión de los datos. Cada ranking se calcula
+    la primera vez que se pide y se guarda mientras el total quepa en MAX_MB.
+    """
+
+    def __init__(self):
+        # (filtro sin fechas, fuente, por, condición, medida) -> _Ranking (o None si no se acumula)
+        self._rankings = OrderedDict()
+        self._bytes = 0
+        self._bloqueo = threading.Lock()
+
+    def __getstate__(self):
+        # Otro proceso (p. ej. los de informe.generar) recibe el índice vacío y lo llena a pedido
+        return {}
+
+    def __setstate__(self, estado):
+        self.__init__()
+
+    def ranking(self, cubo_base, filtro, fuente, por, condicion, medida):
+        """_Ranking de la combinación pedida, armado la primera vez y guardado mientras quepa en MAX_MB."""
+        clave = (filtro, fuente, por, condicion, medida)
+        with self._bloqueo:
+            if clave in self._rankings:
+                self._rankings.move_to_end(clave)
+                return self._rankings[clave]
+        ranking = _armar(cubo_base, filtro, fuente, por, condicion, medida)
+        with self._bloqueo:
+            if clave in self._rankings:
+                return self._rankings[clave]
+            self._rankings[clave] = ranking
+            self._bytes += ranking.nbytes if ranking is not None else 0
+            while self._bytes > MAX_MB * 2 ** 20 and len(self._rankings) > 1:
+                descartado = self._rankings.popitem(last=False)[1]
+                self._bytes -= descartado.nbytes if descartado is not None else 0
+        return ranking
+
+
+def top(cubo_datos, fuente, por, n=TOP_N, condicion=None, medida='Tallos'):
+    """Serie con las `n` claves de `por` con más `medida` en `fuente`, de mayor a menor.
+
+    Equivale a `groupby(por)[medida].sum().nlargest(n)` sobre `cubo_datos` (con `condicion`,
+    {columna: valor}, aplicada antes), también en el orden de los empates. Si el cubo viene de
+    consultas.filtrar_cubo, el ranking se arma sobre el cubo original restringido sólo a
+    finca/producto/grado y el rango de fechas se resuelve con las sumas acumuladas. Un cubo sin
+    Indice en `rankings` (p. ej. armado a mano) se agrupa directamente.
+    """
+    por = [por] if isinstance(por, str) else list(por)
+    condicion = tuple(sorted((condicion or {}).items()))
+    base, filtro = cubo_datos.origen or (cubo_datos, consultas.Filtro())
+    desde, hasta = filtro.desde, filtro.hasta
+    ranking = None
+    if base.rankings is not None:
+        ranking = base.rankings.ranking(base, dataclasses.replace(filtro, desde=None, hasta=None), fuente, tuple(por), condicion, medida)
+    if ranking is not None:
+        posiciones, valores = ranking.top(n, desde, hasta)
+        if pd.api.types.is_integer_dtype(ranking.tipo):
+            valores = valores.round().astype(ranking.tipo)
+        return pd.Series(valores, index=ranking.claves[posiciones], name=medida)
+    # Sin índice, o tabla sin fechas o demasiado grande para acumular: se agrupa el cubo ya filtrado
+    df = cubo_datos.tablas[fuente]
+    for col, valor in condicion:
+        df = df[df[col] == valor]
+    return df.groupby(por, observed=True)[medida].sum().nlargest(n)
@@ -0,0 +1,283 @@
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import carga
+import clasificacion
+import consultas
+import cubo
+import libros
+import memoria
+import perfil
+import ranking
+
+DIRECTORIO_RENDIMIENTO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'rendimiento')
+ESCALAS = [10_000, 100_000]
+MAX_FILAS = 50_000_000
+# Excel no admite más filas por hoja: Produccion.xlsx se genera hasta este tamaño
+EXCEL_MAX_FILAS = 1_048_575
+# Filas que se generan y escriben de una vez, para no tener el archivo completo en memoria
+FILAS_POR_LOTE = 1_000_000
+# Una etapa es una regresión si tarda más de (1 + umbral) veces lo que tardaba y al menos esto
+SEGUNDOS_MINIMOS = 0.05
+# Segundos entre muestras del RSS durante cada etapa
+INTERVALO_MUESTREO = 0.005
+FECHA_INICIAL = datetime.date(2022, 3, 1)
+# Día cero de los seriales de fecha de Excel (NCC guarda la fecha como serial)
+_ORIGEN_EXCEL = datetime.date(1899, 12, 30)
+
+def _plantillas(rutas):
+    """Registros reales de NCC/NCP/Producción: los sintéticos se toman de ellos con reposición,
+    así que Finca, Bloque, Variedad, Grado y Causa conservan su distribución conjunta."""
+    for nombre in ('ncc', 'ncp', 'produccion'):
+        if not rutas.get(nombre) or not os.path.isfile(rutas[nombre]):
+            raise FileNotFoundError(
+                f"No se encontró {carga.ARCHIVOS[nombre]} en {rutas.get(nombre)}: los datos sintéticos se "
+                f"toman de los registros de la fuente configurada (FLORES_DATOS_DIR)")
+    plantillas = {}
+    for nombre in ('ncc', 'ncp'):
+        plantillas[nombre] = pd.read_csv(rutas[nombre], sep=';', dtype=str, encoding='utf-8-sig', keep_default_na=False)
+    plantillas['produccion'] = pd.read_excel(rutas['produccion'])
+    vacias = [carga.ARCHIVOS[nombre] for nombre, df in plantillas.items() if df.empty]
+    if vacias:
+        raise ValueError(f"Sin registros de los que tomar los datos sintéticos: {', '.join(vacias)}")
+    return plantillas
+
+
+def _fechas_nc(plantilla, indices, dias, rng):
+    # Cada registro conserva el formato de fecha de su plantilla (serial de Excel o d/mm/aaaa)
+    fechas = [FECHA_INICIAL + datetime.timedelta(days=d) for d in range(dias)]
+    seriales = np.array([str((f - _ORIGEN_EXCEL).days) for f in fechas])
+    textos = np.array([f"{f.day}/{f.month:02d}/{f.year}" for f in fechas])
+    es_serial = plantilla['FechaJornada'].str.isdigit().to_numpy()[indices]
+    dia = rng.integers(0, dias, len(indices))
+    return np.where(es_serial, seriales[dia], textos[dia])
+
+
+def _dias(plantilla, filas):
+    # Misma densidad de registros por día que los datos reales: más filas son más días
+    por_dia = len(plantilla) / max(plantilla['FechaJornada'].nunique(), 1)
+    return max(1, int(np.ceil(filas / por_dia)))
+
+
+def _generar_nc(plantilla, filas, ruta, rng):
+    dias = _dias(plantilla, filas)
+    for inicio in range(0, filas, FILAS_POR_LOTE):
+        indices = rng.integers(0, len(plantilla), min(FILAS_POR_LOTE, filas - inicio))
+        lote = plantilla.iloc[indices].reset_index(drop=True)
+        lote['FechaJornada'] = _fechas_nc(plantilla, indices, dias, rng)
+        lote.to_csv(ruta, sep=';', index=False, header=inicio == 0, mode='w' if inicio == 0 else 'a',
+                    encoding='utf-8-sig' if inicio == 0 else 'utf-8')
+
+
+def _generar_produccion(plantilla, filas, ruta, rng):
+    from openpyxl import Workbook
+
+    filas = min(filas, EXCEL_MAX_FILAS)
+    dias = _dias(plantilla, filas)
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet()
+    hoja.append(list(plantilla.columns))
+    for inicio in range(0, filas, FILAS_POR_LOTE):
+        lote = plantilla.sample(min(FILAS_POR_LOTE, filas - inicio), replace=True, random_state=rng).reset_index(drop=True)
+        lote['FechaJornada'] = pd.Timestamp(FECHA_INICIAL) + pd.to_timedelta(rng.integers(0, dias, len(lote)), unit='D')
+        for fila in lote.itertuples(index=False):
+            hoja.append([v.to_pydatetime() if isinstance(v, pd.Timestamp) else v for v in fila])
+    libro.save(ruta)
+
+
+def generar(filas, directorio, rutas, semilla=0):
+    """Escribe NCC.csv, NCP.csv y Produccion.xlsx sintéticos de `filas` registros en `directorio`.
+
+    Los registros se toman de los archivos de `rutas` (los de la fuente configurada) y se
+    reparten en tantos días como hagan falta para mantener la densidad diaria real. Causa
+    agrupado.xlsx se copia tal cual. Un directorio ya generado con los mismos parámetros se
+    reutiliza.
+    """
+    if not 0 < filas <= MAX_FILAS:
+        raise ValueError(f"filas debe estar entre 1 y {MAX_FILAS}")
+    parametros = {'filas': filas, 'semilla': semilla}
+    ruta_parametros = os.path.join(directorio, 'parametros.json')
+    try:
+        with open(ruta_parametros, encoding='utf-8') as f:
+            if json.load(f) == parametros:
+                return directorio
+    except (OSError, ValueError):
+        pass
+    os.makedirs(directorio, exist_ok=True)
+    rng = np.random.default_rng(semilla)
+    plantillas = _plantillas(rutas)
+    for nombre in ('ncc', 'ncp'):
+        _generar_nc(plantillas[nombre], filas, os.path.join(directorio, carga.ARCHIVOS[nombre]), rng)
+    _generar_produccion(plantillas['produccion'], filas, os.path.join(directorio, carga.ARCHIVOS['produccion']), rng)
+    shutil.copyfile(rutas['causa_agrupado'], os.path.join(directorio, carga.ARCHIVOS['causa_agrupado']))
+    with open(ruta_parametros, 'w', encoding='utf-8') as f:
+        json.dump(parametros, f)
+    return directorio
+
+
+def _medir(resultados, filas, etapa, funcion, *args):
+    # Un hilo muestrea el RSS mientras corre la etapa: a diferencia de tracemalloc no la hace más
+    # lenta y también ve la memoria de pyarrow y de las extensiones en C
+    base = perfil.rss_mb()
+    pico = [base]
+    parar = threading.Event()
+
+    def muestrear():
+        while not parar.wait(INTERVALO_MUESTREO):
+            pico[0] = max(pico[0], perfil.rss_mb())
+
+    muestreo = threading.Thread(target=muestrear, daemon=True) if base is not None else None
+    if muestreo:
+        muestreo.start()
+    inicio = time.perf_counter()
+    try:
+        return funcion(*args)
+    finally:
+        segundos = time.perf_counter() - inicio
+        parar.set()
+        if muestreo:
+            muestreo.join()
+            pico[0] = max(pico[0], perfil.rss_mb())
+        resultados.append({
+            'filas': filas, 'etapa': etapa, 'segundos': round(segundos, 4),
+            'pico_mb': round(pico[0] - base, 1) if base is not None else None,
+        })
+
+
+def _filtro_tipico(cubo_datos):
+    # Última semana de la primera finca: lo que más se consulta desde la barra lateral
+    valores, (_, fecha_max) = consultas.opciones(cubo_datos)
+    fincas = tuple(valores['Finca'][:1])
+    return consultas.Filtro(desde=fecha_max - pd.Timedelta(days=6) if fecha_max is not None else None,
+                            hasta=fecha_max, fincas=fincas)
+
+
+def medir_escala(directorio, filas, con_secciones=True):
+    """Mide el tiempo y el pico de RSS sobre el inicio de cada etapa y de cada sección.
+
+    Las etapas se ejecutan una tras otra, sin hilos ni cachés, para que cada medición sea
+    comparable entre versiones. Devuelve una lista de {filas, etapa, segundos, pico_mb}.
+    """
+    # Sin la caché de libros la lectura de los Excel se mide completa
+    libros.DIRECTORIO_LIBROS = os.path.join(directorio, 'libros')
+    shutil.rmtree(libros.DIRECTORIO_LIBROS, ignore_errors=True)
+    rutas = {nombre: os.path.join(directorio, archivo) for nombre, archivo in carga.ARCHIVOS.items()}
+    r = []
+    df_produccion = _medir(r, filas, 'lectura produccion', carga.cargar_produccion, rutas['produccion'])
+    libro = _medir(r, filas, 'lectura causa_agrupado', carga.cargar_causa_agrupado, rutas['causa_agrupado'])
+    df_ncc, _ = _medir(r, filas, 'lectura ncc', carga.cargar_csv, rutas['ncc'])
+    df_ncp, _ = _medir(r, filas, 'lectura ncp', carga.cargar_csv, rutas['ncp'])
+    tablas = [df_produccion, df_ncc, df_ncp]
+    tablas = _medir(r, filas, 'limpieza', lambda: [carga.limpiar(df) for df in tablas])
+    tablas = _medir(r, filas, 'union causas', lambda: [carga.unir_causas(df, libro['causa_mapeo']) for df in tablas])
+    tablas = _medir(r, filas, 'clasificacion', lambda: [clasificacion.clasificar(df) for df in tablas])
+    datos = carga.DatosFlores(tablas[0], libro['causa_mapeo'], libro['inspeccion'], tablas[1], tablas[2], {}, {})
+    cubo_datos = _medir(r, filas, 'cubo', cubo.construir, datos)
+    # Como en carga._armar: las secciones leen sus top N del índice del cubo
+    cubo_datos.rankings = ranking.Indice()
+    _medir(r, filas, 'filtro', consultas.filtrar_cubo, cubo_datos, _filtro_tipico(cubo_datos))
+    if con_secciones:
+        import graficos
+        import secciones
+
+        # Fuera de `streamlit run` las llamadas a st.* no dibujan nada y sólo avisan
+        logging.getLogger('streamlit').setLevel(logging.ERROR)
+        for titulo, seccion in secciones.SECCIONES.items():
+            graficos.limpiar_cache()
+            _medir(r, filas, f"seccion: {titulo}", seccion, datos, cubo_datos)
+    return r
+
+
+def _medir_en_proceso(directorio, filas, con_secciones, cola):
+    resultados = medir_escala(directorio, filas, con_secciones)
+    cola.put((resultados, memoria.pico_rss_mb()))
+
+
+def _version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocida'
+
+
+def ejecutar(escalas, rutas, directorio=None, con_secciones=True, semilla=0):
+    """Genera (o reutiliza) los datos de cada escala y la mide en un proceso nuevo.
+
+    Devuelve el informe con la versión del código, el entorno y los resultados, listo para
+    guardar con `guardar` y comparar con `comparar`. Las escalas cuyo proceso muere sin
+    entregar resultados quedan en 'fallidas' con el motivo.
+    """
+    directorio = directorio or os.path.join(DIRECTORIO_RENDIMIENTO, 'datos')
+    # 'spawn' para que cada escala empiece sin la memoria ni las cachés de la anterior
+    contexto = multiprocessing.get_context('spawn')
+    resultados, picos, fallidas = [], {}, {}
+    for filas in escalas:
+        directorio_escala = generar(filas, os.path.join(directorio, str(filas)), rutas, semilla)
+        cola = contexto.Queue()
+        proceso = contexto.Process(target=_medir_en_proceso, args=(directorio_escala, filas, con_secciones, cola))
+        proceso.start()
+        try:
+            medidos, pico = memoria.esperar_resultado(proceso, cola)
+        except memoria.MedicionFallida as e:
+            fallidas[str(filas)] = str(e)
+            continue
+        resultados.extend(medidos)
+        picos[str(filas)] = round(pico, 1)
+    return {
+        'version': _version(),
+        'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'plataforma': platform.platform(),
+        'semilla': semilla,
+        'pico_rss_mb': picos,
+        'resultados': resultados,
+        'fallidas': fallidas,
+    }
+
+
+def guardar(informe, ruta=None):
+    if ruta is None:
+        os.makedirs(DIRECTORIO_RENDIMIENTO, exist_ok=True)
+        marca = informe['fecha'].replace(':', '').replace('-', '')
+        ruta = os.path.join(DIRECTORIO_RENDIMIENTO, f"rendimiento-{marca}-{informe['version']}.json")
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, ensure_ascii=False, indent=1)
+    return ruta
+
+
+def leer(ruta):
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def tabla(informe):
+    """Resultados como DataFrame con una columna de segundos y otra de MiB por escala."""
+    df = pd.DataFrame(informe['resultados'])
+    return df.pivot_table(index='etapa', columns='filas', values=['segundos', 'pico_mb'], sort=False)
+
+
+def comparar(base, actual, umbral=0.2):
+    """Cambio de tiempo por etapa y escala entre dos informes.
+
+    Marca como regresión lo que tarda más de (1 + umbral) veces lo que tardaba en `base`,
+    salvo las etapas de menos de SEGUNDOS_MINIMOS, donde domina el ruido.
+    """
+    claves = ['filas', 'etapa']
+    df = pd.DataFrame(base['resultados'])[claves + ['segundos']].merge(
+        pd.DataFrame(actual['resultados'])[claves + ['segundos']], on=claves, suffixes=(' base', ' actual'))
+    df['cambio %'] = ((df['segundos actual'] / df['segundos base'] - 1) * 100).round(1)
+    df['regresion'] = (df['segundos actual'] > df['segundos base'] * (1 + umbral)) & (df['segundos actual'] >= SEGUNDOS_MINIMOS)
+    return df
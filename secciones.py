@@ -0,0 +1,319 @@
+import streamlit as st
+
+import analisis
+import figuras
+import graficos
+
+# Registro de análisis: título visible -> función(datos, cubo_datos) que calcula y dibuja la sección.
+# main.py sólo ejecuta la sección elegida, así que cada una debe ser independiente de las demás.
+# Los cálculos están en analisis.py y las figuras en figuras.py; aquí sólo se muestran.
+SECCIONES = {}
+
+
+def seccion(titulo):
+    def registrar(funcion):
+        if titulo in SECCIONES:
+            raise ValueError(f"Sección duplicada: {titulo}")
+        SECCIONES[titulo] = funcion
+        return funcion
+    return registrar
+
+
+@seccion("Problemática 1: Producción Total de Tallos por Día")
+def produccion_diaria(datos, cubo_datos):
+    r = analisis.produccion_diaria(cubo_datos)
+
+    st.subheader("Producción Total de Tallos por Día")
+    if r.aviso:
+        st.warning(r.aviso)
+        return
+    graficos.mostrar('produccion_diaria', r.tablas['diaria'], figuras.produccion_diaria,
+                     vega=lambda df: graficos.lineas(df, 'FechaJornada', 'Tallos', 'Producción Total de Tallos por Día'))
+
+
+@seccion("Problemática 2: Variedades con Mayor Tasa de Pérdida")
+def tasa_perdida_variedad(datos, cubo_datos):
+    r = analisis.tasa_perdida_variedad(cubo_datos)
+
+    st.subheader("Problemática 2: Variedades/Productos con Mayor Tasa de Pérdida")
+    if r.aviso:
+        st.warning(r.aviso)
+    elif not r.tablas['top'].empty:
+        graficos.mostrar('tasa_perdida_variedad', r.tablas['top'], figuras.tasa_perdida_variedad,
+                         vega=lambda df: graficos.barras(df, 'Variedad', 'TasaPerdida_Porcentaje', 'Top 10 Variedades con Mayor Tasa de Pérdida (NCP)'))
+    else:
+        st.info("No se encontraron variedades/productos con tasa de pérdida calculable para el análisis.")
+
+
+@seccion("Problemática 3: Estacionalidad de Producción y Pérdidas")
+def estacionalidad(datos, cubo_datos):
+    r = analisis.estacionalidad(cubo_datos)
+
+    st.subheader("Problemática 3: Estacionalidad de Producción y Pérdidas de Tallos")
+    if r.aviso:
+        st.warning(r.aviso)
+    elif not r.tablas['mensual'].empty:
+        graficos.mostrar('estacionalidad', r.tablas['mensual'], figuras.estacionalidad,
+                         vega=lambda df: graficos.lineas(df, 'Mes:O', 'Tallos', 'Estacionalidad de Producción y Pérdidas de Tallos', color='Tipo'))
+    else:
+        st.info("No hay datos suficientes para mostrar la estacionalidad de producción y pérdidas.")
+
+
+@seccion("Problemática 4: Descartes de Alta Calidad por Postcosecha y Finca")
+def descartes_alta_calidad(datos, cubo_datos):
+    r = analisis.descartes_alta_calidad(cubo_datos)
+    if r.aviso:
+        st.warning(r.aviso)
+        return
+
+    grados = r.cifras['Grados de alta calidad']
+    if not r.opciones['con_perdidas']:
+        st.info(f"No se encontraron pérdidas de tallos en los grados de alta calidad definidos: **{grados}**")
+        return
+    st.info(f"Se encontraron pérdidas de tallos en los grados de alta calidad definidos: **{grados}**")
+
+    for col, clave, palette in (('Postcosecha', 'postcosecha', 'viridis'), ('Finca', 'finca', 'cividis')):
+        if clave not in r.tablas:
+            st.warning(f"La columna '{col}' no se encontró en los datos de NCP para este análisis.")
+        elif not r.tablas[clave].empty:
+            titulo = f'Tallos de Alta Calidad Perdidos (NCP) por {col}'
+            st.subheader(titulo)
+            graficos.mostrar(f'alta_calidad_{clave}', r.tablas[clave], lambda df: figuras.alta_calidad_por(df, col, palette),
+                             vega=lambda df: graficos.barras(df, col, 'Tallos', titulo))
+        else:
+            st.info(f"No hay datos de pérdidas de alta calidad por {col} para mostrar.")
+
+
+@seccion("Problemática 5: Alta Calidad Descartada por Plagas/Enfermedades")
+def alta_calidad_plagas(datos, cubo_datos):
+    r = analisis.alta_calidad_plagas(cubo_datos)
+    if r.aviso:
+        st.warning(r.aviso)
+        return
+
+    campo_causa_final = r.opciones['campo_causa']
+    if campo_causa_final == 'CausaAgrupada':
+        st.info("Usando 'CausaAgrupada' para identificar las causas de plagas/enfermedades en las pérdidas y para el eje X del gráfico.")
+    else:
+        st.info("Usando 'Causa' directamente para identificar las causas de plagas/enfermedades en las pérdidas (CausaAgrupada no disponible o vacía).")
+
+    if r.opciones['produccion_alta_calidad'] <= 0:
+        st.info("No hay producción de tallos de alta calidad registrada para este análisis.")
+        return
+    for etiqueta, valor in r.cifras.items():
+        st.write(f"{etiqueta}: **{valor}**")
+
+    if not r.tablas['por_causa'].empty:
+        st.subheader('Tallos de Alta Calidad Perdidos por Causas de Plagas/Enfermedades')
+        # campo_causa_final es el nombre de una columna, así que ya forma parte de la huella
+        graficos.mostrar('alta_calidad_plagas', r.tablas['por_causa'], lambda df: figuras.alta_calidad_plagas(df, campo_causa_final),
+                         vega=lambda df: graficos.barras(df, campo_causa_final, 'Tallos', 'Tallos de Alta Calidad Perdidos por Causas de Plagas/Enfermedades'))
+    else:
+        st.info("No hay datos de pérdidas de alta calidad por plagas/enfermedades después del filtrado para mostrar el desglose.")
+
+
+@seccion("Problemática 6: Calidad No Conforme (NCC) por Finca")
+def ncc_por_finca(datos, cubo_datos):
+    r = analisis.ncc_por_finca(cubo_datos)
+    if r.aviso:
+        st.warning(r.aviso)
+        return
+
+    if not r.tablas['top'].empty:
+        x_col = r.opciones['x_col']
+        st.subheader('Top 10 Causas de Calidad No Conforme (NCC) por Finca')
+        graficos.mostrar('ncc_por_finca', r.tablas['top'], lambda df: figuras.ncc_por_finca(df, x_col),
+                         vega=lambda df: graficos.barras(df, x_col, 'Tallos', 'Top 10 Causas de Calidad No Conforme (NCC) por Finca', color='Finca'))
+    else:
+        st.info("No se encontraron datos de Calidad No Conforme (NCC) para analizar por Finca y Causa.")
+
+
+@seccion("Problemática 7: Tallos por Ramo por Variedad")
+def tallos_por_ramo(datos, cubo_datos):
+    r = analisis.tallos_por_ramo(cubo_datos)
+    if r.aviso:
+        st.warning(r.aviso)
+    elif not r.opciones['con_ramos']:
+        st.info("No hay datos de producción con Ramos > 0 para calcular Tallos por Ramo.")
+    elif not r.tablas['extremos'].empty:
+        st.subheader('Promedio de Tallos por Ramo por Variedad (Extremos)')
+        graficos.mostrar('tallos_por_ramo', r.tablas['extremos'], figuras.tallos_por_ramo,
+                         vega=lambda df: graficos.barras(df, 'Variedad', 'Tallos_por_Ramo', 'Promedio de Tallos por Ramo por Variedad (Extremos)'))
+    else:
+        st.info("No hay datos suficientes para mostrar el promedio de Tallos por Ramo por Variedad.")
+
+
+@seccion("Problemática 8: Causas Principales de Pérdida (NCP)")
+def causas_perdida_ncp(datos, cubo_datos):
+    r = analisis.causas_perdida_ncp(cubo_datos)
+
+    st.subheader("Causas Principales de Pérdida (NCP)")
+    if r.aviso:
+        st.warning(r.aviso)
+    elif not r.tablas['top'].empty:
+        titulo = r.opciones['titulo']
+        graficos.mostrar(f'causas_perdida_ncp:{titulo}', r.tablas['top'], lambda df: figuras.causas_perdida_ncp(df, titulo),
+                         vega=lambda df: graficos.barras(df, 'Causa', 'Tallos', titulo))
+    else:
+        st.info("No hay datos para mostrar el top de causas de pérdida en NCP.")
+
+
+@seccion("Problemática 9: Impacto de Mala Marcación (NCP)")
+def mala_marcacion(datos, cubo_datos):
+    r = analisis.mala_marcacion(cubo_datos)
+    if r.aviso:
+        st.warning(r.aviso)
+        return
+    if r.opciones['total_ncp'] <= 0:
+        st.info("No hay tallos registrados en NCP para analizar problemas de marcación.")
+        return
+
+    for etiqueta, valor in r.cifras.items():
+        st.write(f"{etiqueta}: **{valor}**")
+
+    # Visualización de la proporción (gráfico de pastel simple)
+    if 'proporcion' in r.tablas:
+        st.subheader('Proporción de Tallos Descartados por Problemas de Marcación (NCP)')
+        graficos.mostrar('mala_marcacion', r.tablas['proporcion'], figuras.mala_marcacion,
+                         vega=lambda df: graficos.torta(df, 'Tipo', 'Tallos', 'Proporción de Tallos Descartados por Problemas de Marcación (NCP)'))
+    else:
+        st.info("No se encontraron tallos descartados por problemas de marcación específicos.")
+
+
+@seccion("Problemática 10: Rendimiento de Tallos por Postcosecha por Jornada")
+def rendimiento_postcosecha(datos, cubo_datos):
+    r = analisis.rendimiento_postcosecha(cubo_datos)
+    if r.aviso:
+        st.warning(r.aviso)
+    elif not r.tablas['promedio'].empty:
+        st.subheader('Top 15 Postcosechas por Rendimiento Promedio de Tallos por Jornada')
+        graficos.mostrar('rendimiento_postcosecha', r.tablas['promedio'], figuras.rendimiento_postcosecha,
+                         vega=lambda df: graficos.barras(df, 'Postcosecha', 'Tallos_Producidos', 'Top 15 Postcosechas por Rendimiento Promedio de Tallos por Jornada'))
+
+        st.subheader('Distribución del Rendimiento Diario de Tallos por Postcosecha')
+        # Opcional: Para ver la distribución general del rendimiento diario por Postcosecha
+        graficos.mostrar('rendimiento_postcosecha_distribucion', r.tablas['diario'], figuras.rendimiento_distribucion,
+                         vega=lambda serie: graficos.histograma(serie, 'Distribución del Rendimiento Diario de Tallos por Postcosecha'))
+    else:
+        st.info("No hay datos de producción con información de Postcosecha y FechaJornada para calcular el rendimiento.")
+
+
+@seccion("Mapa de Calor: Aceptación por Finca y Producto")
+def aceptacion_finca_producto(datos, cubo_datos):
+    r = analisis.aceptacion_finca_producto(cubo_datos)
+
+    st.subheader("Mapa de Calor: Porcentaje de Aceptación por Finca y Producto")
+    if r.aviso:
+        st.warning(r.aviso)
+        return
+
+    col_columnas, col_orden = st.columns(2)
+    columnas = col_columnas.selectbox("Columnas", r.opciones['columnas_posibles'], key='mapa_columnas')
+    orden = col_orden.selectbox("Orden", list(analisis.ORDENES_MAPA), format_func=analisis.ORDENES_MAPA.get, key='mapa_orden')
+    if (columnas, orden) != (r.opciones['producto_col'], r.opciones['orden']):
+        r = analisis.aceptacion_finca_producto(cubo_datos, columnas, orden)
+
+    # Opcional: Mostrar los datos procesados para depuración
+    st.write("### Datos para el Mapa de Calor (Primeras Filas):")
+    st.dataframe(r.tablas['aceptacion'].head())
+    for etiqueta, valor in r.cifras.items():
+        st.write(f"{etiqueta}: **{valor}**")
+
+    # Con muchas fincas o columnas el mapa se recorre por páginas; sólo la página elegida se arma como matriz
+    paginas_filas, paginas_columnas = r.opciones['paginas']
+    pagina_filas = pagina_columnas = 1
+    if paginas_filas > 1 or paginas_columnas > 1:
+        col_filas, col_cols = st.columns(2)
+        if paginas_filas > 1:
+            pagina_filas = col_filas.number_input(f"Página de fincas (de {paginas_filas})", 1, paginas_filas, 1, key='mapa_pagina_filas')
+        if paginas_columnas > 1:
+            pagina_columnas = col_cols.number_input(f"Página de {r.opciones['producto_col']} (de {paginas_columnas})", 1, paginas_columnas, 1, key=f"mapa_pagina_{r.opciones['producto_col']}")
+    pivote = r.tablas['pivote'] if (pagina_filas, pagina_columnas) == (1, 1) else analisis.pivote_pagina(r, pagina_filas - 1, pagina_columnas - 1)
+
+    if not pivote.empty:
+        producto_col_prod = r.opciones['producto_col']
+        graficos.mostrar(f'aceptacion_finca_producto:{producto_col_prod}', pivote,
+                         lambda pivote: figuras.aceptacion_finca_producto(pivote, producto_col_prod),
+                         vega=lambda pivote: graficos.mapa_calor(pivote, f'Porcentaje de Aceptación de Tallos por Finca y {producto_col_prod}', 'PorcentajeAceptacion'))
+    elif r.tablas['aceptacion'].empty:
+        st.info("No se encontraron datos procesados para generar el mapa de calor de Porcentaje de Aceptación. Esto podría deberse a filtros o datos vacíos después de las uniones.")
+    else:
+        st.info("Ninguna finca de esta página tiene datos en estas columnas; prueba otra página.")
+
+
+@seccion("Tasas de Pérdida: Finca → Bloque → Producto → Variedad → Grado")
+def tasas_perdida(datos, cubo_datos):
+    r = analisis.tasas_perdida(cubo_datos)
+    if r.aviso:
+        st.warning(r.aviso)
+        return
+
+    # Cada valor elegido baja un nivel; cada nivel es una búsqueda en el motor de tasas, no un cálculo nuevo
+    ruta = []
+    columnas = st.columns(len(r.opciones['jerarquia']))
+    while r.opciones['dimension'] is not None and r.opciones['valores']:
+        dimension = r.opciones['dimension']
+        # Las opciones son los valores originales del motor; sólo se muestran como texto
+        eleccion = columnas[len(ruta)].selectbox(dimension, [None] + r.opciones['valores'], key=f'tasas_{len(ruta)}',
+                                                 format_func=lambda valor: '(todos)' if valor is None else str(valor))
+        if eleccion is None:
+            break
+        ruta.append(eleccion)
+        r = analisis.tasas_perdida(cubo_datos, tuple(ruta))
+        if r.aviso:
+            st.warning(r.aviso)
+            return
+
+    if ruta:
+        st.write(" → ".join(f"**{valor}**" for valor in ruta))
+    for etiqueta, valor in r.cifras.items():
+        st.write(f"{etiqueta}: **{valor}**")
+
+    dimension = r.opciones['dimension']
+    if dimension is None:
+        return
+    desglose = r.tablas['desglose']
+    if desglose.empty:
+        st.info(f"No hay producción registrada por {dimension} para calcular tasas de pérdida.")
+        return
+    st.subheader(f'Tasa de Pérdida (NCP) por {dimension}')
+    graficos.mostrar(f'tasas_perdida:{dimension}', desglose.head(figuras.MAX_BARRAS), lambda df: figuras.tasas_perdida(df, dimension),
+                     vega=lambda df: graficos.barras(df, dimension, 'TasaNCP', f'Tasa de Pérdida (NCP) por {dimension}'))
+    st.dataframe(desglose.round({'TasaNCP': 2, 'TasaNCC': 2}), hide_index=True)
+
+
+@seccion("Inspección de Plagas/Enfermedades")
+def inspeccion(datos, cubo_datos):
+    r = analisis.inspeccion(datos.inspeccion)
+    if r.aviso:
+        st.warning(r.aviso)
+        return
+
+    st.subheader("Primeras filas de la tabla de Inspección de Plagas/Enfermedades")
+    st.dataframe(r.tablas['inspeccion'].head())
+    st.subheader("Columnas de la tabla de Inspección de Plagas/Enfermedades")
+    st.write(r.opciones['columnas'])
+
+
+@seccion("Inspección frente a Pérdidas por Plagas (Finca y Variedad)")
+def inspeccion_perdidas(datos, cubo_datos):
+    r = analisis.inspeccion_perdidas(cubo_datos, datos.inspeccion)
+    st.subheader("Hallazgos de la Inspección frente a Pérdidas por Plagas (NCP/NCC)")
+    if r.aviso:
+        st.warning(r.aviso)
+        return
+
+    st.caption("Finca y variedad se comparan sin tildes, mayúsculas ni espacios. La inspección no tiene fechas ni producto: sólo el filtro de finca la restringe.")
+    for etiqueta, valor in r.cifras.items():
+        st.write(f"{etiqueta}: **{valor}**")
+
+    st.write("### Correlación (Spearman) entre hallazgos y tallos perdidos en NCP")
+    st.dataframe(r.tablas['correlacion'].round({'Correlacion': 3}), hide_index=True)
+    if not r.tablas['por_plaga'].empty:
+        graficos.mostrar('inspeccion_perdidas', r.tablas['por_plaga'], figuras.inspeccion_perdidas,
+                         vega=lambda df: graficos.dispersion(df, 'Hallazgos', 'NCPTallos', 'Hallazgos de la Inspección frente a Tallos Perdidos (NCP)', color='Plaga', detalle=['Finca', 'Variedad']))
+    else:
+        st.info("NCP no tiene causas agrupadas para comparar cada plaga por separado.")
+
+    st.write("### Inspección y pérdidas por finca y variedad")
+    st.dataframe(r.tablas['finca_variedad'].round(2), hide_index=True)
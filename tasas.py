@@ -0,0 +1,108 @@
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+import cubo
+
+# Niveles de la jerarquía, de lo general a lo particular: el desglose baja en este orden
+JERARQUIA = ['Finca', 'Bloque', 'Producto', 'Variedad', 'Grado']
+# Otras dimensiones que se pueden cruzar con la jerarquía (p. ej. en el mapa de calor)
+OTRAS_DIMENSIONES = ['ProductoMaestro']
+# Pérdidas que se comparan con la producción: columna de tallos y de tasa por fuente
+PERDIDAS = {'ncp': ('NCPTallos', 'TasaNCP'), 'ncc': ('NCCTallos', 'TasaNCC')}
+
+_motores = weakref.WeakKeyDictionary()
+_bloqueo = threading.Lock()
+
+
+class MotorTasas:
+    """Tasas de pérdida (NCP y NCC sobre producción, en %) en cualquier nivel de la jerarquía.
+
+    Cada fuente se agrupa una sola vez, desde su tabla de tasas del cubo (cubo.TABLAS_TASAS, la
+    única con Bloque), al grano más fino (todas las dimensiones a la vez) y las tres quedan
+    alineadas en una tabla base. Cualquier combinación de dimensiones
+    (un "grouping set") se suma desde esa base, que tiene muchas menos filas que el cubo, y se
+    guarda indexada: después consultar una tasa es buscar su clave en el índice.
+    """
+
+    def __init__(self, cubo_datos):
+        columnas = {'produccion': 'ProduccionTallos'}
+        columnas.update({fuente: tallos for fuente, (tallos, _) in PERDIDAS.items()})
+        # Un cubo armado sin tablas de tasas (p. ej. a mano) usa las de la fuente, sin Bloque
+        tablas = {fuente: cubo_datos.tablas.get(cubo.TABLAS_TASAS[fuente], cubo_datos.tablas[fuente]) for fuente in columnas}
+        tablas = {fuente: df for fuente, df in tablas.items() if not df.empty and 'Tallos' in df.columns}
+        # Sólo las dimensiones que tienen todas las fuentes con datos (y la producción: sin ella no hay tasa)
+        self.dimensiones = [
+            col for col in JERARQUIA + OTRAS_DIMENSIONES
+            if 'produccion' in tablas and all(col in df.columns for df in tablas.values())
+        ]
+        self.jerarquia = [col for col in JERARQUIA if col in self.dimensiones]
+        partes = [
+            # dropna=False: los registros con alguna dimensión vacía siguen contando en los niveles que no la usan
+            df.groupby(self.dimensiones, observed=True, dropna=False)['Tallos'].sum().rename(columnas[fuente])
+            for fuente, df in tablas.items() if self.dimensiones
+        ]
+        base = pd.concat(partes, axis=1) if partes else pd.DataFrame()
+        self.base = base.reindex(columns=list(columnas.values()))
+        self._niveles = {}
+        self._bloqueo = threading.Lock()
+
+    def nivel(self, *dimensiones):
+        """Tabla indexada por `dimensiones` con ProduccionTallos, NCPTallos, NCCTallos, TasaNCP y TasaNCC.
+
+        ProduccionTallos queda vacía en las combinaciones que tienen pérdidas pero no producción
+        registrada; ahí las tasas también quedan vacías.
+        """
+        dimensiones = tuple(dimensiones)
+        faltantes = [col for col in dimensiones if col not in self.dimensiones]
+        if faltantes:
+            raise KeyError(f"Dimensiones sin datos de producción: {', '.join(faltantes)}")
+        with self._bloqueo:
+            if dimensiones in self._niveles:
+                return self._niveles[dimensiones]
+        if self.base.empty:
+            tabla = pd.DataFrame(columns=list(self.base.columns))
+        elif dimensiones:
+            # min_count=1 distingue "sin producción registrada" (vacío) de "producción cero"
+            tabla = self.base.groupby(level=list(dimensiones), observed=True).sum(min_count=1)
+        else:
+            tabla = self.base.sum(min_count=1).to_frame().T
+        for fuente, (tallos, tasa) in PERDIDAS.items():
+            tabla[tallos] = tabla[tallos].fillna(0)
+            produccion = tabla['ProduccionTallos']
+            tabla[tasa] = np.where(produccion > 0, tabla[tallos] / produccion.where(produccion > 0) * 100, np.nan)
+        with self._bloqueo:
+            self._niveles.setdefault(dimensiones, tabla)
+        return tabla
+
+    def desglose(self, ruta=()):
+        """Filas del nivel siguiente de la jerarquía bajo `ruta` (valores de los primeros niveles).
+
+        Devuelve (dimensión del nivel, DataFrame con esa columna y las de `nivel`); la dimensión es
+        None si `ruta` ya llega al último nivel.
+        """
+        ruta = tuple(ruta)
+        if len(ruta) >= len(self.jerarquia):
+            return None, pd.DataFrame()
+        dimensiones = self.jerarquia[:len(ruta) + 1]
+        tabla = self.nivel(*dimensiones)
+        if ruta and not tabla.empty:
+            try:
+                # Índice ordenado por el groupby: quitar los primeros niveles es una búsqueda, no un filtro
+                tabla = tabla.loc[ruta[0] if len(ruta) == 1 else ruta]
+            except KeyError:
+                tabla = tabla.iloc[:0].droplevel(list(range(len(ruta))))
+        return dimensiones[-1], tabla.reset_index()
+
+
+def motor(cubo_datos):
+    """MotorTasas de `cubo_datos`, creado una vez por cubo (el completo y cada cubo filtrado)."""
+    with _bloqueo:
+        existente = _motores.get(cubo_datos)
+    if existente is not None:
+        return existente
+    nuevo = MotorTasas(cubo_datos)
+    with _bloqueo:
+        return _motores.setdefault(cubo_datos, nuevo)
@@ -0,0 +1,47 @@
+import pandas as pd
+
+import carga
+import cubo
+import ingesta
+
+CAUSA_MAPEO = pd.DataFrame({'Causa': ['Botrytis', 'Tallo corto'], 'CausaAgrupada': ['Enfermedades', 'Calidad']})
+
+
+def _csv(tmp_path, filas):
+    lineas = [';'.join(ingesta.COLUMNAS_ESQUEMA)]
+    for i in range(filas):
+        valores = {col: '1' for col in ingesta.COLUMNAS_ESQUEMA}
+        # Fincas, variedades y fechas que sólo aparecen en algunos lotes, y fechas en los dos formatos
+        valores.update({
+            'TipoMovimiento': 'NCC', 'FechaJornada': str(44621 + i // 10) if i % 3 else f"{1 + i // 10}/03/2022",
+            'Finca': ['El Arda', 'Tulipán', 'del Sol'][i // 20], 'Propia': 'VERDADERO', 'Bloque': str(i % 4),
+            'Producto': 'ROSES', 'Variedad': ['FREEDOM', 'VENDELA', 'EXPLORER'][i % 3 if i > 30 else i % 2],
+            'Grado': ['50', '60'][i % 2], 'Causa': ['Botrytis', 'Tallo corto', 'Sin mapeo'][i % 3],
+            'Ramos': str(i % 2), 'Tallos': str(i % 7 + 1),
+        })
+        lineas.append(';'.join(valores[col] for col in ingesta.COLUMNAS_ESQUEMA))
+    ruta = tmp_path / 'NCC.csv'
+    ruta.write_text('\n'.join(lineas) + '\n', encoding='utf-8')
+    return str(ruta)
+
+
+def _ordenada(df):
+    dimensiones = [col for col in df.columns if col in cubo.DIMENSIONES or col in cubo.DIMENSIONES_TASAS]
+    df = df.assign(**{col: df[col].astype(str) for col in dimensiones})
+    return df.sort_values(dimensiones).reset_index(drop=True)[sorted(df.columns)]
+
+
+def test_cubo_por_lotes_igual_al_del_archivo_completo(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingesta, 'DIRECTORIO_CUARENTENA', str(tmp_path / 'cuarentena'))
+    ruta = _csv(tmp_path, 60)
+
+    esquema, por_lotes, _ = carga._cargar_por_lotes(ruta, 'ncc', 7, CAUSA_MAPEO)
+
+    df, _ = ingesta.leer_csv_nc(ruta)
+    preparado = carga.preparar_nc(df, CAUSA_MAPEO)
+    completo = cubo.agregar('ncc', preparado)
+    assert set(por_lotes) == set(completo)
+    for tabla, esperada in completo.items():
+        pd.testing.assert_frame_equal(_ordenada(por_lotes[tabla]), _ordenada(esperada), check_dtype=False)
+    assert esquema.empty
+    assert list(esquema.columns) == list(preparado.columns)
@@ -0,0 +1,39 @@
+import pandas as pd
+
+import clasificacion
+
+REGLAS = pd.DataFrame({
+    'Campo': ['Causa', 'Causa', 'Grado'],
+    'Clase': [clasificacion.MARCACION, clasificacion.PLAGAS, clasificacion.ALTA_CALIDAD],
+    'Valor': ['Marcación incorrecta', 'Botrytis', '70'],
+}).assign(Clave=lambda df: df['Valor'].map(clasificacion.normalizar))
+
+
+def test_normalizar_ignora_tildes_mayusculas_y_espacios():
+    assert clasificacion.normalizar('Marcación  incorrecta') == 'MARCACIONINCORRECTA'
+    assert clasificacion.normalizar(' MARCACION-INCORRECTA ') == 'MARCACIONINCORRECTA'
+    assert clasificacion.normalizar('Tulipán') == clasificacion.normalizar('TULIPAN')
+
+
+def test_clasificar_con_valores_escritos_distinto():
+    df = pd.DataFrame({
+        'Causa': ['MARCACION INCORRECTA', 'marcación incorrecta', 'botrytis ', 'Otra', None],
+        'Grado': ['70', '60', '70', None, '70'],
+    })
+
+    clasificado = clasificacion.clasificar(df, REGLAS)
+
+    assert clasificado['ClaseCausa'].tolist()[:3] == [clasificacion.MARCACION, clasificacion.MARCACION, clasificacion.PLAGAS]
+    assert clasificado['ClaseCausa'].iloc[3:].isna().all()
+    assert clasificado['ClaseGrado'].tolist()[::2] == [clasificacion.ALTA_CALIDAD] * 3
+    assert clasificado['ClaseGrado'].iloc[[1, 3]].isna().all()
+
+
+def test_clave_une_nombres_y_codigos_escritos_distinto():
+    inspeccion = clasificacion.clave(pd.Series(['Tulipán', 'EL ARDA', 16118.0, '', None]))
+    perdidas = clasificacion.clave(pd.Series(['TULIPAN', 'El Arda', '16118', 'del Sol'], dtype='category'))
+
+    assert inspeccion.tolist()[:3] == perdidas.tolist()[:3] == ['TULIPAN', 'ELARDA', '16118']
+    assert inspeccion.iloc[3:].isna().all()
+    assert isinstance(perdidas.dtype, pd.CategoricalDtype)
+    assert set(perdidas.cat.categories) == {'TULIPAN', 'ELARDA', '16118', 'DELSOL'}
@@ -0,0 +1,67 @@
+import pandas as pd
+
+import consultas
+import cubo
+
+
+def _tabla():
+    return pd.DataFrame({
+        'FechaJornada': pd.to_datetime(['2022-03-01', '2022-03-02', '2022-03-03', None]),
+        'Finca': ['El Arda', 'Tulipán', 'El Arda', 'del Sol'],
+        'Grado': [50.0, 60.0, 70.0, 60.0],
+        'Tallos': [1, 2, 3, 4],
+    })
+
+
+def _esperada(df, filtro):
+    # La misma selección escrita fila por fila
+    filas = []
+    for _, fila in df.iterrows():
+        if filtro.desde is not None and not fila['FechaJornada'] >= filtro.desde:
+            continue
+        if filtro.hasta is not None and not fila['FechaJornada'] <= filtro.hasta:
+            continue
+        if any(valores and col in df.columns and fila[col] not in valores for col, valores in filtro.valores().items()):
+            continue
+        filas.append(fila['Tallos'])
+    return filas
+
+
+FILTROS = [
+    consultas.Filtro(),
+    consultas.Filtro(desde=pd.Timestamp('2022-03-02')),
+    consultas.Filtro(desde=pd.Timestamp('2022-03-01'), hasta=pd.Timestamp('2022-03-02')),
+    consultas.Filtro(fincas=('El Arda', 'Finca sin datos')),
+    consultas.Filtro(hasta=pd.Timestamp('2022-03-03'), grados=(60.0,)),
+    # Producto no está en la tabla: no restringe
+    consultas.Filtro(productos=('ROSES',), fincas=('del Sol',)),
+]
+
+
+def test_mascara_igual_en_texto_y_en_categorias():
+    texto = _tabla()
+    categorias = texto.astype({'Finca': 'category', 'Grado': 'category'})
+
+    for filtro in FILTROS:
+        esperada = _esperada(texto, filtro)
+        assert texto['Tallos'][consultas.mascara(texto, filtro)].tolist() == esperada, filtro
+        assert categorias['Tallos'][consultas.mascara(categorias, filtro)].tolist() == esperada, filtro
+
+
+def test_filtro_es_clave_de_cache():
+    assert consultas.Filtro(fincas=('El Arda',)) == consultas.Filtro(fincas=('El Arda',))
+    assert len({consultas.Filtro(), consultas.Filtro(), consultas.Filtro(grados=(60.0,))}) == 2
+    assert not consultas.Filtro().activo()
+    assert consultas.Filtro(hasta=pd.Timestamp('2022-03-01')).activo()
+
+
+def test_filtrar_cubo_guarda_el_origen():
+    completo = cubo.Cubo({'ncp': _tabla(), 'ncc': pd.DataFrame()})
+    filtro = consultas.Filtro(fincas=('Tulipán',))
+
+    filtrado = consultas.filtrar_cubo(completo, filtro)
+
+    assert consultas.filtrar_cubo(completo, consultas.Filtro()) is completo
+    assert filtrado.origen == (completo, filtro)
+    assert filtrado.tablas['ncp']['Tallos'].tolist() == [2]
+    assert filtrado.tablas['ncc'].empty
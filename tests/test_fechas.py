@@ -0,0 +1,29 @@
+import pandas as pd
+
+import fechas
+
+
+def test_detecta_el_formato_de_toda_la_columna():
+    assert fechas.detectar_formato_fecha(pd.Series(['44621', '44622', None])) == 'serial_excel'
+    assert fechas.detectar_formato_fecha(pd.Series([44621, 44622])) == 'serial_excel'
+    assert fechas.detectar_formato_fecha(pd.Series(['1/03/2022', '2/03/2022'])) == 'dmy'
+    assert fechas.detectar_formato_fecha(pd.Series(['44621', '2/03/2022'], dtype='category')) == 'mixto'
+    assert fechas.detectar_formato_fecha(pd.Series(['2022-03-01'])) == 'iso'
+
+
+def test_seriales_y_texto_dmy_dan_la_misma_fecha():
+    esperado = pd.to_datetime(pd.Series(['2022-03-01', '2022-03-02', None]))
+
+    serial = fechas.normalizar_fecha_jornada(pd.Series(['44621', '44622', None]))
+    dmy = fechas.normalizar_fecha_jornada(pd.Series(['1/03/2022', '2/03/2022', None]))
+    mixto = fechas.normalizar_fecha_jornada(pd.Series(['44621', '2/03/2022', None]))
+
+    for resultado in (serial, dmy, mixto):
+        assert resultado.tolist() == esperado.tolist()
+
+
+def test_valores_que_no_son_fecha_quedan_vacios():
+    resultado = fechas.normalizar_fecha_jornada(pd.Series(['44621', '31/02/2022', 'sin fecha']))
+
+    assert resultado.iloc[0] == pd.Timestamp('2022-03-01')
+    assert resultado.iloc[1:].isna().all()
@@ -0,0 +1,36 @@
+import requests
+
+import fuentes
+
+
+def _fuente_caida(tmp_path, intervalo):
+    fuente = fuentes.FuenteHTTP('http://servidor.invalido/', str(tmp_path), intervalo=intervalo)
+    llamadas = []
+
+    def get(url, **kwargs):
+        llamadas.append(url)
+        raise requests.ConnectionError("sin red")
+
+    fuente._sesion.get = get
+    return fuente, llamadas
+
+
+def test_servidor_caido_usa_la_copia_sin_reintentar_en_cada_ejecucion(tmp_path):
+    (tmp_path / 'NCC.csv').write_text('a;b\n1;2\n')
+    fuente, llamadas = _fuente_caida(tmp_path, intervalo=300)
+
+    for _ in range(3):
+        ruta, _ = fuente.resolver('NCC.csv')
+
+    assert ruta == str(tmp_path / 'NCC.csv')
+    assert len(llamadas) == 1
+
+
+def test_se_reintenta_pasado_el_intervalo(tmp_path):
+    (tmp_path / 'NCC.csv').write_text('a;b\n1;2\n')
+    fuente, llamadas = _fuente_caida(tmp_path, intervalo=0)
+
+    fuente.resolver('NCC.csv')
+    fuente.resolver('NCC.csv')
+
+    assert len(llamadas) == 2
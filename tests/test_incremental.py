@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+
+import carga
+import columnar
+import cubo
+import incremental
+import ingesta
+
+CAUSA_MAPEO = pd.DataFrame({'Causa': ['Botrytis', 'Tallo corto'], 'CausaAgrupada': ['Enfermedades', 'Calidad']})
+
+
+def _lineas(desde, hasta):
+    lineas = []
+    for i in range(desde, hasta):
+        valores = {col: '1' for col in ingesta.COLUMNAS_ESQUEMA}
+        valores.update({
+            'TipoMovimiento': 'NCP', 'FechaJornada': str(44621 + i % 5), 'Finca': ['El Arda', 'Tulipán'][i % 2],
+            'Propia': 'VERDADERO', 'Bloque': str(i % 3), 'Producto': 'ROSES', 'Variedad': ['FREEDOM', 'VENDELA'][i % 2],
+            'Grado': ['50', '60', '70'][i % 3], 'Causa': ['Botrytis', 'Tallo corto'][i % 2], 'Tallos': str(i % 7 + 1),
+        })
+        lineas.append(';'.join(valores[col] for col in ingesta.COLUMNAS_ESQUEMA) + '\n')
+    return ''.join(lineas)
+
+
+def _huellas(tmp_path, version):
+    return [
+        ('produccion', str(tmp_path / 'Produccion.xlsx'), 'p1'),
+        ('causa_agrupado', str(tmp_path / 'Causa_agrupado.xlsx'), 'c1'),
+        ('ncc', str(tmp_path / 'NCC.csv'), 'ncc1'),
+        ('ncp', str(tmp_path / 'NCP.csv'), version),
+    ]
+
+
+def _preparar(ruta):
+    df, _ = ingesta.leer_csv_nc(ruta, directorio_cuarentena=ruta + '.cuarentena')
+    return carga.preparar_nc(df, CAUSA_MAPEO)
+
+
+def _construir(tmp_path):
+    cabecera = ';'.join(ingesta.COLUMNAS_ESQUEMA) + '\n'
+    for nombre in ('NCC.csv', 'NCP.csv'):
+        (tmp_path / nombre).write_text(cabecera + _lineas(0, 40), encoding='utf-8')
+    estados = {nombre: incremental.estado_archivo(str(tmp_path / archivo)) for nombre, archivo in incremental.TABLAS_INCREMENTALES.items()}
+    tablas = {
+        'produccion': _preparar(str(tmp_path / 'NCC.csv')),
+        'causa_mapeo': CAUSA_MAPEO,
+        'inspeccion': pd.DataFrame({'Finca': ['El Arda']}),
+        'ncc': _preparar(str(tmp_path / 'NCC.csv')),
+        'ncp': _preparar(str(tmp_path / 'NCP.csv')),
+    }
+    datos = carga.DatosFlores(tablas['produccion'], CAUSA_MAPEO, tablas['inspeccion'], tablas['ncc'], tablas['ncp'], {}, {})
+    columnar.construir(tablas, _huellas(tmp_path, 'ncp1'), str(tmp_path / 'columnar'), cubo_datos=cubo.construir(datos), incremental=estados)
+    return tablas
+
+
+def _ordenada(df):
+    dimensiones = [col for col in df.columns if col in cubo.DIMENSIONES or col in cubo.DIMENSIONES_TASAS]
+    df = df.assign(**{col: df[col].astype(str) for col in dimensiones})
+    return df.sort_values(dimensiones).reset_index(drop=True)[sorted(df.columns)]
+
+
+def test_agregar_lineas_equivale_a_recargar_todo(tmp_path):
+    _construir(tmp_path)
+    with open(tmp_path / 'NCP.csv', 'a', encoding='utf-8') as f:
+        f.write(_lineas(40, 65))
+
+    agregadas = incremental.actualizar(_huellas(tmp_path, 'ncp2'), carga.preparar_nc, str(tmp_path / 'columnar'))
+
+    assert agregadas == {'ncp': 25}
+    manifiesto = columnar.leer_manifiesto(str(tmp_path / 'columnar'))
+    guardado = columnar.cargar_cubo(manifiesto, str(tmp_path / 'columnar'))
+    completo = cubo.agregar('ncp', _preparar(str(tmp_path / 'NCP.csv')))
+    for tabla, df in completo.items():
+        pd.testing.assert_frame_equal(_ordenada(guardado.tablas[tabla]), _ordenada(df), check_dtype=False)
+    assert len(columnar.cargar(manifiesto, str(tmp_path / 'columnar'), tablas=['ncp'])['ncp']) == 65
+
+
+def test_archivo_reescrito_pide_reconstruir(tmp_path):
+    _construir(tmp_path)
+    (tmp_path / 'NCP.csv').write_text(';'.join(ingesta.COLUMNAS_ESQUEMA) + '\n' + _lineas(5, 60), encoding='utf-8')
+
+    with pytest.raises(incremental.ReconstruccionNecesaria):
+        incremental.actualizar(_huellas(tmp_path, 'ncp2'), carga.preparar_nc, str(tmp_path / 'columnar'))
@@ -0,0 +1,56 @@
+import pandas as pd
+
+import ingesta
+
+
+def _fila(tallos='10', extra=''):
+    valores = {col: '1' for col in ingesta.COLUMNAS_ESQUEMA}
+    valores.update({'TipoMovimiento': 'NCP', 'FechaJornada': '44621', 'Finca': 'El Arda', 'Propia': 'VERDADERO',
+                    'Variedad': 'FREEDOM', 'Causa': 'Botrytis', 'Tallos': tallos})
+    return ';'.join(valores[col] for col in ingesta.COLUMNAS_ESQUEMA) + extra
+
+
+def _csv(tmp_path):
+    lineas = [';'.join(ingesta.COLUMNAS_ESQUEMA), _fila('10'), _fila('diez'), _fila('20'), _fila('5', extra=';sobra'), _fila('30')]
+    ruta = tmp_path / 'NCP.csv'
+    ruta.write_text('\n'.join(lineas) + '\n', encoding='utf-8')
+    return ruta
+
+
+def _cuarentena(ruta):
+    return pd.read_csv(ruta, sep=';').sort_values('Linea').reset_index(drop=True)
+
+
+def test_filas_mal_formadas_o_no_numericas_van_a_cuarentena(tmp_path):
+    ruta = _csv(tmp_path)
+
+    df, ruta_cuarentena = ingesta.leer_csv_nc(str(ruta), motor='c', directorio_cuarentena=str(tmp_path / 'cuarentena'))
+
+    assert df['Tallos'].tolist() == [10, 20, 30]
+    assert df['Tallos'].dtype == 'int32'
+    rechazadas = _cuarentena(ruta_cuarentena)
+    assert rechazadas['Linea'].tolist() == [3, 5]
+    assert 'diez' in rechazadas.loc[0, 'Contenido']
+
+
+def test_por_lotes_se_separan_las_mismas_filas(tmp_path):
+    ruta = _csv(tmp_path)
+    lotes = []
+
+    ruta_cuarentena = ingesta.leer_csv_nc_por_lotes(str(ruta), 2, lotes.append, directorio_cuarentena=str(tmp_path / 'cuarentena'))
+
+    assert pd.concat(lotes)['Tallos'].tolist() == [10, 20, 30]
+    assert _cuarentena(ruta_cuarentena)['Linea'].tolist() == [3, 5]
+
+
+def test_sin_rechazos_se_borra_la_cuarentena_anterior(tmp_path):
+    directorio = tmp_path / 'cuarentena'
+    _, ruta_cuarentena = ingesta.leer_csv_nc(str(_csv(tmp_path)), motor='c', directorio_cuarentena=str(directorio))
+    limpio = tmp_path / 'NCP.csv'
+    limpio.write_text('\n'.join([';'.join(ingesta.COLUMNAS_ESQUEMA), _fila('10')]) + '\n', encoding='utf-8')
+
+    _, ruta_nueva = ingesta.leer_csv_nc(str(limpio), motor='c', directorio_cuarentena=str(directorio))
+
+    assert ruta_nueva is None
+    assert not (directorio / 'NCP.csv.rechazadas.csv').exists()
+    assert ruta_cuarentena == str(directorio / 'NCP.csv.rechazadas.csv')
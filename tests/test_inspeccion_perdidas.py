@@ -0,0 +1,51 @@
+import pandas as pd
+
+import analisis
+import clasificacion
+import cubo
+
+
+def _tabla(filas):
+    df = pd.DataFrame(filas, columns=['FechaJornada', 'Finca', 'Variedad', 'Causa', 'CausaAgrupada', 'ClaseCausa', 'Tallos'])
+    df['FechaJornada'] = pd.to_datetime(df['FechaJornada'])
+    for col in ['Finca', 'Variedad', 'Causa', 'CausaAgrupada', 'ClaseCausa']:
+        df[col] = df[col].astype('category')
+    return df
+
+
+def _cubo(ncp, ncc):
+    produccion = _tabla([('2022-03-01', 'El Arda', 'FREEDOM', None, None, None, 1000)])
+    return cubo.Cubo({'produccion': produccion, 'ncp': _tabla(ncp), 'ncc': _tabla(ncc)})
+
+
+def test_plaga_fuera_de_la_clase_de_plagas_cuenta_como_perdida():
+    # DAÑO POR MINADOR se agrupa en MINADOR pero no está en la clase de plagas de las reglas
+    ncp = [
+        ('2022-03-01', 'El Arda', 'FREEDOM', 'DAÑO POR MINADOR', 'MINADOR', None, 30),
+        ('2022-03-02', 'El Arda', 'FREEDOM', 'TALLO CORTO', 'OTROS', None, 500),
+    ]
+    ncc = [('2022-03-01', 'El Arda', 'FREEDOM', 'DAÑO POR MINADOR', 'MINADOR', None, 12)]
+    inspeccion = pd.DataFrame({
+        'FINCA_INSP': ['EL ARDA'], 'VARIEDAD_INSP': ['freedom'], 'TALLOS_ENTRADA_INSP': [200],
+        'THRIPSS': [0], 'ACAROS': [0], 'AFIDOS': [0], 'MINADOR': [7], 'BOTRYTIS': [0],
+    })
+
+    r = analisis.inspeccion_perdidas(_cubo(ncp, ncc), inspeccion)
+
+    assert r.aviso is None
+    fila = r.tablas['finca_variedad'].iloc[0]
+    assert (fila['Finca'], fila['Variedad']) == ('El Arda', 'FREEDOM')
+    assert fila['NCPPlagasTallos'] == 30
+    assert fila['NCCPlagasTallos'] == 12
+    minador = r.tablas['por_plaga'].set_index('Plaga').loc['MINADOR']
+    assert (minador['Hallazgos'], minador['NCPTallos'], minador['NCCTallos']) == (7, 30, 12)
+
+
+def test_clase_de_plagas_sin_causa_agrupada_de_la_inspeccion():
+    ncp = [('2022-03-01', 'El Arda', 'FREEDOM', 'MILDEO POLVOSO', 'OTROS', clasificacion.PLAGAS, 40)]
+    inspeccion = pd.DataFrame({'FINCA_INSP': ['El Arda'], 'VARIEDAD_INSP': ['FREEDOM'], 'TALLOS_ENTRADA_INSP': [100], 'MINADOR': [1]})
+
+    r = analisis.inspeccion_perdidas(_cubo(ncp, []), inspeccion)
+
+    assert r.tablas['finca_variedad'].iloc[0]['NCPPlagasTallos'] == 40
+    assert r.tablas['por_plaga'].set_index('Plaga').loc['MINADOR', 'NCPTallos'] == 0
@@ -0,0 +1,68 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import consultas
+import cubo
+import ranking
+
+
+def _cubo(indice=True):
+    rng = np.random.default_rng(1)
+    n = 5000
+    df = pd.DataFrame({
+        'FechaJornada': pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 90, n), unit='D'),
+        'Finca': pd.Categorical(rng.choice(['B', 'A', 'C'], n)),
+        'Causa': pd.Categorical(rng.choice([f'c{i:02d}' for i in range(30)][::-1], n)),
+        'ClaseGrado': pd.Categorical(rng.choice(['Alta calidad', 'Otro'], n)),
+        'Producto': pd.Categorical(rng.choice(['P1', 'P2'], n)),
+        'Grado': pd.Categorical(rng.choice(['G1', 'G2'], n)),
+        # Pocos tallos por fila: muchas claves empatan
+        'Tallos': rng.integers(0, 3, n).astype('int32'),
+    })
+    df.loc[rng.random(n) < 0.01, 'Causa'] = None
+    base = cubo.Cubo({'ncp': df})
+    if indice:
+        base.rankings = ranking.Indice()
+    return base
+
+
+FILTROS = [
+    consultas.Filtro(),
+    consultas.Filtro(desde=pd.Timestamp('2022-02-01'), hasta=pd.Timestamp('2022-02-01')),
+    consultas.Filtro(desde=pd.Timestamp('2022-02-07'), hasta=pd.Timestamp('2022-02-13'), fincas=('A',)),
+    consultas.Filtro(desde=pd.Timestamp('2022-01-10'), hasta=pd.Timestamp('2022-03-03'), productos=('P1',)),
+]
+
+
+@pytest.mark.parametrize('filtro', FILTROS)
+@pytest.mark.parametrize('por', ['Causa', ['Finca', 'Causa']])
+@pytest.mark.parametrize('condicion', [None, {'ClaseGrado': 'Alta calidad'}])
+def test_top_igual_a_nlargest(filtro, por, condicion):
+    c = consultas.filtrar_cubo(_cubo(), filtro)
+    df = c.tablas['ncp']
+    for col, valor in (condicion or {}).items():
+        df = df[df[col] == valor]
+
+    for n in [1, 3, 10, 25]:
+        esperado = df.groupby(por, observed=True)['Tallos'].sum().nlargest(n)
+        obtenido = ranking.top(c, 'ncp', por, n=n, condicion=condicion)
+        # También el orden de los empates
+        pd.testing.assert_series_equal(obtenido, esperado, check_names=False)
+
+
+def test_el_indice_se_guarda_en_el_cubo_y_no_viaja_al_copiarlo():
+    base = _cubo()
+    ranking.top(consultas.filtrar_cubo(base, FILTROS[2]), 'ncp', 'Causa')
+    ranking.top(base, 'ncp', 'Causa')
+
+    assert len(base.rankings._rankings) == 2
+    assert len(pickle.loads(pickle.dumps(base)).rankings._rankings) == 0
+
+
+def test_cubo_sin_indice_agrupa_directamente():
+    con_indice, sin_indice = _cubo(), _cubo(indice=False)
+
+    pd.testing.assert_series_equal(ranking.top(sin_indice, 'ncp', 'Causa', n=5), ranking.top(con_indice, 'ncp', 'Causa', n=5), check_names=False)
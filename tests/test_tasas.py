@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analisis
+import cubo
+import tasas
+
+
+def _registros(filas):
+    df = pd.DataFrame(filas, columns=['FechaJornada', 'Finca', 'Bloque', 'Producto', 'Variedad', 'Grado', 'Tallos'])
+    df['FechaJornada'] = pd.to_datetime(df['FechaJornada'])
+    return df
+
+
+def _cubo(produccion, ncp, ncc):
+    tablas = {}
+    for fuente, filas in {'produccion': produccion, 'ncp': ncp, 'ncc': ncc}.items():
+        tablas.update(cubo.agregar(fuente, _registros(filas)))
+    return cubo.Cubo(tablas)
+
+
+def test_desglose_con_bloque_y_grado_numericos():
+    # Produccion.xlsx puede traer Bloque y Grado como números: la ruta se arma con esos valores
+    produccion = [
+        ('2022-03-01', 'El Arda', 5, 'ROSES', 'FREEDOM', 60.0, 1000),
+        ('2022-03-02', 'El Arda', 7, 'ROSES', 'FREEDOM', 70.0, 500),
+    ]
+    ncp = [('2022-03-01', 'El Arda', 5, 'ROSES', 'FREEDOM', 60.0, 50)]
+    c = _cubo(produccion, ncp, [])
+
+    ruta = ()
+    r = analisis.tasas_perdida(c)
+    while r.opciones['dimension'] is not None:
+        ruta += (r.opciones['valores'][0],)
+        r = analisis.tasas_perdida(c, ruta)
+        assert r.aviso is None
+
+    assert ruta == ('El Arda', 5, 'ROSES', 'FREEDOM', 60.0)
+    assert r.cifras['Tasa de pérdida en postcosecha (NCP)'] == '5.00%'
+
+
+def test_ruta_sin_datos_avisa_en_lugar_de_fallar():
+    c = _cubo([('2022-03-01', 'El Arda', 5, 'ROSES', 'FREEDOM', 60.0, 1000)], [], [])
+
+    r = analisis.tasas_perdida(c, ('El Arda', '5'))
+
+    assert r.aviso is not None
+
+
+def _aleatorios(rng, n):
+    return [
+        (f"2022-03-{rng.integers(1, 8):02d}", rng.choice(['El Arda', 'Tulipán']), int(rng.integers(1, 4)),
+         rng.choice(['ROSES', 'CLAVEL']), rng.choice(['FREEDOM', 'VENDELA', 'MONDIAL']), float(rng.choice([50, 60, 70])),
+         int(rng.integers(1, 100)))
+        for _ in range(n)
+    ]
+
+
+@pytest.mark.parametrize('dimensiones', [(), ('Finca',), ('Finca', 'Bloque'), ('Variedad', 'Grado'), tuple(tasas.JERARQUIA)])
+def test_nivel_suma_como_un_groupby_de_los_registros(dimensiones):
+    rng = np.random.default_rng(0)
+    produccion, ncp, ncc = _aleatorios(rng, 400), _aleatorios(rng, 150), _aleatorios(rng, 150)
+    # Pérdidas en una combinación sin producción registrada: su tasa queda vacía
+    ncp.append(('2022-03-01', 'Tulipán', 9, 'ROSES', 'FREEDOM', 50.0, 7))
+
+    tabla = tasas.MotorTasas(_cubo(produccion, ncp, ncc)).nivel(*dimensiones)
+
+    totales = {}
+    for nombre, filas in {'ProduccionTallos': produccion, 'NCPTallos': ncp, 'NCCTallos': ncc}.items():
+        df = _registros(filas)
+        totales[nombre] = df.groupby(list(dimensiones))['Tallos'].sum() if dimensiones else pd.Series([df['Tallos'].sum()])
+    esperada = pd.DataFrame(totales)
+    esperada[['NCPTallos', 'NCCTallos']] = esperada[['NCPTallos', 'NCCTallos']].fillna(0)
+    esperada['TasaNCP'] = esperada['NCPTallos'] / esperada['ProduccionTallos'] * 100
+    esperada['TasaNCC'] = esperada['NCCTallos'] / esperada['ProduccionTallos'] * 100
+
+    obtenida = tabla.reset_index(drop=not dimensiones)
+    esperada = esperada.reset_index(drop=not dimensiones)
+    columnas = list(dimensiones) + list(esperada.columns[len(dimensiones):])
+    obtenida = obtenida[columnas].sort_values(list(dimensiones) or columnas).reset_index(drop=True)
+    esperada = esperada[columnas].sort_values(list(dimensiones) or columnas).reset_index(drop=True)
+    pd.testing.assert_frame_equal(obtenida, esperada, check_dtype=False, check_categorical=False)